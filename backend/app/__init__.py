@@ -2,11 +2,17 @@ from flask import Flask
 from flask_cors import CORS
 from app.config.config import Config
 from app.extensions import db, jwt
-from app.models.user import TokenBlocklist
+from app.json_provider import FastJSONProvider
+from app.models.user import is_token_revoked
 
 def create_app(config=Config):
   app = Flask(__name__)
   app.config.from_object(config)
+  app.json = FastJSONProvider(app)
+  # The answer-document store only works where its JSON patch does
+  if app.config.get('ANSWER_STORE') == 'document':
+      from app.services.session_answers import check_answer_store
+      check_answer_store(app)
   
   # Initialize extensions
   db.init_app(app)
@@ -16,7 +22,7 @@ def create_app(config=Config):
           "origins": ["http://localhost:3000"],
           "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
           "allow_headers": ["Content-Type", "Authorization"],
-          "expose_headers": ["Content-Range", "X-Content-Range"],
+          "expose_headers": ["Content-Range", "X-Content-Range", "Retry-After", "X-Remaining-Time", "X-Clock-Paused"],
           "supports_credentials": True
       }
   })
@@ -31,11 +37,19 @@ def create_app(config=Config):
   app.register_blueprint(leaderboard_routes, url_prefix='/api/leaderboard')
   app.register_blueprint(users_routes,url_prefix='/api/users')
   app.register_blueprint(dashboard_routes,url_prefix='/api/dashboard')
+  # CLI commands
+  from app.cli import register_commands
+  register_commands(app)
+  if app.config.get('QUERY_COUNT_HEADER'):
+      from app.query_stats import init_query_count_header
+      init_query_count_header(app)
+  # Live exam channel; clients fall back to HTTP when it is off
+  if app.config.get('SESSION_SOCKET_ENABLED'):
+      from app.routes.session_socket import register_session_socket
+      register_session_socket(app)
   # JWT configuration
   @jwt.token_in_blocklist_loader
   def check_if_token_revoked(jwt_header, jwt_payload):
-      jti = jwt_payload['jti']
-      token = TokenBlocklist.query.filter_by(jti=jti).first()
-      return token is not None
+      return is_token_revoked(jwt_payload)
   
   return app
\ No newline at end of file
@@ -0,0 +1,78 @@
+import click
+
+from app.extensions import db
+from app.models.test import Question, Test
+
+
+def register_commands(app):
+  @app.cli.command('report-duplicate-questions')
+  @click.option('--threshold', type=float, default=None,
+                help='Minimum estimated similarity (defaults to QUESTION_DEDUP_THRESHOLD)')
+  @click.option('--show', type=int, default=20, help='Number of clusters to print')
+  def report_duplicate_questions(threshold, show):
+      """Report clusters of near-duplicate questions across the question bank"""
+      from app.services.question_dedup import find_duplicate_clusters
+
+      threshold = threshold if threshold is not None else app.config.get('QUESTION_DEDUP_THRESHOLD', 0.8)
+      clusters = find_duplicate_clusters(threshold)
+      duplicates = sum(len(cluster) - 1 for cluster in clusters)
+      click.echo(f"{len(clusters)} clusters, {duplicates} redundant questions (threshold {threshold})")
+
+      for cluster in clusters[:show]:
+          rows = db.session.query(Question.id, Question.test_id, Question.question_text).filter(
+              Question.id.in_(cluster)
+          ).order_by(Question.id).all()
+          click.echo(f"\n{len(cluster)} questions:")
+          for question_id, test_id, question_text in rows:
+              click.echo(f"  #{question_id} (test {test_id}): {question_text[:100]}")
+
+  @app.cli.command('warm-test-snapshots')
+  @click.argument('test_ids', nargs=-1, type=int)
+  @click.option('--all-active', is_flag=True, help='Warm every active test')
+  def warm_test_snapshots(test_ids, all_active):
+      """Build test snapshots ahead of an exam window
+
+      Snapshots land in the shared store (TEST_SNAPSHOT_REDIS_URL), where
+      every worker picks them up; without one, each worker still builds its
+      own on first request.
+      """
+      from app.services.test_snapshots import get_snapshot_cache
+
+      if not test_ids and not all_active:
+          raise click.UsageError('Give one or more test ids, or --all-active')
+
+      query = Test.query.filter_by(is_active=True) if all_active else Test.query.filter(Test.id.in_(test_ids))
+      cache = get_snapshot_cache()
+      if cache.shared is None:
+          click.echo("No shared snapshot store configured; snapshots are only checked, not kept")
+
+      warmed = 0
+      for test in query.order_by(Test.id):
+          snapshot = cache.warm(test)
+          warmed += 1
+          click.echo(f"  test {test.id} v{test.content_version}: {snapshot.size} bytes")
+      click.echo(f"Warmed {warmed} test snapshots")
+
+  @app.cli.command('flush-autosave-journal')
+  def flush_autosave_journal():
+      """Apply every save waiting in the write-behind autosave journal
+
+      Gunicorn workers replay the journal on their own when they start; this
+      drains it by hand, e.g. before turning AUTOSAVE_JOURNAL_PATH off.
+      """
+      from app.services.autosave_journal import AutosaveJournal
+
+      if not app.config.get('AUTOSAVE_JOURNAL_PATH'):
+          raise click.UsageError('AUTOSAVE_JOURNAL_PATH is not set')
+      # Flushed right here, without the background flusher workers run
+      journal = AutosaveJournal(app, app.config['AUTOSAVE_JOURNAL_PATH'],
+                                batch_size=app.config.get('AUTOSAVE_FLUSH_BATCH_SIZE', 5000))
+
+      flushed = 0
+      while journal.pending():
+          count = journal.flush(block=True)
+          if not count:
+              break
+          flushed += count
+      stats = journal.stats()
+      click.echo(f"Flushed {flushed} saves; {stats['pending']} still pending, {stats['flush_errors']} flush errors")
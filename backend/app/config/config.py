@@ -14,4 +14,105 @@ class Config:
   # Application Configuration
   SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
   DEBUG = True
-  GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
\ No newline at end of file
+  GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+  GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-pro')
+  # Background test generation
+  GENERATION_WORKERS = int(os.getenv('GENERATION_WORKERS', 2))
+
+  # Cache of generated question sets, keyed by topic, count and prompt version
+  GENERATION_CACHE_ENABLED = os.getenv('GENERATION_CACHE_ENABLED', 'true').lower() == 'true'
+  GENERATION_CACHE_MAX_ENTRIES = int(os.getenv('GENERATION_CACHE_MAX_ENTRIES', 500))
+  GENERATION_CACHE_MAX_AGE_DAYS = int(os.getenv('GENERATION_CACHE_MAX_AGE_DAYS', 30))
+
+  # Large tests are generated as concurrent batches of this many questions
+  GENERATION_BATCH_SIZE = int(os.getenv('GENERATION_BATCH_SIZE', 10))
+  GENERATION_CHUNK_WORKERS = int(os.getenv('GENERATION_CHUNK_WORKERS', 4))
+  GENERATION_CHUNK_RETRIES = int(os.getenv('GENERATION_CHUNK_RETRIES', 2))
+  GENERATION_TOPUP_ROUNDS = int(os.getenv('GENERATION_TOPUP_ROUNDS', 1))
+  # Largest num_questions a create request may ask for
+  GENERATION_MAX_QUESTIONS = int(os.getenv('GENERATION_MAX_QUESTIONS', 200))
+
+  # Stream model output and persist questions as they arrive (per request: "stream")
+  GENERATION_STREAMING = os.getenv('GENERATION_STREAMING', 'false').lower() == 'true'
+  # Server-sent progress at /tests/jobs/<id>/events; only served by gevent
+  # workers, where a held-open request is a greenlet, so clients poll otherwise
+  GENERATION_EVENTS_POLL_SECONDS = float(os.getenv('GENERATION_EVENTS_POLL_SECONDS', 0.5))
+  GENERATION_EVENTS_TIMEOUT_SECONDS = int(os.getenv('GENERATION_EVENTS_TIMEOUT_SECONDS', 300))
+
+  # Question generation backend: gemini, fake (offline, deterministic),
+  # replay (serve captures from QUESTION_PROVIDER_REPLAY_DIR) or record
+  # (gemini, saving every reply into QUESTION_PROVIDER_REPLAY_DIR)
+  QUESTION_PROVIDER = os.getenv('QUESTION_PROVIDER', 'gemini')
+  QUESTION_PROVIDER_REPLAY_DIR = os.getenv('QUESTION_PROVIDER_REPLAY_DIR', 'ai_captures')
+  QUESTION_PROVIDER_REPLAY_STRICT = os.getenv('QUESTION_PROVIDER_REPLAY_STRICT', 'false').lower() == 'true'
+  QUESTION_PROVIDER_LATENCY_MS = int(os.getenv('QUESTION_PROVIDER_LATENCY_MS', 0))
+
+  # Reject generated questions that nearly duplicate earlier ones on the same
+  # topic: MinHash estimate of the Jaccard similarity of 5-character runs of
+  # stem and options, between questions with the same correct answer.
+  # Question bank indexes are kept for the most recently used topics
+  QUESTION_DEDUP_ENABLED = os.getenv('QUESTION_DEDUP_ENABLED', 'true').lower() == 'true'
+  QUESTION_DEDUP_THRESHOLD = float(os.getenv('QUESTION_DEDUP_THRESHOLD', 0.8))
+  QUESTION_DEDUP_CACHED_TOPICS = int(os.getenv('QUESTION_DEDUP_CACHED_TOPICS', 64))
+
+  # Process-wide limits on upstream AI calls. Calls beyond them queue
+  # (interactive ahead of bulk) rather than fail; 0 disables the rate limit
+  AI_RATE_LIMIT_PER_MINUTE = float(os.getenv('AI_RATE_LIMIT_PER_MINUTE', 60))
+  AI_RATE_BURST = int(os.getenv('AI_RATE_BURST', 10))
+  AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 4))
+  AI_QUEUE_TIMEOUT_SECONDS = float(os.getenv('AI_QUEUE_TIMEOUT_SECONDS', 300))
+
+  # Deadline per AI call, hedging of slow calls (after AI_HEDGE_AFTER_SECONDS,
+  # or the recent p95 when 0; at most AI_HEDGE_MAX_RATIO of calls, 0 disables)
+  # and the circuit breaker that fails fast while the provider keeps failing
+  AI_CALL_TIMEOUT_SECONDS = float(os.getenv('AI_CALL_TIMEOUT_SECONDS', 90))
+  AI_CALL_WORKERS = int(os.getenv('AI_CALL_WORKERS', 8))
+  AI_HEDGE_AFTER_SECONDS = float(os.getenv('AI_HEDGE_AFTER_SECONDS', 0))
+  AI_HEDGE_MAX_RATIO = float(os.getenv('AI_HEDGE_MAX_RATIO', 0.1))
+  AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', 5))
+  AI_BREAKER_RESET_SECONDS = float(os.getenv('AI_BREAKER_RESET_SECONDS', 30))
+
+  # Pre-serialized test snapshots: an in-process LRU, optionally backed by
+  # redis so every worker (and the warm-test-snapshots command) shares them
+  TEST_SNAPSHOT_CACHE_SIZE = int(os.getenv('TEST_SNAPSHOT_CACHE_SIZE', 256))
+  TEST_SNAPSHOT_REDIS_URL = os.getenv('TEST_SNAPSHOT_REDIS_URL')
+  TEST_SNAPSHOT_TTL_SECONDS = int(os.getenv('TEST_SNAPSHOT_TTL_SECONDS', 86400))
+
+  # Browser caching of test content (revalidated by ETag once stale) and of
+  # completed results, which never change
+  TEST_CONTENT_MAX_AGE_SECONDS = int(os.getenv('TEST_CONTENT_MAX_AGE_SECONDS', 60))
+  RESULTS_MAX_AGE_SECONDS = int(os.getenv('RESULTS_MAX_AGE_SECONDS', 31536000))
+
+  # Add an X-Query-Count header (SQL statements run) to every response; for
+  # load tests such as benchmarks/load_exam_day.py, not for production
+  QUERY_COUNT_HEADER = os.getenv('QUERY_COUNT_HEADER', 'false').lower() == 'true'
+
+  # Largest page of questions a windowed questions/bootstrap request may ask for
+  QUESTION_WINDOW_MAX_SIZE = int(os.getenv('QUESTION_WINDOW_MAX_SIZE', 200))
+
+  # Optional write-behind autosave: saves are acknowledged once they are in
+  # a local SQLite journal and flushed to the database in batches. Worker
+  # processes on a host share the journal; with several hosts, route each
+  # candidate to one host (session affinity)
+  AUTOSAVE_JOURNAL_PATH = os.getenv('AUTOSAVE_JOURNAL_PATH')
+  AUTOSAVE_FLUSH_INTERVAL_SECONDS = float(os.getenv('AUTOSAVE_FLUSH_INTERVAL_SECONDS', 1))
+  AUTOSAVE_FLUSH_BATCH_SIZE = int(os.getenv('AUTOSAVE_FLUSH_BATCH_SIZE', 5000))
+
+  # Where new sessions autosave answers: 'rows' (question_responses and
+  # response_options) or 'document' (one JSON document on the session, turned
+  # into rows on submit). Sessions keep the store they started with
+  ANSWER_STORE = os.getenv('ANSWER_STORE', 'rows')
+
+  # The server keeps each session's deadline; autosaves arriving this long
+  # after it (still in flight when time ran out) are accepted, later ones refused
+  EXAM_DEADLINE_GRACE_SECONDS = int(os.getenv('EXAM_DEADLINE_GRACE_SECONDS', 30))
+
+  # Live exam channel at /api/tests/<id>/session/socket (needs flask-sock):
+  # autosaves, acks, the clock and submit notices over one WebSocket per
+  # candidate. Each open socket holds a worker while the exam lasts, so
+  # gunicorn.conf.py switches to gevent workers when this is on. The
+  # frontend only tries the socket with NEXT_PUBLIC_SESSION_SOCKET=true
+  SESSION_SOCKET_ENABLED = os.getenv('SESSION_SOCKET_ENABLED', 'false').lower() == 'true'
+  SESSION_SOCKET_CLOCK_SECONDS = float(os.getenv('SESSION_SOCKET_CLOCK_SECONDS', 15))
+  # How long a new socket may take to send its auth message
+  SESSION_SOCKET_AUTH_SECONDS = float(os.getenv('SESSION_SOCKET_AUTH_SECONDS', 10))
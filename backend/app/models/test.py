@@ -1,5 +1,6 @@
 from datetime import datetime
 from app.extensions import db
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from enum import Enum
 class QuestionType(Enum):
@@ -19,6 +20,11 @@ class Test(db.Model):
   is_active = db.Column(db.Boolean, default=True)
   created_at = db.Column(db.DateTime, default=datetime.utcnow)
   creator_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+  is_randomized = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
+  # Bumped whenever the test or its questions change; keys cached snapshots
+  content_version = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+  # Normalized topic it was generated for; scopes near-duplicate checks
+  topic = db.Column(db.Text, index=True)
   
   creator = relationship('User', back_populates='created_tests')
   questions = relationship('Question', back_populates='test', cascade='all, delete-orphan')
@@ -51,6 +57,18 @@ class QuestionOption(db.Model):
   question = relationship('Question', back_populates='options')
   selected_in = relationship('ResponseOption', back_populates='question_option')
 
+class GeneratedQuestionSet(db.Model):
+  __tablename__ = 'generated_question_sets'
+
+  cache_key = db.Column(db.String(64), primary_key=True)
+  topic = db.Column(db.Text, nullable=False)
+  num_questions = db.Column(db.Integer, nullable=False)
+  prompt_version = db.Column(db.Integer, nullable=False)
+  questions = db.Column(db.JSON, nullable=False)
+  hit_count = db.Column(db.Integer, default=0, nullable=False)
+  created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+  last_used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
 class TestSession(db.Model):
   __tablename__ = 'test_sessions'
 
@@ -63,14 +81,30 @@ class TestSession(db.Model):
   status = db.Column(db.String(20), default='in_progress')
   passed = db.Column(db.Boolean)
   time_spent = db.Column(db.Integer)
+  # Last client-reported time left; only read for sessions started before deadline existed
   remaining_time = db.Column(db.Integer)
   current_question_index = db.Column(db.Integer, default=0)
+  # Seeds the question and option order of a randomized test; None keeps the test's order
+  shuffle_seed = db.Column(db.Integer)
+  # Highest autosave sequence number applied; older saves are dropped
+  last_save_seq = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+  # The server-kept clock: time is up at deadline, which pausing and extending move
+  deadline = db.Column(db.DateTime)
+  paused_at = db.Column(db.DateTime)
+  paused_seconds = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+  # Autosaved answers as one {question id: answer} document, for sessions
+  # started with ANSWER_STORE=document; they become response rows on submit
+  answer_document = db.Column(db.JSON(none_as_null=True).with_variant(JSONB(), 'postgresql'))
   test = relationship('Test', back_populates='test_sessions')
   user = relationship('User', back_populates='test_sessions')
   responses = relationship('QuestionResponse', back_populates='test_session', lazy='dynamic')
 
 class QuestionResponse(db.Model):
   __tablename__ = 'question_responses'
+  # One answer per question per session; saves upsert against this key
+  __table_args__ = (
+      db.UniqueConstraint('session_id', 'question_id', name='uq_question_responses_session_question'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   session_id = db.Column(db.Integer, db.ForeignKey('test_sessions.id'), nullable=False)
@@ -90,4 +124,21 @@ class ResponseOption(db.Model):
   option_id = db.Column(db.Integer, db.ForeignKey('question_options.id'), nullable=False)
 
   question_response = relationship('QuestionResponse', back_populates='selected_options')
-  question_option = relationship('QuestionOption', back_populates='selected_in')
\ No newline at end of file
+  question_option = relationship('QuestionOption', back_populates='selected_in')
+
+class GenerationJob(db.Model):
+  __tablename__ = 'generation_jobs'
+
+  id = db.Column(db.String(36), primary_key=True)
+  creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+  status = db.Column(db.String(20), default='queued', nullable=False)
+  params = db.Column(db.JSON, nullable=False)
+  test_id = db.Column(db.Integer, db.ForeignKey('tests.id', ondelete='SET NULL'))
+  error = db.Column(db.Text)
+  questions_requested = db.Column(db.Integer)
+  questions_done = db.Column(db.Integer, default=0)
+  created_at = db.Column(db.DateTime, default=datetime.utcnow)
+  started_at = db.Column(db.DateTime)
+  finished_at = db.Column(db.DateTime)
+
+  test = relationship('Test')
\ No newline at end of file
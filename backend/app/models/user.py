@@ -25,3 +25,6 @@ class TokenBlocklist(db.Model):
   jti = db.Column(db.String(36), nullable=False, unique=True)
   created_at = db.Column(db.DateTime, nullable=False)
 
+def is_token_revoked(jwt_payload):
+  """Whether a decoded token has been revoked by logging out"""
+  return TokenBlocklist.query.filter_by(jti=jwt_payload['jti']).first() is not None
@@ -0,0 +1,24 @@
+from flask import g, has_request_context
+from sqlalchemy import event
+
+from app.extensions import db
+
+
+def init_query_count_header(app):
+    """Report the SQL statements each request ran in an X-Query-Count header
+
+    Meant for load tests and profiling (QUERY_COUNT_HEADER); statements run
+    outside a request, e.g. by background workers, are not counted.
+    """
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+
+    @app.after_request
+    def add_query_count(response):
+        response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+        return response
@@ -0,0 +1,166 @@
+import json
+import logging
+import time
+from datetime import datetime
+import jwt as pyjwt
+from flask import Blueprint, current_app
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException, RevokedTokenError
+from app.extensions import db
+from app.models.test import TestSession
+from app.models.user import is_token_revoked
+from app.services.session_clock import clock_state, is_expired
+from app.services.session_progress import save_progress
+
+logger = logging.getLogger(__name__)
+
+
+def _send(ws, message_type, **fields):
+  ws.send(json.dumps({'type': message_type, **fields}))
+
+
+def _clock(session):
+  return {**clock_state(session), 'server_time': datetime.utcnow().isoformat()}
+
+
+def _live_session(session_id):
+  """The session if it is still in progress, read fresh for each message"""
+  session = db.session.get(TestSession, session_id)
+  return session if session is not None and session.status == 'in_progress' else None
+
+
+def _authenticate(ws):
+  """Read the auth message a client must send first and check its token
+
+  The token travels in the message rather than the URL, so it never lands
+  in access logs.
+
+  Returns:
+      dict: The decoded access token, or None if the client did not authenticate
+  """
+  try:
+      raw = ws.receive(timeout=current_app.config.get('SESSION_SOCKET_AUTH_SECONDS', 10))
+      message = json.loads(raw) if raw is not None else None
+  except ValueError:
+      message = None
+  if not isinstance(message, dict) or message.get('type') != 'auth' or not isinstance(message.get('token'), str):
+      _send(ws, 'error', status=401, error='Send {"type": "auth", "token": ...} first')
+      return None
+  try:
+      token = decode_token(message['token'])
+      if token.get('type') != 'access':
+          raise JWTExtendedException('Only access tokens are allowed')
+      # Same check as the HTTP routes' token_in_blocklist_loader
+      if is_token_revoked(token):
+          raise RevokedTokenError(pyjwt.get_unverified_header(message['token']), token)
+  except (JWTExtendedException, pyjwt.PyJWTError) as e:
+      _send(ws, 'error', status=401, error=str(e) or 'Invalid token')
+      return None
+  return token
+
+
+def _handle(ws, session_id, message):
+  """Answer one client message
+
+  Returns:
+      bool: False once the channel should close
+  """
+  session = _live_session(session_id)
+  if session is None:
+      _send(ws, 'submit_required', reason='ended')
+      return False
+  grace = current_app.config.get('EXAM_DEADLINE_GRACE_SECONDS', 30)
+
+  if message is None or message.get('type') == 'sync':
+      if is_expired(session, grace):
+          _send(ws, 'submit_required', reason='time_up')
+          return False
+      _send(ws, 'clock', **_clock(session))
+      return True
+
+  if message.get('type') != 'save':
+      _send(ws, 'error', error=f"Unknown message type: {message.get('type')}")
+      return True
+
+  try:
+      reply, status = save_progress(session, message)
+  except ValueError as e:
+      db.session.rollback()
+      reply, status = {'error': str(e)}, 400
+  except Exception as e:
+      db.session.rollback()
+      logger.error(f"Error saving progress over socket: {str(e)}")
+      reply, status = {'error': 'Failed to update progress'}, 500
+
+  if status == 200:
+      _send(ws, 'ack', seq=message.get('seq'), **reply)
+      return True
+  _send(ws, 'error', seq=message.get('seq'), status=status, **reply)
+  if status == 409:
+      _send(ws, 'submit_required', reason='time_up')
+      return False
+  return True
+
+
+def session_socket(ws, test_id):
+  """Live channel for a candidate's session
+
+  Messages are JSON objects with a type. The client first sends
+  {"type": "auth", "token"} with its access token, within
+  SESSION_SOCKET_AUTH_SECONDS; the socket is trusted from then on. After
+  that it sends {"type": "save", "seq", "changes", "current_question_index"}
+  (as for /progress, answered with "ack" or "error") and {"type": "sync"}.
+  The server sends "hello" once authenticated, "clock" (remaining time,
+  paused, server time) whenever the client has been quiet for
+  SESSION_SOCKET_CLOCK_SECONDS, and "submit_required" once time is up or
+  the session has ended, before closing.
+  """
+  token = _authenticate(ws)
+  if token is None:
+      return
+  session = TestSession.query.filter_by(
+      test_id=test_id, user_id=token[current_app.config.get('JWT_IDENTITY_CLAIM', 'sub')], status='in_progress'
+  ).first()
+  if session is None:
+      _send(ws, 'error', status=404, error='No active session found')
+      return
+  session_id = session.id
+  _send(ws, 'hello', session_id=session_id, last_save_seq=session.last_save_seq, **_clock(session))
+  if is_expired(session, current_app.config.get('EXAM_DEADLINE_GRACE_SECONDS', 30)):
+      _send(ws, 'submit_required', reason='time_up')
+      return
+  token_expires = token['exp']
+  clock_seconds = current_app.config.get('SESSION_SOCKET_CLOCK_SECONDS', 15)
+  # Only hold a database connection while a message is handled
+  db.session.remove()
+
+  while True:
+      raw = ws.receive(timeout=clock_seconds)
+      if time.time() >= token_expires:
+          _send(ws, 'error', status=401, error='Token has expired')
+          return
+      try:
+          message = json.loads(raw) if raw is not None else None
+      except ValueError:
+          _send(ws, 'error', status=400, error='Messages must be JSON')
+          continue
+      if message is not None and not isinstance(message, dict):
+          _send(ws, 'error', status=400, error='Messages must be JSON objects')
+          continue
+      try:
+          if not _handle(ws, session_id, message):
+              return
+      finally:
+          db.session.remove()
+
+
+def register_session_socket(app):
+  """Serve the session socket at /api/tests/<id>/session/socket (needs flask-sock)"""
+  try:
+      from flask_sock import Sock
+  except ImportError:
+      logger.warning("SESSION_SOCKET_ENABLED is set but flask-sock is not installed; clients keep using HTTP")
+      return
+  session_socket_routes = Blueprint('session_socket_routes', __name__)
+  Sock().route('/<int:test_id>/session/socket', bp=session_socket_routes)(session_socket)
+  app.register_blueprint(session_socket_routes, url_prefix='/api/tests')
@@ -1,88 +1,227 @@
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, abort, current_app, request, jsonify, stream_with_context, url_for
 from app.models.user import User
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.extensions import db
-import google.generativeai as genai
-from app.models.test import QuestionResponse, ResponseOption, Test, Question, QuestionOption, QuestionType, TestSession
+from app.models.test import GenerationJob, QuestionResponse, ResponseOption, Test, Question, QuestionOption, QuestionType, TestSession
+from app.services.ai_resilience import get_breaker, get_resilient_provider
+from app.services.autosave_journal import flush_session
+from app.services.ai_scheduler import LANES, get_scheduler
+from app.services.generation_cache import has_cached_questions
+from app.services.session_answers import document_store_enabled, save_answers
+from app.services.session_clock import (
+    adopt_clock, clock_state, clock_version, extend_clock, is_expired, pause_clock, remaining_seconds, resume_clock,
+    seconds_used, start_clock
+)
+from app.services.session_order import new_shuffle_seed, option_order, question_order
+from app.services.session_progress import save_progress
+from app.services.test_generation import PROMPT_VERSION, enqueue_generation_job, serialize_job
+from app.services.test_snapshots import current_version, forget_test, get_test_snapshot, snapshot_etag, snapshot_response
+import base64
 import json
 import logging
-from sqlalchemy import and_
 import os
+import time
+from sqlalchemy import and_, select
+from sqlalchemy.orm import selectinload
 test_routes = Blueprint('test_routes', __name__)
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-# Configure Gemini
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-pro')
-
-def generate_questions_prompt(topic, num_questions=10):
-  prompt = f"""
-  Generate {num_questions} questions about {topic} in the following JSON format:
-  {{
-      "questions": [
-          {{
-              "question_text": "Question text here",
-              "question_type": "single_mcq|multiple_mcq|fill_blank|yes_no",
-              "options": [
-                  {{"text": "Option 1", "is_correct": true}},
-                  {{"text": "Option 2", "is_correct": false}},
-                  {{"text": "Option 3", "is_correct": false}},
-                  {{"text": "Option 4", "is_correct": false}}
-              ],
-              "explanation": "Explanation for the correct answer",
-              "points": 1.0
-          }}
-      ]
-  }}
-  
-  Rules:
-  1. For single_mcq, only one option should be correct
-  2. For multiple_mcq, multiple options can be correct
-  3. For fill_blank, provide one correct answer in the options
-  4. For yes_no, provide only two options: Yes and No
-  5. Ensure questions are diverse and cover different aspects of the topic
-  6. Provide clear explanations for each correct answer
+
+def _selected_options_by_response(session_id):
+  """Map each response in a session to its selected option ids, in one query"""
+  selected = {}
+  rows = db.session.query(ResponseOption.response_id, ResponseOption.option_id).join(
+      QuestionResponse, ResponseOption.response_id == QuestionResponse.id
+  ).filter(QuestionResponse.session_id == session_id).order_by(ResponseOption.id)
+  for response_id, option_id in rows:
+      selected.setdefault(response_id, []).append(option_id)
+  return selected
+
+
+def _session_content(response):
+  """Make a per-session response revalidate every time, answering 304 when unchanged"""
+  response.headers['Cache-Control'] = 'private, no-cache'
+  return response.make_conditional(request)
+
+
+def _clock_fields(session):
+  """snapshot_response() arguments for a session's clock
+
+  The remaining time changes every second on its own, so the ETag covers
+  the stored clock instead; a 304 still carries the live clock in headers.
   """
-  return prompt
-def clean_ai_response(response_text):
-    """Clean the AI response to ensure valid JSON
-    
-    Args:
-        response_text (str): The raw response text from the AI
-        
-    Returns:
-        str: Cleaned JSON string
-        
-    Raises:
-        ValueError: If the cleaned text is not valid JSON format
-    """
-    # Remove any markdown code block formatting
-    clean_text = response_text.replace("```json", "").replace("```", "")
-    
-    # Remove any leading/trailing whitespace or newlines
-    clean_text = clean_text.strip()
-    
-    # Try to find JSON content between { and }
-    start_idx = clean_text.find("{")
-    end_idx = clean_text.rfind("}")
-    
-    if start_idx == -1 or end_idx == -1:
-        raise ValueError("No JSON object found in AI response")
-        
-    # Extract just the JSON portion
-    clean_text = clean_text[start_idx:end_idx + 1]
-    
-    # Basic JSON format validation
-    if not (clean_text.startswith("{") and clean_text.endswith("}")):
-        raise ValueError("Invalid JSON format in AI response")
-        
-    return clean_text
+  return {'volatile': clock_state(session), 'volatile_version': clock_version(session)}
+
+
+def _with_clock(response, session):
+  """Send the session's live clock in headers, which a 304 carries too"""
+  clock = clock_state(session)
+  if clock['remaining_time'] is not None:
+      response.headers['X-Remaining-Time'] = str(clock['remaining_time'])
+  response.headers['X-Clock-Paused'] = 'true' if clock['paused'] else 'false'
+  return response
+
+
+def _active_session(test_id, user_id):
+  """The user's in-progress session for a test, or None"""
+  return TestSession.query.filter(
+      and_(
+          TestSession.test_id == test_id,
+          TestSession.user_id == user_id,
+          TestSession.status == 'in_progress'
+      )
+  ).first()
+
+
+def _get_or_start_session(test, user_id):
+  """Return the user's in-progress session for a test, starting one if needed"""
+  active_session = _active_session(test.id, user_id)
+
+  if not active_session:
+      active_session = TestSession(
+          test_id=test.id,
+          user_id=user_id,
+          start_time=datetime.utcnow(),
+          status='in_progress',
+          current_question_index=0,
+          shuffle_seed=new_shuffle_seed() if test.is_randomized else None
+      )
+      if document_store_enabled():
+          active_session.answer_document = {}
+      start_clock(active_session, test.duration_minutes)
+      db.session.add(active_session)
+      db.session.commit()
+  elif active_session.deadline is None:
+      adopt_clock(active_session, test.duration_minutes)
+      db.session.commit()
+
+  return active_session
+
+
+def _settle_session(session):
+  """Apply the session's write-behind saves, if any, so its state reads current
+
+  Does not wait on a busy journal: a read may miss the latest second of
+  saves, but never blocks on the flusher.
+  """
+  if flush_session(session.id, block=False):
+      db.session.refresh(session)
+  return session
+
+
+def _saved_answers(session):
+  """Answers saved so far in a session, keyed by question id
+
+  Text for fill-in questions, an option id for a single selection or a
+  list of option ids otherwise.
+  """
+  if session.answer_document is not None:
+      return {int(question_id): answer for question_id, answer in session.answer_document.items()}
+
+  saved_answers = {}
+  selected_by_response = _selected_options_by_response(session.id)
+  for response in QuestionResponse.query.filter_by(session_id=session.id):
+      if response.text_response:
+          saved_answers[response.question_id] = response.text_response
+      else:
+          selected_options = selected_by_response.get(response.id, [])
+          if len(selected_options) == 1:
+              saved_answers[response.question_id] = selected_options[0]
+          else:
+              saved_answers[response.question_id] = selected_options
+  return saved_answers
+
+
+def _encode_cursor(session_id, version, start, size):
+  raw = f"{session_id}:{version}:{start}:{size}".encode('ascii')
+  return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor):
+  """Split a question cursor into session id, content version, start and size
+
+  Raises:
+      ValueError: If the cursor is malformed
+  """
+  try:
+      raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+      session_id, version, start, size = (int(part) for part in raw.split(':'))
+  except ValueError:
+      raise ValueError('Invalid cursor')
+  if start < 0 or size < 1:
+      raise ValueError('Invalid cursor')
+  return session_id, version, start, min(size, current_app.config.get('QUESTION_WINDOW_MAX_SIZE', 200))
+
+
+def _requested_window_size():
+  """Page size asked for with ?window=, or None for every question
+
+  Raises:
+      ValueError: If window is not a positive integer
+  """
+  window = request.args.get('window')
+  if window is None:
+      return None
+  if not window.isdigit() or int(window) < 1:
+      raise ValueError('window must be a positive integer')
+  return min(int(window), current_app.config.get('QUESTION_WINDOW_MAX_SIZE', 200))
+
+
+def _question_window(snapshot, part, session, start, size):
+  """One page of a session's question order, plus the fields to page from it
+
+  Cursors carry the session and content version, so they only page
+  through the order they were issued for.
+  """
+  total = snapshot.question_count(part)
+  end = min(start + size, total)
+  return snapshot.in_session_order(part, session.shuffle_seed, start, end), {
+      'total_questions': total,
+      'window': {'start': start, 'end': end},
+      'next_cursor': _encode_cursor(session.id, snapshot.version, end, size) if end < total else None,
+      'prev_cursor': _encode_cursor(session.id, snapshot.version, max(0, start - size), size) if start > 0 else None
+  }
+
+
+def _session_questions(snapshot, part, session, size):
+  """A session's questions: all of them, or the window holding its current question"""
+  if size is None:
+      return snapshot.in_session_order(part, session.shuffle_seed), {}
+  position = min(session.current_question_index or 0, max(snapshot.question_count(part) - 1, 0))
+  return _question_window(snapshot, part, session, position // size * size, size)
+
+
+def _still_generating(test):
+  """A 409 for a test whose questions are still being generated, else None"""
+  if test.is_active is False:
+      return jsonify({'error': 'This test is still being generated, try again shortly'}), 409
+  return None
+
+
+def _question_page(test, part, cursor, user_id):
+  """The page of questions a cursor points at, without the session state
+
+  Raises:
+      ValueError: If the cursor is malformed
+  """
+  session_id, version, start, size = _decode_cursor(cursor)
+  session = _active_session(test.id, user_id)
+  if not session or session.id != session_id:
+      return jsonify({'error': 'No active session for this cursor'}), 404
+  if version != test.content_version:
+      return jsonify({'error': 'The test has changed, reload it to continue'}), 409
+
+  snapshot = get_test_snapshot(test.id, version)
+  questions, fields = _question_window(snapshot, part, session, start, size)
+  return _session_content(snapshot_response(snapshot, {'questions': questions}, session_id=session.id, **fields))
+
+
 @test_routes.route('/create', methods=['POST'], endpoint='create_test')
 @jwt_required()
 def create_test():
+    """Queue AI generation of a new test and return the job to poll"""
     try:
         current_user_id = get_jwt_identity()
         data = request.get_json()
@@ -92,84 +231,120 @@ def create_test():
         missing_fields = [field for field in required_fields if field not in data]
         if missing_fields:
             return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
-
-        # Generate questions using Gemini
-        try:
-            prompt = generate_questions_prompt(data['topic'], data.get('num_questions', 10))
-            response = model.generate_content(prompt)
-            
-            if not response.text:
-                raise ValueError("Empty response from AI")
-            
-            # Clean and parse the response
-            clean_response = clean_ai_response(response.text)
-            questions_data = json.loads(clean_response)
-            
-            if not questions_data.get('questions'):
-                raise ValueError("No questions generated")
-            
-        except Exception as e:
-            logger.error(f"AI Generation Error: {str(e)}")
-            return jsonify({'error': 'Failed to generate questions. Please try again.'}), 500
-
-        # Create test
-        test = Test(
-            title=data['title'],
-            description=data.get('description', ''),
-            duration_minutes=int(data['duration_minutes']),
-            passing_score=float(data['passing_score']),
-            creator_id=current_user_id,
-            #is_randomized=data.get('is_randomized', False),
-           # allow_review=data.get('allow_review', True)
-        )
-        
-        db.session.add(test)
-        db.session.flush()  # Get test ID without committing
-
-        # Create questions and options
-        for idx, q_data in enumerate(questions_data['questions'], 1):
-            try:
-                question = Question(
-                    test_id=test.id,
-                    question_text=q_data['question_text'],
-                    question_type=QuestionType[q_data['question_type'].upper()],
-                    points=float(q_data['points']),
-                    order=idx,
-                    explanation=q_data.get('explanation', '')
-                )
-                db.session.add(question)
-                db.session.flush()
-
-                # Add options
-                for opt_idx, opt_data in enumerate(q_data['options'], 1):
-                    option = QuestionOption(
-                        question_id=question.id,
-                        option_text=opt_data['text'],
-                        is_correct=bool(opt_data['is_correct']),
-                        order=opt_idx
-                    )
-                    db.session.add(option)
-                
-            except KeyError as e:
-                raise ValueError(f"Invalid question data format: missing {str(e)}")
-            except Exception as e:
-                raise ValueError(f"Error processing question {idx}: {str(e)}")
-
-        db.session.commit()
+        if data.get('priority', 'interactive') not in LANES:
+            return jsonify({'error': f'priority must be one of: {", ".join(LANES)}'}), 400
+        # Checked here so a bad count is a 400, not a failed job, and a huge
+        # one cannot fan out into unbounded batches
+        max_questions = current_app.config.get('GENERATION_MAX_QUESTIONS', 200)
+        num_questions = data.get('num_questions', 10)
+        if isinstance(num_questions, str) and num_questions.strip().isdigit():
+            num_questions = int(num_questions)
+        if not isinstance(num_questions, int) or isinstance(num_questions, bool) or not 1 <= num_questions <= max_questions:
+            return jsonify({'error': f'num_questions must be an integer from 1 to {max_questions}'}), 400
+        data['num_questions'] = num_questions
+
+        # Fail fast while the AI provider is down, unless a cached set can stand in
+        breaker = get_breaker()
+        if breaker.is_open() and not has_cached_questions(data['topic'], num_questions, PROMPT_VERSION):
+            response = jsonify({'error': 'Question generation is temporarily unavailable. Please try again shortly.'})
+            response.headers['Retry-After'] = str(int(breaker.retry_after()) + 1)
+            return response, 503
+
+        job = enqueue_generation_job(current_app._get_current_object(), data, current_user_id)
         return jsonify({
-            'message': 'Test created successfully',
-            'test_id': test.id
-        }), 201
+            'message': 'Test generation started',
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('test_routes.get_generation_job', job_id=job.id)
+        }), 202
 
-    except ValueError as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Test Creation Error: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
 
+@test_routes.route('/ai/metrics', methods=['GET'], endpoint='ai_metrics')
+@jwt_required()
+def ai_metrics():
+    """Latency percentiles, hedging, circuit breaker and scheduler state for this worker"""
+    user = User.query.get(get_jwt_identity())
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify({
+        'pid': os.getpid(),
+        'provider': get_resilient_provider().snapshot(),
+        'scheduler': get_scheduler().snapshot()
+    }), 200
+
+
+@test_routes.route('/jobs/<job_id>', methods=['GET'], endpoint='get_generation_job')
+@jwt_required()
+def get_generation_job(job_id):
+    """Get the status of a test generation job, including the test id once done"""
+    current_user_id = get_jwt_identity()
+    job = GenerationJob.query.get_or_404(job_id)
+
+    if job.creator_id != current_user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify(serialize_job(job)), 200
+
+
+def _cooperative_workers():
+    """Whether this worker runs under gevent, where a held-open request only costs a greenlet"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+@test_routes.route('/jobs/<job_id>/events', methods=['GET'], endpoint='generation_job_events')
+@jwt_required()
+def generation_job_events(job_id):
+    """Stream generation progress as server-sent events until the job settles
+
+    Only served by gevent workers: under sync workers each watcher would hold
+    a whole worker, so this answers 404 and clients poll /jobs/<job_id>.
+    """
+    if not _cooperative_workers():
+        return jsonify({'error': 'Progress events are not available; poll the job instead',
+                        'poll': url_for('test_routes.get_generation_job', job_id=job_id)}), 404
+
+    current_user_id = get_jwt_identity()
+    job = GenerationJob.query.get_or_404(job_id)
+
+    if job.creator_id != current_user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    poll_seconds = current_app.config.get('GENERATION_EVENTS_POLL_SECONDS', 0.5)
+    timeout_seconds = current_app.config.get('GENERATION_EVENTS_TIMEOUT_SECONDS', 300)
+
+    def events():
+        last_payload = None
+        deadline = time.monotonic() + timeout_seconds
+        while time.monotonic() < deadline:
+            db.session.expire_all()
+            payload = serialize_job(db.session.get(GenerationJob, job_id))
+            if payload != last_payload:
+                last_payload = payload
+                event = 'done' if payload['status'] in ('completed', 'failed') else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+                if event == 'done':
+                    return
+            # Release the connection while we wait for the worker
+            db.session.remove()
+            time.sleep(poll_seconds)
+        yield "event: timeout\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @test_routes.route('/delete/<test_id>', methods=['DELETE'])
 @jwt_required()
 def delete_test(test_id):
@@ -224,6 +399,7 @@ def delete_test(test_id):
       # Finally, delete the test
       db.session.delete(test)
       db.session.commit()
+      forget_test(test.id)
 
       return jsonify({'message': 'Test deleted successfully'}), 200
 
@@ -234,37 +410,20 @@ def delete_test(test_id):
 @test_routes.route('/<int:test_id>', methods=['GET'], endpoint='get_test')
 @jwt_required()
 def get_test(test_id):
-  test = Test.query.get_or_404(test_id)
-  
-  questions = []
-  for question in test.questions:
-      options = [
-          {
-              'id': option.id,
-              'text': option.option_text,
-              'is_correct': option.is_correct
-          } for option in question.options
-      ]
-      
-      questions.append({
-          'id': question.id,
-          'question_text': question.question_text,
-          'question_type': question.question_type.value,
-          'points': question.points,
-          'order': question.order,
-          'explanation': question.explanation,
-          'options': options
-      })
-  
-  return jsonify({
-      'id': test.id,
-      'title': test.title,
-      'description': test.description,
-      'duration_minutes': test.duration_minutes,
-      'passing_score': test.passing_score,
-      'created_at': test.created_at,
-      'questions': questions
-  })
+  version = current_version(test_id)
+  if version is None:
+      abort(404)
+
+  etag = snapshot_etag(test_id, version)
+  if request.if_none_match.contains(etag):
+      response = Response(status=304)
+  else:
+      response = Response(get_test_snapshot(test_id, version).test_json, mimetype='application/json')
+  response.set_etag(etag)
+  response.headers['Cache-Control'] = (
+      f"private, max-age={current_app.config.get('TEST_CONTENT_MAX_AGE_SECONDS', 60)}, must-revalidate"
+  )
+  return response
 
 @test_routes.route('/list', methods=['GET'], endpoint='list_tests')
 @jwt_required()
@@ -274,7 +433,8 @@ def list_tests():
       page = request.args.get('page', 1, type=int)
       per_page = request.args.get('per_page', 10, type=int)
       
-      tests = Test.query.order_by(Test.created_at.desc()).paginate(
+      # Tests still being generated stay hidden until their questions are in
+      tests = Test.query.filter(Test.is_active.isnot(False)).order_by(Test.created_at.desc()).paginate(
           page=page, per_page=per_page
       )
       
@@ -305,10 +465,7 @@ def list_tests():
                   last_score = session.score
               elif session.status == 'in_progress':
                   status = 'in_progress'
-                  # Calculate remaining time if in progress
-                  if session.end_time:
-                      remaining_time = (session.end_time - datetime.utcnow()).total_seconds()
-                      remaining_time = max(0, int(remaining_time))  # Ensure non-negative
+                  remaining_time = remaining_seconds(session)
               
               last_attempt_date = session.start_time.isoformat() if session.start_time else None
           
@@ -342,169 +499,125 @@ def list_tests():
 @test_routes.route('/<int:test_id>/questions', methods=['GET'])
 @jwt_required()
 def get_test_questions(test_id):
+  """The session's questions and state
+
+  ?window=N returns only the page of N questions holding the current
+  question, with cursors; ?cursor= fetches another page of that order.
+  """
   try:
       current_user_id = get_jwt_identity()
       test = Test.query.get_or_404(test_id)
-      
-      # Check for active session
-      active_session = TestSession.query.filter(
-          and_(
-              TestSession.test_id == test_id,
-              TestSession.user_id == current_user_id,
-              TestSession.status == 'in_progress'
-          )
-      ).first()
+      generating = _still_generating(test)
+      if generating:
+          return generating
+      if request.args.get('cursor'):
+          return _question_page(test, 'questions_json', request.args['cursor'], current_user_id)
+      size = _requested_window_size()
+      snapshot = get_test_snapshot(test.id, test.content_version)
+      active_session = _settle_session(_get_or_start_session(test, current_user_id))
+      questions, window = _session_questions(snapshot, 'questions_json', active_session, size)
+
+      # Shared question list plus this candidate's session state
+      response = snapshot_response(
+          snapshot,
+          {'questions': questions},
+          session_id=active_session.id,
+          current_question_index=active_session.current_question_index,
+          saved_answers=_saved_answers(active_session),
+          last_save_seq=active_session.last_save_seq,
+          **window,
+          **_clock_fields(active_session)
+      )
+      return _session_content(_with_clock(response, active_session))
 
-      # Get or create session
-      if not active_session:
-          active_session = TestSession(
-              test_id=test_id,
-              user_id=current_user_id,
-              start_time=datetime.utcnow(),
-              status='in_progress',
-              remaining_time=test.duration_minutes * 60,
-              current_question_index=0
-          )
-          db.session.add(active_session)
-          db.session.commit()
+  except ValueError as e:
+      return jsonify({'error': str(e)}), 400
+  except Exception as e:
+      logger.error(f"Error fetching test questions: {str(e)}")
+      return jsonify({'error': 'Failed to fetch test questions'}), 500
 
-      # Get questions
-      questions = Question.query.filter_by(test_id=test_id).order_by(Question.order).all()
-      
-      # Get saved answers
-      saved_answers = {}
-      if active_session:
-          responses = QuestionResponse.query.filter_by(session_id=active_session.id).all()
-          for response in responses:
-              if response.text_response:
-                  saved_answers[response.question_id] = response.text_response
-              else:
-                  selected_options = [opt.option_id for opt in response.selected_options]
-                  if len(selected_options) == 1:
-                      saved_answers[response.question_id] = selected_options[0]
-                  else:
-                      saved_answers[response.question_id] = selected_options
 
-      # Format questions
-      questions_data = []
-      for question in questions:
-          question_data = {
-              'id': question.id,
-              'question_text': question.question_text,
-              'question_type': question.question_type.value,
-              'points': question.points,
-              'order': question.order,
-              'explanation': question.explanation,
-              'options': []
-          }
-          
-          if question.question_type in [QuestionType.SINGLE_MCQ, QuestionType.MULTIPLE_MCQ, QuestionType.YES_NO]:
-              options = QuestionOption.query.filter_by(question_id=question.id).order_by(QuestionOption.order).all()
-              question_data['options'] = [
-                  {
-                      'id': opt.id,
-                      'text': opt.option_text,
-                      'is_correct': opt.is_correct
-                  }
-                  for opt in options
-              ]
-          
-          questions_data.append(question_data)
+@test_routes.route('/<int:test_id>/bootstrap', methods=['GET'], endpoint='get_exam_bootstrap')
+@jwt_required()
+def get_exam_bootstrap(test_id):
+  """Everything the take-test page needs in one response
 
-      return jsonify({
-          'questions': questions_data,
-          'session_id': active_session.id,
-          'current_question_index': active_session.current_question_index,
-          'remaining_time': active_session.remaining_time,
-          'saved_answers': saved_answers
-      }), 200
+  Test details, candidate-facing questions (no answers or explanations)
+  and the candidate's session: id, position, remaining time (and whether
+  the clock is paused) and saved answers. Starts a session if there is none in progress. Takes the same
+  window and cursor parameters as get_test_questions.
+  """
+  try:
+      current_user_id = get_jwt_identity()
+      test = Test.query.get_or_404(test_id)
+      generating = _still_generating(test)
+      if generating:
+          return generating
+      if request.args.get('cursor'):
+          return _question_page(test, 'candidate_json', request.args['cursor'], current_user_id)
+      size = _requested_window_size()
+      snapshot = get_test_snapshot(test.id, test.content_version)
+      active_session = _settle_session(_get_or_start_session(test, current_user_id))
+      questions, window = _session_questions(snapshot, 'candidate_json', active_session, size)
+
+      response = snapshot_response(
+          snapshot,
+          {'test': snapshot.meta_json, 'questions': questions},
+          session_id=active_session.id,
+          current_question_index=active_session.current_question_index,
+          saved_answers=_saved_answers(active_session),
+          last_save_seq=active_session.last_save_seq,
+          **window,
+          **_clock_fields(active_session)
+      )
+      return _session_content(_with_clock(response, active_session))
 
+  except ValueError as e:
+      return jsonify({'error': str(e)}), 400
   except Exception as e:
-      logger.error(f"Error fetching test questions: {str(e)}")
-      return jsonify({'error': 'Failed to fetch test questions'}), 500
+      logger.error(f"Error bootstrapping test: {str(e)}")
+      return jsonify({'error': 'Failed to load test'}), 500
 
 
 @test_routes.route('/<int:test_id>/progress', methods=['POST'])
 @jwt_required()
 def update_progress(test_id):
+  """Autosave a session's position and changed answers
+
+  See save_progress() for the protocol. The server keeps the clock, so a
+  remaining_time sent along is ignored.
+  """
   try:
       current_user_id = get_jwt_identity()
       data = request.get_json()
-      
-      session = TestSession.query.filter(
-          and_(
-              TestSession.test_id == test_id,
-              TestSession.user_id == current_user_id,
-              TestSession.status == 'in_progress'
-          )
-      ).first()
+      session = _active_session(test_id, current_user_id)
 
       if not session:
           return jsonify({'error': 'No active session found'}), 404
 
-      # Update session
-      session.remaining_time = data['remaining_time']
-      session.current_question_index = data['current_question_index']
-      
-      # Save answers
-      for question_id, answer in data['answers'].items():
-          question_id = int(question_id)
-          
-          # Get or create response
-          response = QuestionResponse.query.filter_by(
-              session_id=session.id,
-              question_id=question_id
-          ).first()
-          
-          if not response:
-              response = QuestionResponse(
-                  session_id=session.id,
-                  question_id=question_id
-              )
-              db.session.add(response)
-              db.session.flush()
-
-          # Clear existing options
-          ResponseOption.query.filter_by(response_id=response.id).delete()
-
-          # Save new response
-          if isinstance(answer, list):
-              for option_id in answer:
-                  option = ResponseOption(
-                      response_id=response.id,
-                      option_id=option_id
-                  )
-                  db.session.add(option)
-          elif isinstance(answer, str):
-              response.text_response = answer
-          else:
-              option = ResponseOption(
-                  response_id=response.id,
-                  option_id=answer
-              )
-              db.session.add(option)
-
-      db.session.commit()
-      return jsonify({'message': 'Progress saved successfully'}), 200
+      reply, status = save_progress(session, data)
+      return jsonify(reply), status
 
+  except ValueError as e:
+      db.session.rollback()
+      return jsonify({'error': str(e)}), 400
   except Exception as e:
       db.session.rollback()
       logger.error(f"Error updating progress: {str(e)}")
       return jsonify({'error': f'Failed to update progress: {str(e)}'}), 500
 
 
-
-
-
-
 @test_routes.route('/<int:test_id>/submit', methods=['POST'])
 @jwt_required()
 def submit_test(test_id):
-  """Submit test answers and calculate score"""
+  """Submit test answers and calculate score
+
+  After the deadline (plus EXAM_DEADLINE_GRACE_SECONDS) the answers sent
+  are ignored and the session is graded on what was autosaved in time.
+  """
   try:
       data = request.get_json()
       answers = data.get('answers', {})
-      time_spent = data.get('timeSpent', 0)
       current_user_id = get_jwt_identity()
 
       # Get active session
@@ -518,70 +631,81 @@ def submit_test(test_id):
 
       if not session:
           return jsonify({'error': 'No active test session found'}), 404
+      # Autosaves still in the write-behind journal go in before the submission;
+      # grading without them would lose answers, so a busy journal means retry
+      flushed = flush_session(session.id)
+      if flushed is None:
+          response = jsonify({'error': 'Saved answers are still being applied. Please retry.'})
+          response.headers['Retry-After'] = '1'
+          return response, 503
+      if flushed:
+          db.session.refresh(session)
+      late = is_expired(session, current_app.config.get('EXAM_DEADLINE_GRACE_SECONDS', 30))
+      if late:
+          # Past the deadline only what was autosaved in time counts; the
+          # answers sent now could have been changed after time ran out
+          logger.info(f"Late submission for session {session.id}: grading autosaved answers only")
+          answers = _saved_answers(session)
+      elif session.answer_document is not None:
+          # Autosaved answers exist only in the document until now; what is
+          # submitted goes on top, and all of it is stored as response rows
+          answers = {**session.answer_document, **answers}
 
       # Get test details
       test = Test.query.get_or_404(test_id)
+      questions = {
+          question.id: question
+          for question in Question.query.options(selectinload(Question.options)).filter_by(test_id=test.id)
+      }
       
       # Calculate score
       total_points = 0
       earned_points = 0
+      graded_answers = {}
+      grades = {}
 
       for question_id, answer in answers.items():
-          question = Question.query.get(int(question_id))
+          question = questions.get(int(question_id))
           if not question:
               continue
 
-          # Create question response
-          response = QuestionResponse(
-              session_id=session.id,
-              question_id=int(question_id)
-          )
-          db.session.add(response)
-          db.session.flush()  # Get response ID
-
           if question.question_type == QuestionType.FILL_BLANK:
-              response.text_response = answer
+              graded_answers[question.id] = answer
               # Text responses need manual grading
-              response.is_correct = None
+              grades[question.id] = None
           else:
-              correct_options = set(
-                  opt.id for opt in QuestionOption.query.filter_by(
-                      question_id=question_id, 
-                      is_correct=True
-                  ).all()
-              )
+              correct_options = set(opt.id for opt in question.options if opt.is_correct)
               
               if question.question_type in [QuestionType.SINGLE_MCQ, QuestionType.YES_NO]:
-                  is_correct = int(answer) in correct_options
-                  response.is_correct = is_correct
-                  if answer:
-                      response_option = ResponseOption(
-                          response_id=response.id,
-                          option_id=int(answer)
-                      )
-                      db.session.add(response_option)
+                  selected_option = int(answer) if answer else None
+                  graded_answers[question.id] = selected_option
+                  grades[question.id] = selected_option in correct_options
               
               elif question.question_type == QuestionType.MULTIPLE_MCQ:
-                  selected_options = set(int(opt) for opt in (answer if isinstance(answer, list) else []))
-                  is_correct = selected_options == correct_options
-                  response.is_correct = is_correct
-                  for option_id in selected_options:
-                      response_option = ResponseOption(
-                          response_id=response.id,
-                          option_id=option_id
-                      )
-                      db.session.add(response_option)
+                  if not isinstance(answer, list):
+                      # A single saved selection comes back as a bare option id
+                      answer = [answer] if answer else []
+                  selected_options = set(int(opt) for opt in answer)
+                  graded_answers[question.id] = sorted(selected_options)
+                  grades[question.id] = selected_options == correct_options
 
           total_points += question.points
-          if response.is_correct:
+          if grades[question.id]:
               earned_points += question.points
 
+      # Replaces what autosave stored for these questions
+      save_answers(session.id, graded_answers, grades)
+
       # Calculate score percentage
       score_percentage = (earned_points / total_points * 100) if total_points > 0 else 0
       
       # Update session
       session.end_time = datetime.utcnow()
       session.score = score_percentage
+      # Charged by the server's clock; only sessions without one trust the client
+      time_spent = seconds_used(session, session.end_time)
+      if time_spent is None:
+          time_spent = data.get('timeSpent', 0)
       session.time_spent = time_spent
       session.status = 'completed'
       session.passed = score_percentage >= test.passing_score
@@ -594,7 +718,8 @@ def submit_test(test_id):
           'passed': session.passed,
           'total_points': total_points,
           'earned_points': earned_points,
-          'time_spent': time_spent
+          'time_spent': time_spent,
+          'late': late
       }), 200
 
   except Exception as e:
@@ -622,8 +747,8 @@ def get_session_status(test_id):
       return jsonify({
           'session_id': session.id,
           'status': session.status,
-          'remaining_time': session.remaining_time,
-          'start_time': session.start_time.isoformat()
+          'start_time': session.start_time.isoformat(),
+          **clock_state(session)
       }), 200
 
   except Exception as e:
@@ -631,15 +756,37 @@ def get_session_status(test_id):
       return jsonify({'error': 'Failed to fetch session status'}), 500
 
 
+def _results_cache_headers(response, etag):
+  response.set_etag(etag)
+  response.headers['Cache-Control'] = (
+      f"private, max-age={current_app.config.get('RESULTS_MAX_AGE_SECONDS', 31536000)}, immutable"
+  )
+  return response
+
+
 @test_routes.route('/<int:test_id>/results/<int:session_id>', methods=['GET'])
 @jwt_required()
 def get_test_results(test_id, session_id):
   """Get detailed test results for a specific session"""
   try:
       current_user_id = get_jwt_identity()
+
+      # Completed results never change while the test content stays the same,
+      # so a client holding this version gets a 304 before any ORM work
+      version = db.session.execute(
+          select(Test.content_version).join(TestSession, TestSession.test_id == Test.id).where(
+              TestSession.id == session_id,
+              TestSession.test_id == test_id,
+              TestSession.user_id == current_user_id,
+              TestSession.status == 'completed'
+          )
+      ).scalar()
+      etag = f"results-{session_id}-v{version}"
+      if version is not None and request.if_none_match.contains(etag):
+          return _results_cache_headers(Response(status=304), etag)
       
-      # Get session with validation
-      session = TestSession.query.filter(
+      # Get session with validation, and the test with it
+      row = db.session.query(TestSession, Test).join(Test, TestSession.test_id == Test.id).filter(
           and_(
               TestSession.id == session_id,
               TestSession.test_id == test_id,
@@ -648,11 +795,24 @@ def get_test_results(test_id, session_id):
           )
       ).first()
       
-      if not session:
+      if not row:
           return jsonify({'error': 'Test session not found or not completed'}), 404
-
-      # Get test details
-      test = Test.query.get_or_404(test_id)
+      session, test = row
+
+      # Load questions, options, responses and selections up front (four
+      # queries however long the test is)
+      questions = Question.query.options(selectinload(Question.options)).filter_by(
+          test_id=test_id
+      ).order_by(Question.order, Question.id).all()
+      # Same order the candidate took the test in
+      questions_by_id = {question.id: question for question in questions}
+      questions = [questions_by_id[question_id] for question_id in
+                   question_order(session.shuffle_seed, test.id, list(questions_by_id))]
+      responses_by_question = {
+          response.question_id: response
+          for response in QuestionResponse.query.filter_by(session_id=session_id)
+      }
+      selected_by_response = _selected_options_by_response(session_id)
       
       # Get all questions with responses
       questions_with_responses = []
@@ -662,11 +822,9 @@ def get_test_results(test_id, session_id):
       incorrect_count = 0
       unanswered_count = 0
       
-      for question in test.questions:
-          response = QuestionResponse.query.filter_by(
-              session_id=session_id,
-              question_id=question.id
-          ).first()
+      for question in questions:
+          response = responses_by_question.get(question.id)
+          selected_ids = set(selected_by_response.get(response.id, [])) if response else set()
           
           question_data = {
               'id': question.id,
@@ -680,7 +838,11 @@ def get_test_results(test_id, session_id):
           }
           
           # Get all options for the question
-          options = QuestionOption.query.filter_by(question_id=question.id).all()
+          options_by_id = {option.id: option for option in
+                           sorted(question.options, key=lambda option: (option.order or 0, option.id))}
+          options = [options_by_id[option_id] for option_id in option_order(
+              session.shuffle_seed, question.id, question.question_type.value, list(options_by_id)
+          )]
           has_answer = False
           
           # Add options with user's selection status
@@ -697,10 +859,7 @@ def get_test_results(test_id, session_id):
                       has_answer = bool(response.text_response)
                   else:
                       # Check if this option was selected by user
-                      selected = ResponseOption.query.filter_by(
-                          response_id=response.id,
-                          option_id=option.id
-                      ).first() is not None
+                      selected = option.id in selected_ids
                       option_data['user_selected'] = selected
                       
                       if selected:
@@ -764,7 +923,7 @@ def get_test_results(test_id, session_id):
           'unanswered': unanswered_count
       }
 
-      return jsonify(result_summary), 200
+      return _results_cache_headers(jsonify(result_summary), etag), 200
 
   except Exception as e:
       logger.error(f"Error fetching test results: {str(e)}")
@@ -773,28 +932,59 @@ def get_test_results(test_id, session_id):
 @test_routes.route('/<int:test_id>/session/update-time', methods=['POST'], endpoint='update_session_time')
 @jwt_required()
 def update_session_time(test_id):
-  """Update remaining time for test session"""
+  """Report the session's remaining time
+
+  Kept for older clients. The server keeps the clock now, so the time
+  they send is not stored; they get the server's time back instead.
+  """
   try:
-      data = request.get_json()
-      remaining_time = data.get('remaining_time')
       current_user_id = get_jwt_identity()
-      session = TestSession.query.filter(
-          and_(
-              TestSession.test_id == test_id,
-              TestSession.user_id == current_user_id,
-              TestSession.status == 'in_progress'
-          )
-      ).first()
+      session = _active_session(test_id, current_user_id)
 
       if not session:
           return jsonify({'error': 'No active session found'}), 404
 
-      session.remaining_time = remaining_time
+      return jsonify({'success': True, **clock_state(session)}), 200
+
+  except Exception as e:
+      logger.error(f"Error updating session time: {str(e)}")
+      return jsonify({'error': 'Failed to update session time'}), 500
+
+
+@test_routes.route('/<int:test_id>/sessions/<int:session_id>/<any(pause, resume, extend):action>', methods=['POST'],
+                   endpoint='control_session_clock')
+@jwt_required()
+def control_session_clock(test_id, session_id, action):
+  """Pause, resume or extend a candidate's clock (admins only)
+
+  extend takes {"seconds": n}. Pausing moves no time off the clock until
+  the session is resumed, when its deadline moves back by the pause.
+  """
+  try:
+      user = User.query.get(get_jwt_identity())
+      if not user or user.role != 'admin':
+          return jsonify({'error': 'Unauthorized'}), 403
+
+      session = TestSession.query.filter_by(id=session_id, test_id=test_id, status='in_progress').first()
+      if not session:
+          return jsonify({'error': 'No active session found'}), 404
+      if session.deadline is None:
+          adopt_clock(session, session.test.duration_minutes)
+
+      if action == 'pause':
+          pause_clock(session)
+      elif action == 'resume':
+          resume_clock(session)
+      else:
+          extend_clock(session, (request.get_json(silent=True) or {}).get('seconds'))
       db.session.commit()
 
-      return jsonify({'success': True}), 200
+      return jsonify({'session_id': session.id, **clock_state(session)}), 200
 
+  except ValueError as e:
+      db.session.rollback()
+      return jsonify({'error': str(e)}), 400
   except Exception as e:
       db.session.rollback()
-      logger.error(f"Error updating session time: {str(e)}")
-      return jsonify({'error': 'Failed to update session time'}), 500
\ No newline at end of file
+      logger.error(f"Error controlling session clock: {str(e)}")
+      return jsonify({'error': 'Failed to update session clock'}), 500
@@ -0,0 +1,170 @@
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Characters that can end a run of string content
+_STRING_SPECIAL = re.compile(r'["\\]')
+# Characters that change nesting or enter a string
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+_JSON_START = re.compile(r'[{\[]')
+_NON_SPACE = re.compile(r'\S')
+# A JSON string, or a comma followed only by whitespace and a closer
+_TRAILING_COMMA = re.compile(r'"(?:[^"\\]|\\.)*"|,\s*([}\]])', re.DOTALL)
+
+_decoder = json.JSONDecoder()
+
+
+class QuestionStreamParser:
+    """Incrementally pull complete question objects out of a model reply
+
+    Text may be fed in arbitrary chunks as it streams in. The parser makes a
+    single pass, tracking nesting and string state across chunks, and hands
+    back each question object as soon as its closing brace arrives, so a
+    reply that is cut off part way still yields every question before the
+    break.
+
+    Accepts both ``{"questions": [...]}`` and a bare ``[...]`` array. Text
+    around the JSON (code fences, prose) is ignored, and trailing commas
+    inside a question are tolerated. Objects without a question_text are
+    skipped.
+    """
+
+    def __init__(self):
+        self._text = ''
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+        self._fast_path = True
+        self.done = False
+        self.questions_seen = 0
+
+    def _at_item_level(self):
+        return self._stack == ['{', '['] or self._stack == ['[']
+
+    def feed(self, chunk):
+        """Consume the next piece of text and return any newly completed questions"""
+        if self.done or not chunk:
+            return []
+
+        text = self._text + chunk if self._text else chunk
+        length = len(text)
+        pos = self._pos
+        stack = self._stack
+        completed = []
+
+        while pos < length:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    pos = length
+                    break
+                pos = match.end()
+                if match.group() == '\\':
+                    self._escape = True
+                else:
+                    self._in_string = False
+                continue
+
+            if not stack:
+                # Skip prose until something that opens a JSON object or array
+                match = _JSON_START.search(text, pos)
+                if match is None:
+                    pos = length
+                    break
+                following = _NON_SPACE.search(text, match.end())
+                if following is None:
+                    # Can't tell yet whether this bracket starts the JSON
+                    pos = match.start()
+                    break
+                opener, next_char = match.group(), following.group()
+                if (opener == '{' and next_char in '"}') or (opener == '[' and next_char in '{]'):
+                    stack.append(opener)
+                pos = match.end()
+                continue
+
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                pos = length
+                break
+            char = match.group()
+            pos = match.end()
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if char == '{' and self._at_item_level():
+                    self._item_start = match.start()
+                    if self._fast_path:
+                        # Well-formed, fully arrived items decode in one C-level call;
+                        # anything else is scanned by hand below
+                        try:
+                            question, end = _decoder.raw_decode(text, match.start())
+                        except ValueError:
+                            pass
+                        else:
+                            self._item_start = None
+                            if self._accept(question):
+                                completed.append(question)
+                            pos = end
+                            continue
+                stack.append(char)
+            else:
+                stack.pop()
+                if char == '}' and self._item_start is not None and self._at_item_level():
+                    question = self._decode(text[self._item_start:pos])
+                    if question is not None:
+                        completed.append(question)
+                    self._item_start = None
+                if not stack:
+                    self.done = True
+                    break
+
+        # Drop text that can no longer be part of a pending question
+        keep_from = self._item_start if self._item_start is not None else pos
+        self._text = text[keep_from:] if not self.done else ''
+        self._pos = pos - keep_from
+        if self._item_start is not None:
+            self._item_start = 0
+
+        self.questions_seen += len(completed)
+        return completed
+
+    def _decode(self, raw):
+        try:
+            question = json.loads(raw)
+        except ValueError:
+            # A reply that is malformed once usually is throughout, and every
+            # failed fast decode pays for a scan back to the start of the text
+            # to report the error position, so stop trying it
+            self._fast_path = False
+            try:
+                question = json.loads(_strip_trailing_commas(raw))
+            except ValueError as e:
+                logger.warning(f"Skipping malformed question in AI response: {str(e)}")
+                return None
+        return question if self._accept(question) else None
+
+    @staticmethod
+    def _accept(question):
+        return isinstance(question, dict) and 'question_text' in question
+
+
+def _strip_trailing_commas(raw):
+    return _TRAILING_COMMA.sub(lambda m: m.group(1) or m.group(0), raw)
+
+
+def extract_questions(response_text):
+    """Return every fully formed question in a complete model reply
+
+    Single pass over the text; see QuestionStreamParser for what is
+    tolerated. A truncated reply yields the questions before the cut.
+    """
+    return QuestionStreamParser().feed(response_text)
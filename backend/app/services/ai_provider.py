@@ -0,0 +1,267 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from threading import Lock
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+QUESTION_TYPES = ['single_mcq', 'multiple_mcq', 'fill_blank', 'yes_no']
+
+_FAKE_WORDS = (
+    'array buffer cache channel class closure compiler constant cursor decorator dictionary encoder '
+    'event exception field filter function generator graph handler hash heap index interface iterator '
+    'kernel lambda lattice ledger library lock loop matrix method module monitor mutex network node '
+    'object operator packet parser pipeline pointer process protocol queue record recursion register '
+    'router scheduler schema scope semaphore server signal socket stack stream string struct syntax '
+    'table thread token transaction tree tuple type variable vector version widget window worker'
+).split()
+
+
+class QuestionProvider:
+    """Source of raw question-generation replies
+
+    generate() returns the reply text, or an iterator of text chunks when
+    stream=True. batch distinguishes the concurrent batches of one request,
+    each of which is prompted to cover a different part of the topic.
+    """
+
+    name = None
+
+    def generate(self, prompt, topic, num_questions, batch=0, stream=False):
+        raise NotImplementedError
+
+
+class GeminiProvider(QuestionProvider):
+    """Google Gemini, built on first use
+
+    google.generativeai pulls in grpc and protobuf, so it is only imported
+    here rather than at app start. The model keeps its client (and channel)
+    for the life of the process and is reused by every generation call.
+    """
+
+    name = 'gemini'
+
+    def __init__(self, api_key, model_name, timeout=None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout
+        self._model = None
+        self._lock = Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+                    logger.info(f"Initialised Gemini model in process {os.getpid()}")
+        return self._model
+
+    def generate(self, prompt, topic, num_questions, batch=0, stream=False):
+        # Bounds how long the client itself waits, so abandoned calls free their thread
+        request_options = {'timeout': self.timeout} if self.timeout else None
+        if stream:
+            reply = self.model.generate_content(prompt, stream=True, request_options=request_options)
+            return (chunk.text for chunk in reply)
+        return self.model.generate_content(prompt, request_options=request_options).text
+
+
+class FakeProvider(QuestionProvider):
+    """Deterministic offline provider
+
+    The same topic, count and batch always produce the same questions, in
+    the same code-fenced JSON shape Gemini returns.
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency_ms=0, chunk_size=64):
+        self.latency_ms = latency_ms
+        self.chunk_size = chunk_size
+
+    def build_reply(self, topic, num_questions, batch=0):
+        rng = random.Random(f"{topic}|{num_questions}|{batch}")
+
+        def phrase(words):
+            return ' '.join(rng.choice(_FAKE_WORDS) for _ in range(words))
+
+        questions = []
+        for idx in range(num_questions):
+            question_type = QUESTION_TYPES[rng.randrange(len(QUESTION_TYPES))]
+            if question_type == 'yes_no':
+                options = [{'text': 'Yes', 'is_correct': True}, {'text': 'No', 'is_correct': False}]
+            elif question_type == 'fill_blank':
+                options = [{'text': phrase(2), 'is_correct': True}]
+            else:
+                correct = {rng.randrange(4)}
+                if question_type == 'multiple_mcq':
+                    correct.add(rng.randrange(4))
+                options = [{'text': phrase(3), 'is_correct': opt in correct} for opt in range(4)]
+            questions.append({
+                # Made of random words, so questions are as distinct as real ones
+                'question_text': f"In {topic}, how does {phrase(3)} relate to {phrase(3)}?",
+                'question_type': question_type,
+                'options': options,
+                'explanation': f"Because {phrase(6)}.",
+                'points': 1.0
+            })
+        return "```json\n" + json.dumps({'questions': questions}, indent=2) + "\n```"
+
+    def generate(self, prompt, topic, num_questions, batch=0, stream=False):
+        reply = self.build_reply(topic, num_questions, batch)
+        if stream:
+            return _paced_chunks(_split(reply, self.chunk_size), self.latency_ms)
+        _sleep_ms(self.latency_ms)
+        return reply
+
+
+class ReplayProvider(QuestionProvider):
+    """Serve captured replies from a directory, optionally recording misses
+
+    Each capture is one JSON file named after the request key, holding the
+    reply as the list of chunks it arrived in. With record_from set, a miss
+    is forwarded to that provider and saved; otherwise a miss falls back to
+    any capture for the same question count unless strict is set.
+    """
+
+    name = 'replay'
+
+    def __init__(self, directory, latency_ms=0, record_from=None, strict=False):
+        self.directory = directory
+        self.latency_ms = latency_ms
+        self.record_from = record_from
+        self.strict = strict
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def request_key(prompt, num_questions, batch):
+        return hashlib.sha256(f"{prompt}\x00{num_questions}\x00{batch}".encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, prompt, num_questions, batch):
+        key = self.request_key(prompt, num_questions, batch)
+        path = self._path(key)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)['chunks']
+        if self.record_from is not None or self.strict:
+            return None
+
+        candidates = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                capture = json.load(f)
+            if capture.get('num_questions') == num_questions:
+                candidates.append(capture['chunks'])
+        if not candidates:
+            return None
+        return candidates[int(key, 16) % len(candidates)]
+
+    def _record(self, prompt, topic, num_questions, batch, stream):
+        reply = self.record_from.generate(prompt, topic, num_questions, batch=batch, stream=stream)
+        chunks = list(reply) if stream else [reply]
+        capture = {
+            'provider': self.record_from.name,
+            'topic': topic,
+            'num_questions': num_questions,
+            'batch': batch,
+            'prompt': prompt,
+            'chunks': chunks,
+            'recorded_at': time.time()
+        }
+        key = self.request_key(prompt, num_questions, batch)
+        with self._lock:
+            with open(self._path(key), 'w', encoding='utf-8') as f:
+                json.dump(capture, f)
+        return chunks
+
+    def generate(self, prompt, topic, num_questions, batch=0, stream=False):
+        chunks = self._load(prompt, num_questions, batch)
+        if chunks is None:
+            if self.record_from is None:
+                raise LookupError(f"No captured reply for {num_questions} questions on {topic!r}")
+            chunks = self._record(prompt, topic, num_questions, batch, stream)
+            return iter(chunks) if stream else ''.join(chunks)
+
+        if stream:
+            return _paced_chunks(chunks, self.latency_ms)
+        _sleep_ms(self.latency_ms)
+        return ''.join(chunks)
+
+
+def _split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _sleep_ms(ms):
+    if ms:
+        time.sleep(ms / 1000)
+
+
+def _paced_chunks(chunks, latency_ms):
+    """Spread latency_ms across the chunks the way a streamed reply arrives"""
+    delay = latency_ms / max(len(chunks), 1)
+    for chunk in chunks:
+        _sleep_ms(delay)
+        yield chunk
+
+
+def build_provider(config):
+    """Create the provider selected by QUESTION_PROVIDER"""
+    kind = config.get('QUESTION_PROVIDER', 'gemini')
+    latency_ms = config.get('QUESTION_PROVIDER_LATENCY_MS', 0)
+    replay_dir = config.get('QUESTION_PROVIDER_REPLAY_DIR', 'ai_captures')
+
+    timeout = config.get('AI_CALL_TIMEOUT_SECONDS')
+
+    if kind == 'gemini':
+        return GeminiProvider(config.get('GEMINI_API_KEY'), config.get('GEMINI_MODEL', 'gemini-pro'), timeout)
+    if kind == 'fake':
+        return FakeProvider(latency_ms=latency_ms)
+    if kind == 'replay':
+        return ReplayProvider(replay_dir, latency_ms=latency_ms,
+                              strict=config.get('QUESTION_PROVIDER_REPLAY_STRICT', False))
+    if kind == 'record':
+        upstream = GeminiProvider(config.get('GEMINI_API_KEY'), config.get('GEMINI_MODEL', 'gemini-pro'), timeout)
+        return ReplayProvider(replay_dir, record_from=upstream)
+    raise ValueError(f"Unknown QUESTION_PROVIDER: {kind}")
+
+
+_provider = None
+_provider_lock = Lock()
+
+
+def get_provider():
+    """Return this process's question provider, building it on first use
+
+    Nothing is built before a fork: gunicorn's master never calls this, and
+    a child that inherits a provider drops it and builds its own.
+    """
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = build_provider(current_app.config)
+    return _provider
+
+
+def _reset_after_fork():
+    global _provider, _provider_lock
+    _provider = None
+    _provider_lock = Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
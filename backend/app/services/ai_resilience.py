@@ -0,0 +1,317 @@
+import logging
+import os
+import queue
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from flask import current_app
+
+from app.services.ai_provider import QuestionProvider, get_provider
+from app.services.ai_scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderUnavailableError(Exception):
+    """Raised without calling out while the circuit breaker is open"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"AI provider is unavailable; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class LatencyWindow:
+    """The most recent latency samples, for percentiles"""
+
+    def __init__(self, size=500):
+        self._samples = deque(maxlen=size)
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def summary(self):
+        return {
+            'samples': len(self),
+            'p50_ms': _ms(self.percentile(50)),
+            'p90_ms': _ms(self.percentile(90)),
+            'p99_ms': _ms(self.percentile(99)),
+            'max_ms': _ms(self.percentile(100))
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class CircuitBreaker:
+    """Stop calling a failing provider for a while, then let one trial call through
+
+    Opens after failure_threshold consecutive failures. After reset_timeout
+    seconds it goes half open and admits a single trial call: success closes
+    it, failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_count = 0
+        self._opened_at = None
+        self._trial_started_at = None
+        self._lock = Lock()
+
+    def retry_after(self):
+        if self.state != self.OPEN:
+            return 0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def is_open(self):
+        """True while calls are being refused outright"""
+        with self._lock:
+            return self.state == self.OPEN and self.retry_after() > 0
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now < self._opened_at + self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_started_at = None
+            if self.state == self.HALF_OPEN:
+                # One trial at a time; a trial that never reported back is given up on
+                if self._trial_started_at is not None and now < self._trial_started_at + self.reset_timeout:
+                    return False
+                self._trial_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("AI provider recovered; circuit breaker closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"AI provider failing ({self.failures} in a row); circuit breaker open "
+                                   f"for {self.reset_timeout}s")
+                    self.opened_count += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_started_at = None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.opened_count,
+                'retry_after_seconds': round(self.retry_after(), 1)
+            }
+
+
+_END = object()
+
+
+class ResilientProvider(QuestionProvider):
+    """Bound every provider call by a deadline, hedge slow ones, and trip a breaker
+
+    Each call runs on a worker thread so the caller can stop waiting at
+    the deadline even if the upstream client does not. If nothing has
+    arrived after the hedge delay, a second identical call is made and
+    whichever answers first is used; hedges are capped at hedge_ratio of
+    all calls and need a free token from the scheduler. The hedge delay is
+    hedge_after seconds, or when that is 0 the recent p95 time to first
+    reply.
+    """
+
+    def __init__(self, provider, breaker, timeout=90, hedge_after=0, hedge_ratio=0.1,
+                 workers=8, scheduler=None):
+        self.provider = provider
+        self.name = provider.name
+        self.breaker = breaker
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.hedge_ratio = hedge_ratio
+        self.scheduler = scheduler
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-call')
+
+        self.latency = LatencyWindow()
+        self.first_reply = {False: LatencyWindow(), True: LatencyWindow()}
+        self._counts_lock = Lock()
+        self.counts = {'calls': 0, 'failures': 0, 'timeouts': 0, 'rejected': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    def _count(self, name):
+        with self._counts_lock:
+            self.counts[name] += 1
+
+    def _hedge_delay(self, stream):
+        if self.hedge_ratio <= 0:
+            return None
+        if self.hedge_after > 0:
+            return self.hedge_after
+        window = self.first_reply[stream]
+        return window.percentile(95) if len(window) >= 20 else None
+
+    def _may_hedge(self):
+        with self._counts_lock:
+            if self.counts['hedges'] >= self.hedge_ratio * self.counts['calls']:
+                return False
+        return self.scheduler is None or self.scheduler.try_take_token()
+
+    def _attempt(self, attempt, arrivals, prompt, topic, num_questions, batch, stream):
+        try:
+            reply = self.provider.generate(prompt, topic, num_questions, batch=batch, stream=stream)
+            for chunk in [reply] if isinstance(reply, str) else reply:
+                arrivals.put((attempt, chunk))
+            arrivals.put((attempt, _END))
+        except Exception as e:
+            arrivals.put((attempt, e))
+
+    def _run(self, prompt, topic, num_questions, batch, stream):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        hedge_delay = self._hedge_delay(stream)
+        hedge_at = start + hedge_delay if hedge_delay is not None else None
+        arrivals = queue.Queue()
+        args = (arrivals, prompt, topic, num_questions, batch, stream)
+
+        self._count('calls')
+        self._executor.submit(self._attempt, 0, *args)
+        attempts, failed, winner = 1, 0, None
+        try:
+            while True:
+                wait_until = min(deadline, hedge_at) if hedge_at is not None else deadline
+                try:
+                    attempt, item = arrivals.get(timeout=max(0.0, wait_until - time.monotonic()))
+                except queue.Empty:
+                    if time.monotonic() >= deadline:
+                        self._count('timeouts')
+                        raise TimeoutError(f"AI call exceeded its {self.timeout}s deadline")
+                    hedge_at = None
+                    if self._may_hedge():
+                        self._count('hedges')
+                        self._executor.submit(self._attempt, attempts, *args)
+                        attempts += 1
+                    continue
+
+                if winner is not None and attempt != winner:
+                    continue
+                if isinstance(item, Exception):
+                    failed += 1
+                    if winner is None and failed < attempts:
+                        continue
+                    raise item
+                if item is _END:
+                    break
+                if winner is None:
+                    winner = attempt
+                    hedge_at = None
+                    self.first_reply[stream].add(time.monotonic() - start)
+                    if attempt:
+                        self._count('hedge_wins')
+                yield item
+        except Exception:
+            self._count('failures')
+            self.breaker.record_failure()
+            raise
+
+        self.latency.add(time.monotonic() - start)
+        self.breaker.record_success()
+
+    def generate(self, prompt, topic, num_questions, batch=0, stream=False):
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise ProviderUnavailableError(self.breaker.retry_after())
+        chunks = self._run(prompt, topic, num_questions, batch, stream)
+        return chunks if stream else ''.join(chunks)
+
+    def snapshot(self):
+        with self._counts_lock:
+            counts = dict(self.counts)
+        return {
+            'provider': self.name,
+            'timeout_seconds': self.timeout,
+            **counts,
+            'latency': self.latency.summary(),
+            'first_reply': {
+                'blocking': self.first_reply[False].summary(),
+                'streaming': self.first_reply[True].summary()
+            },
+            'circuit_breaker': self.breaker.snapshot()
+        }
+
+
+_breaker = None
+_resilient_provider = None
+_lock = Lock()
+
+
+def get_breaker():
+    """Return this process's circuit breaker for the question provider"""
+    global _breaker
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                config = current_app.config
+                _breaker = CircuitBreaker(
+                    failure_threshold=config.get('AI_BREAKER_FAILURES', 5),
+                    reset_timeout=config.get('AI_BREAKER_RESET_SECONDS', 30)
+                )
+    return _breaker
+
+
+def get_resilient_provider():
+    """Return the question provider wrapped with deadlines, hedging and the breaker"""
+    global _resilient_provider
+    if _resilient_provider is None:
+        breaker = get_breaker()
+        provider = get_provider()
+        scheduler = get_scheduler()
+        with _lock:
+            if _resilient_provider is None:
+                config = current_app.config
+                _resilient_provider = ResilientProvider(
+                    provider,
+                    breaker,
+                    timeout=config.get('AI_CALL_TIMEOUT_SECONDS', 90),
+                    hedge_after=config.get('AI_HEDGE_AFTER_SECONDS', 0),
+                    hedge_ratio=config.get('AI_HEDGE_MAX_RATIO', 0.1),
+                    workers=config.get('AI_CALL_WORKERS', 8),
+                    scheduler=scheduler
+                )
+    return _resilient_provider
+
+
+def _reset_after_fork():
+    global _breaker, _resilient_provider, _lock
+    _breaker = None
+    _resilient_provider = None
+    _lock = Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
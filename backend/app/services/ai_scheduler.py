@@ -0,0 +1,280 @@
+import heapq
+import itertools
+import logging
+import os
+import time
+from threading import Condition, Lock
+
+from flask import current_app
+
+from app.services.ai_provider import QuestionProvider
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first; requests within a lane are served in arrival order
+LANES = {'interactive': 0, 'bulk': 1}
+
+
+class _Flight:
+    """One upstream call, shared by every identical request made while it runs
+
+    The reply is buffered chunk by chunk so requests that join late still
+    see all of it, and streamed followers see chunks as they arrive.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._cond = Condition()
+
+    def push(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def follow(self, timeout):
+        """Yield the reply as it arrives, giving up once timeout seconds have passed"""
+        idx = 0
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while idx >= len(self.chunks) and not self.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Waited {timeout}s for a shared AI request")
+                    self._cond.wait(remaining)
+                if idx < len(self.chunks):
+                    chunk = self.chunks[idx]
+                    idx += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield chunk
+
+
+class AIScheduler:
+    """Process-wide gate in front of the question-generation provider
+
+    Every upstream call takes a token from a bucket refilled at
+    rate_per_minute (holding at most burst tokens) and one of
+    max_concurrency slots. Callers that cannot go yet wait in line rather
+    than fail: interactive requests ahead of bulk ones, first come first
+    served within a lane, up to queue_timeout seconds. Identical requests
+    made while one is already in flight join it instead of calling out
+    again, waiting at most as long as the call could take to queue and
+    run (queue_timeout plus call_timeout).
+
+    The limits apply per process, so with several workers each should get
+    its share of the upstream quota.
+    """
+
+    def __init__(self, rate_per_minute=0, burst=1, max_concurrency=4, queue_timeout=300, call_timeout=90):
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.call_timeout = call_timeout
+
+        self._cond = Condition()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._active = 0
+        self._waiting = []
+        self._tickets = itertools.count()
+
+        self._flights = {}
+        self._flights_lock = Lock()
+
+        self.calls = 0
+        self.coalesced = 0
+        self.queued_seconds = 0.0
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        else:
+            self._tokens = float(self.burst)
+        self._refilled_at = now
+
+    def _acquire(self, priority):
+        ticket = (LANES.get(priority, LANES['bulk']), next(self._tickets))
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = None
+                    if self._waiting[0] == ticket and self._active < self.max_concurrency:
+                        if self._tokens >= 1:
+                            break
+                        wait = (1 - self._tokens) / self.rate
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise TimeoutError(f"Waited {self.queue_timeout}s for an AI request slot")
+                    self._cond.wait(min(wait, remaining) if wait is not None else remaining)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            self._tokens -= 1
+            self._active += 1
+            self.calls += 1
+            self.queued_seconds += time.monotonic() - start
+            # The next in line may be able to go too
+            self._cond.notify_all()
+
+    def try_take_token(self):
+        """Take a rate-limit token if one is free right now, without queueing"""
+        with self._cond:
+            self._refill(time.monotonic())
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _lead(self, key, flight, call, priority):
+        error = None
+        try:
+            self._acquire(priority)
+            try:
+                reply = call()
+                for chunk in [reply] if isinstance(reply, str) else reply:
+                    flight.push(chunk)
+                    yield chunk
+            finally:
+                self._release()
+        except Exception as e:
+            error = e
+            raise
+        except BaseException:
+            # Closed before the reply was read in full; followers must retry
+            error = RuntimeError('Shared AI request was abandoned')
+            raise
+        finally:
+            with self._flights_lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.finish(error)
+
+    def _join(self, key, call, priority):
+        # Decided when the reply is first read, so a request that is never
+        # read never leaves a flight behind for others to wait on
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            yield from self._lead(key, flight, call, priority)
+        else:
+            yield from flight.follow(self.queue_timeout + self.call_timeout)
+
+    def submit(self, key, call, priority='interactive', stream=False):
+        """Run call() once the limits allow, sharing it with identical concurrent requests
+
+        Args:
+            key: Identifies requests whose replies are interchangeable
+            call: Makes the upstream request; returns the reply text or an iterator of chunks
+            priority: Lane to queue in ('interactive' or 'bulk')
+            stream: Return the reply as an iterator of chunks instead of text
+
+        Returns:
+            str or iterator: The reply, as call() would return it for stream
+
+        Raises:
+            TimeoutError: If no slot became free within queue_timeout, or a
+                shared request did not finish in time
+        """
+        chunks = self._join(key, call, priority)
+        return chunks if stream else ''.join(chunks)
+
+    def snapshot(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            waiting = {lane: 0 for lane in LANES}
+            names = {rank: lane for lane, rank in LANES.items()}
+            for rank, _ in self._waiting:
+                waiting[names[rank]] += 1
+            return {
+                'active': self._active,
+                'max_concurrency': self.max_concurrency,
+                'waiting': waiting,
+                'tokens': round(self._tokens, 2),
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'queued_seconds': round(self.queued_seconds, 3)
+            }
+
+
+class ScheduledProvider(QuestionProvider):
+    """Route a provider's calls through an AIScheduler in one priority lane
+
+    Identical calls (same provider, prompt, count and batch) that overlap
+    share one upstream request.
+    """
+
+    def __init__(self, provider, scheduler, priority='interactive'):
+        self.provider = provider
+        self.scheduler = scheduler
+        self.priority = priority
+        self.name = provider.name
+
+    def generate(self, prompt, topic, num_questions, batch=0, stream=False):
+        return self.scheduler.submit(
+            (self.name, prompt, num_questions, batch),
+            lambda: self.provider.generate(prompt, topic, num_questions, batch=batch, stream=stream),
+            priority=self.priority,
+            stream=stream
+        )
+
+
+_scheduler = None
+_scheduler_lock = Lock()
+
+
+def get_scheduler():
+    """Return this process's AI request scheduler, building it from config on first use"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                config = current_app.config
+                _scheduler = AIScheduler(
+                    rate_per_minute=config.get('AI_RATE_LIMIT_PER_MINUTE', 0),
+                    burst=config.get('AI_RATE_BURST', 1),
+                    max_concurrency=config.get('AI_MAX_CONCURRENCY', 4),
+                    queue_timeout=config.get('AI_QUEUE_TIMEOUT_SECONDS', 300),
+                    call_timeout=config.get('AI_CALL_TIMEOUT_SECONDS', 90)
+                )
+    return _scheduler
+
+
+def _reset_after_fork():
+    global _scheduler, _scheduler_lock
+    _scheduler = None
+    _scheduler_lock = Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,341 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import time
+from threading import Event, Lock, Thread, local
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from app.extensions import db
+from app.models.test import TestSession
+from app.services.session_answers import answer_document_patch, save_answers
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock file, so run a single process per journal
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL,
+    seq INTEGER,
+    changes TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_saves_session ON saves (session_id, id);
+"""
+
+
+class AutosaveJournal:
+    """Write-behind buffer for autosaves, kept in a local SQLite (WAL) file
+
+    append() journals a save and returns as soon as it is on disk; a
+    background thread applies journaled saves to the database every
+    flush_interval seconds, merged per session (later answers win) and all
+    in one transaction. Saves left over by a crashed or restarted worker
+    are simply the first ones the next flush applies.
+
+    Worker processes on a host share the file. A lock file lets only one
+    of them flush at a time, so a session's saves are applied in order.
+    Saves not newer than the session's last_save_seq, and saves for
+    sessions that are no longer in progress, are discarded at flush time.
+    """
+
+    def __init__(self, app, path, flush_interval=1.0, batch_size=5000, lock_timeout=10.0):
+        self.app = app
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.lock_timeout = lock_timeout
+        self._local = local()
+        self._flush_lock = Lock()
+        self._lock_file = open(f"{path}.lock", 'a') if fcntl is not None else None
+        self._stop = Event()
+        self._thread = None
+        self._pid = os.getpid()
+        self.appended = 0
+        self.stale = 0
+        self.applied = 0
+        self.discarded = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Durable across process crashes; an OS crash may lose the last few saves
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def append(self, session_id, seq, changes, fields, applied_seq):
+        """Journal one save unless it is stale
+
+        Args:
+            session_id: The session saved
+            seq: The save's sequence number, or None for a save that is
+                always applied in arrival order
+            changes: Question id -> answer, as save_answers() takes them
+            fields: TestSession columns to set, e.g. current_question_index
+            applied_seq: The session's last_save_seq in the database
+
+        Returns:
+            tuple: (accepted, the session's latest acknowledged seq)
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            pending = conn.execute('SELECT MAX(seq) FROM saves WHERE session_id = ?', (session_id,)).fetchone()[0]
+            latest = max(applied_seq, pending or 0)
+            if seq is not None and seq <= latest:
+                conn.execute('ROLLBACK')
+                self.stale += 1
+                return False, latest
+            conn.execute(
+                'INSERT INTO saves (session_id, seq, changes, fields, created_at) VALUES (?, ?, ?, ?, ?)',
+                (session_id, seq, json.dumps(changes), json.dumps(fields), time.time())
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self.appended += 1
+        return True, seq if seq is not None else latest
+
+    def _acquire(self, block):
+        if not self._flush_lock.acquire(timeout=self.lock_timeout if block else 0):
+            return False
+        if self._lock_file is None:
+            return True
+        deadline = time.monotonic() + (self.lock_timeout if block else 0)
+        while True:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    self._flush_lock.release()
+                    return False
+                time.sleep(0.005)
+
+    def _release(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._flush_lock.release()
+
+    def flush(self, session_id=None, block=False):
+        """Apply journaled saves to the database
+
+        Args:
+            session_id: Only flush this session's saves
+            block: Wait (up to lock_timeout) while another flush runs,
+                instead of leaving the work to it
+
+        Returns:
+            The number of journaled saves flushed, or None if another
+            flush held the journal
+        """
+        if not self._acquire(block):
+            return None
+        try:
+            conn = self._connection()
+            if session_id is None:
+                rows = conn.execute(
+                    'SELECT id, session_id, seq, changes, fields FROM saves ORDER BY id LIMIT ?', (self.batch_size,)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    'SELECT id, session_id, seq, changes, fields FROM saves WHERE session_id = ? ORDER BY id',
+                    (session_id,)
+                ).fetchall()
+            if not rows:
+                return 0
+
+            by_session = {}
+            for row in rows:
+                by_session.setdefault(row[1], []).append(row)
+            with self.app.app_context():
+                try:
+                    self._apply(by_session)
+                    done = rows
+                except Exception as e:
+                    # Isolate the session that fails; the rest still go in
+                    db.session.rollback()
+                    logger.error(f"Autosave batch flush failed, retrying per session: {str(e)}")
+                    done = []
+                    for sid, saves in by_session.items():
+                        try:
+                            self._apply({sid: saves})
+                            done.extend(saves)
+                        except Exception as e:
+                            db.session.rollback()
+                            self.flush_errors += 1
+                            logger.error(f"Autosave flush failed for session {sid}: {str(e)}")
+
+            done_ids = [row[0] for row in done]
+            for start in range(0, len(done_ids), 500):
+                chunk = done_ids[start:start + 500]
+                conn.execute(f"DELETE FROM saves WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            self.flushes += 1
+            return len(done_ids)
+        finally:
+            self._release()
+
+    def _apply(self, by_session):
+        """Merge each session's saves and write them all in one transaction"""
+        sessions = {
+            sid: (applied_seq, in_document)
+            for sid, applied_seq, in_document in db.session.execute(
+                select(TestSession.id, TestSession.last_save_seq, TestSession.answer_document.isnot(None)).where(
+                    TestSession.id.in_(list(by_session)),
+                    TestSession.status == 'in_progress'
+                )
+            )
+        }
+        applied = discarded = 0
+        for sid, saves in by_session.items():
+            if sid not in sessions:
+                # Submitted or deleted since; its answers were taken from the submission
+                discarded += len(saves)
+                continue
+            applied_seq, in_document = sessions[sid]
+            changes, fields, max_seq = {}, {}, None
+            for _, _, seq, row_changes, row_fields in saves:
+                if seq is not None:
+                    if seq <= applied_seq:
+                        discarded += 1
+                        continue
+                    max_seq = seq if max_seq is None else max(max_seq, seq)
+                changes.update(json.loads(row_changes))
+                fields.update(json.loads(row_fields))
+                applied += 1
+            if max_seq is not None:
+                fields['last_save_seq'] = max_seq
+            if in_document and changes:
+                fields['answer_document'] = answer_document_patch(changes)
+            if fields:
+                db.session.execute(
+                    update(TestSession).where(TestSession.id == sid).values(**fields),
+                    execution_options={'synchronize_session': False}
+                )
+            if not in_document:
+                save_answers(sid, changes)
+        db.session.commit()
+        self.applied += applied
+        self.discarded += discarded
+
+    def pending(self):
+        return self._connection().execute('SELECT COUNT(*) FROM saves').fetchone()[0]
+
+    def _run(self):
+        while True:
+            try:
+                # Drain a backlog (e.g. replaying after a restart) batch by batch
+                while self.flush() == self.batch_size:
+                    pass
+            except Exception as e:
+                self.flush_errors += 1
+                logger.error(f"Autosave flush failed: {str(e)}")
+            if self._stop.wait(self.flush_interval):
+                return
+
+    def start(self):
+        self._thread = Thread(target=self._run, name='autosave-flush', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the flusher after one last flush; anything left is replayed next start"""
+        if os.getpid() != self._pid:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.lock_timeout)
+        try:
+            self.flush(block=True)
+        except Exception as e:
+            logger.error(f"Final autosave flush failed: {str(e)}")
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'pending': self.pending(),
+            'appended': self.appended,
+            'stale': self.stale,
+            'applied': self.applied,
+            'discarded': self.discarded,
+            'flushes': self.flushes,
+            'flush_errors': self.flush_errors
+        }
+
+
+_journal = None
+_journal_lock = Lock()
+
+
+def get_autosave_journal(app=None):
+    """Return this process's autosave journal, or None when write-behind is off
+
+    Nothing is opened when the app is created: the first call (the first
+    save or session read, or gunicorn's post_worker_init in a web worker)
+    opens the journal and starts its flusher, which begins by applying
+    whatever an earlier process left behind.
+    """
+    global _journal
+    app = app or current_app._get_current_object()
+    path = app.config.get('AUTOSAVE_JOURNAL_PATH')
+    if not path:
+        return None
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                journal = AutosaveJournal(
+                    app,
+                    path,
+                    flush_interval=app.config.get('AUTOSAVE_FLUSH_INTERVAL_SECONDS', 1.0),
+                    batch_size=app.config.get('AUTOSAVE_FLUSH_BATCH_SIZE', 5000)
+                )
+                journal.start()
+                atexit.register(journal.close)
+                _journal = journal
+    return _journal
+
+
+def flush_session(session_id, block=True):
+    """Apply a session's journaled saves before its state is read or submitted
+
+    Args:
+        session_id: The session whose saves to apply
+        block: Wait (up to the journal's lock_timeout) while another flush runs
+
+    Returns:
+        int: The number of saves applied (0 when write-behind is off), or
+        None if the journal stayed busy and the saves are still pending
+    """
+    journal = get_autosave_journal()
+    if journal is None:
+        return 0
+    flushed = journal.flush(session_id, block=block)
+    if flushed is None and block:
+        logger.warning(f"Autosave journal busy; session {session_id} still has pending saves")
+    return flushed
+
+
+def _reset_after_fork():
+    # The flusher thread and SQLite connections do not survive a fork
+    global _journal, _journal_lock
+    _journal = None
+    _journal_lock = Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
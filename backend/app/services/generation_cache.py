@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import re
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.extensions import db
+from app.models.test import GeneratedQuestionSet
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_topic(topic):
+    """Collapse case and whitespace so trivially different topics share an entry"""
+    return re.sub(r'\s+', ' ', topic).strip().strip('.?!').casefold()
+
+
+def cache_key(topic, num_questions, prompt_version):
+    raw = f"{prompt_version}\x00{normalize_topic(topic)}\x00{int(num_questions)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _max_age():
+    return timedelta(days=current_app.config.get('GENERATION_CACHE_MAX_AGE_DAYS', 30))
+
+
+def get_cached_questions(topic, num_questions, prompt_version, allow_stale=False):
+    """Return a previously generated question set, or None on a miss
+
+    Entries older than GENERATION_CACHE_MAX_AGE_DAYS are treated as misses,
+    unless allow_stale is set (the provider is down and an old set beats
+    none); the fresh set stored afterwards replaces them.
+    """
+    if not current_app.config.get('GENERATION_CACHE_ENABLED', True):
+        return None
+
+    entry = db.session.get(GeneratedQuestionSet, cache_key(topic, num_questions, prompt_version))
+    if entry is None:
+        return None
+
+    now = datetime.utcnow()
+    if entry.created_at < now - _max_age() and not allow_stale:
+        return None
+
+    entry.hit_count += 1
+    entry.last_used_at = now
+    return entry.questions
+
+
+def has_cached_questions(topic, num_questions, prompt_version):
+    """Whether any set, however old, is cached for this request (does not count as a hit)"""
+    if not current_app.config.get('GENERATION_CACHE_ENABLED', True):
+        return False
+    return db.session.query(
+        GeneratedQuestionSet.query.filter_by(cache_key=cache_key(topic, num_questions, prompt_version)).exists()
+    ).scalar()
+
+
+def store_questions(topic, num_questions, prompt_version, questions):
+    """Save a generated question set and evict old or surplus entries
+
+    Runs inside the caller's transaction so a set that later fails to
+    persist as a test is never cached.
+    """
+    if not current_app.config.get('GENERATION_CACHE_ENABLED', True):
+        return
+
+    now = datetime.utcnow()
+    db.session.merge(GeneratedQuestionSet(
+        cache_key=cache_key(topic, num_questions, prompt_version),
+        topic=normalize_topic(topic),
+        num_questions=int(num_questions),
+        prompt_version=prompt_version,
+        questions=questions,
+        hit_count=0,
+        created_at=now,
+        last_used_at=now
+    ))
+    db.session.flush()
+    evict_expired_entries(now)
+
+
+def evict_expired_entries(now=None):
+    """Drop entries past the age limit, then the least recently used beyond the size limit"""
+    now = now or datetime.utcnow()
+    max_entries = current_app.config.get('GENERATION_CACHE_MAX_ENTRIES', 500)
+
+    expired = GeneratedQuestionSet.query.filter(
+        GeneratedQuestionSet.created_at < now - _max_age()
+    ).delete(synchronize_session=False)
+
+    surplus = GeneratedQuestionSet.query.count() - max_entries
+    if surplus > 0:
+        # Keys first, then a plain IN list: MySQL rejects LIMIT inside an IN subquery
+        stale_keys = [row.cache_key for row in GeneratedQuestionSet.query.with_entities(
+            GeneratedQuestionSet.cache_key
+        ).order_by(GeneratedQuestionSet.last_used_at).limit(surplus)]
+        GeneratedQuestionSet.query.filter(
+            GeneratedQuestionSet.cache_key.in_(stale_keys)
+        ).delete(synchronize_session=False)
+
+    if expired or surplus > 0:
+        logger.info(f"Generation cache evicted {expired} expired and {max(surplus, 0)} surplus entries")
@@ -0,0 +1,283 @@
+import logging
+import os
+import re
+import zlib
+from array import array
+from collections import OrderedDict
+from random import Random
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models.test import Question, QuestionOption, Test
+from app.services.generation_cache import normalize_topic
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 31) - 1
+
+# Fixed seed so signatures are comparable across processes and restarts
+_rng = Random(1733)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+SHINGLE_CHARS = 5
+_NON_WORD = re.compile(r'\W+')
+
+
+def shingles(text):
+    """Hash the overlapping SHINGLE_CHARS-character runs of a text, ignoring case and punctuation"""
+    text = _NON_WORD.sub(' ', text.casefold()).strip()
+    if len(text) <= SHINGLE_CHARS:
+        grams = [text] if text else []
+    else:
+        grams = [text[i:i + SHINGLE_CHARS] for i in range(len(text) - SHINGLE_CHARS + 1)]
+    return {zlib.crc32(gram.encode('utf-8')) for gram in grams}
+
+
+def _normalized(text):
+    return _NON_WORD.sub(' ', str(text).casefold()).strip()
+
+
+def fingerprint(q_data):
+    """The text a question is compared by, and the key of its correct answer
+
+    The text is the stem followed by every option, so questions that only
+    share a stem template do not match on it. Two questions are only ever
+    duplicates when their correct answers are the same as well.
+
+    Returns:
+        tuple: (text, answer key)
+    """
+    options = q_data.get('options') or []
+    text = ' | '.join([str(q_data.get('question_text', ''))] + [str(opt.get('text', '')) for opt in options])
+    answer = '\x1f'.join(sorted(_normalized(opt.get('text', '')) for opt in options if opt.get('is_correct')))
+    return text, answer
+
+
+def signature(text):
+    """MinHash signature of a question text (NUM_PERM 31-bit values)"""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    return array('I', [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS])
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+class MinHashIndex:
+    """LSH index over MinHash signatures for sub-linear near-duplicate lookup
+
+    Signatures are split into BANDS bands of ROWS values; two questions
+    become candidates when any band matches exactly, and candidates are
+    then confirmed against the similarity threshold and, when one is
+    given, the answer key.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self._signatures = {}
+        self._answers = {}
+        self._buckets = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    @staticmethod
+    def _band_keys(sig):
+        return [(band, hash(tuple(sig[band * ROWS:(band + 1) * ROWS]))) for band in range(BANDS)]
+
+    def add(self, key, text=None, sig=None, answer=None):
+        sig = sig if sig is not None else signature(text)
+        if sig is None:
+            return
+        with self._lock:
+            self._signatures[key] = sig
+            self._answers[key] = answer
+            for band_key in self._band_keys(sig):
+                self._buckets.setdefault(band_key, []).append(key)
+
+    def discard(self, key):
+        with self._lock:
+            sig = self._signatures.pop(key, None)
+            self._answers.pop(key, None)
+            if sig is None:
+                return
+            for band_key in self._band_keys(sig):
+                bucket = self._buckets.get(band_key)
+                if bucket and key in bucket:
+                    bucket.remove(key)
+                    if not bucket:
+                        del self._buckets[band_key]
+
+    def clear(self):
+        with self._lock:
+            self._signatures.clear()
+            self._answers.clear()
+            self._buckets.clear()
+
+    def query(self, text=None, sig=None, answer=None):
+        """Return (key, similarity) for indexed questions at or above the threshold
+
+        With an answer key, only questions indexed with the same one match.
+        """
+        sig = sig if sig is not None else signature(text)
+        if sig is None:
+            return []
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(sig):
+                candidates.update(self._buckets.get(band_key, ()))
+            if answer is not None:
+                candidates = {key for key in candidates if self._answers[key] == answer}
+            matches = [(key, similarity(sig, self._signatures[key])) for key in candidates]
+        return sorted(
+            [(key, score) for key, score in matches if score >= self.threshold],
+            key=lambda match: -match[1]
+        )
+
+
+def _bank_fingerprints(filters=(), after_id=0, batch_size=2000):
+    """Yield (id, text, answer key) for questions in id order, options included
+
+    Pages through the questions by id, loading each page's options in one
+    more query.
+    """
+    while True:
+        rows = db.session.query(Question.id, Question.question_text).join(Test, Question.test_id == Test.id).filter(
+            Question.id > after_id, *filters
+        ).order_by(Question.id).limit(batch_size).all()
+        if not rows:
+            return
+        options = {}
+        option_rows = db.session.query(
+            QuestionOption.question_id, QuestionOption.option_text, QuestionOption.is_correct
+        ).filter(QuestionOption.question_id.in_([question_id for question_id, _ in rows])).order_by(
+            QuestionOption.question_id, QuestionOption.order, QuestionOption.id
+        )
+        for question_id, option_text, is_correct in option_rows:
+            options.setdefault(question_id, []).append({'text': option_text, 'is_correct': is_correct})
+        for question_id, question_text in rows:
+            text, answer = fingerprint({'question_text': question_text, 'options': options.get(question_id, [])})
+            yield question_id, text, answer
+        after_id = rows[-1][0]
+
+
+class QuestionBankIndex(MinHashIndex):
+    """MinHashIndex over the questions of one topic, keyed by question id
+
+    Built on first use and topped up from the table on every refresh(), so
+    questions created by other workers are picked up too. refresh() also
+    counts the topic's questions it has already covered; when that count
+    no longer matches, questions were deleted (by whichever worker) and
+    the index is rebuilt from the table.
+    """
+
+    def __init__(self, topic, threshold):
+        super().__init__(threshold)
+        self.topic = topic
+        self.last_question_id = 0
+        self.questions_seen = 0
+        self._refresh_lock = Lock()
+
+    def _topic_filter(self):
+        return (Test.topic == self.topic,)
+
+    def _questions_up_to(self, question_id):
+        return db.session.query(func.count(Question.id)).join(Test, Question.test_id == Test.id).filter(
+            Question.id <= question_id, *self._topic_filter()
+        ).scalar()
+
+    def refresh(self, batch_size=2000):
+        with self._refresh_lock:
+            if self.questions_seen and self._questions_up_to(self.last_question_id) != self.questions_seen:
+                logger.info(f"Question bank index for {self.topic!r}: questions changed, rebuilding")
+                self.clear()
+                self.last_question_id = 0
+                self.questions_seen = 0
+            added = 0
+            for question_id, text, answer in _bank_fingerprints(self._topic_filter(), self.last_question_id, batch_size):
+                self.add(question_id, text, answer=answer)
+                self.last_question_id = question_id
+                self.questions_seen += 1
+                added += 1
+            if added:
+                logger.info(f"Question bank index for {self.topic!r}: added {added}, now {len(self)} questions")
+
+
+_bank_indexes = OrderedDict()
+_bank_index_lock = Lock()
+
+
+def question_bank_index(topic):
+    """Return this process's refreshed index over the question bank for a topic
+
+    Indexes for the QUESTION_DEDUP_CACHED_TOPICS most recently used topics
+    are kept; the rest are rebuilt when next needed.
+    """
+    topic = normalize_topic(topic)
+    with _bank_index_lock:
+        index = _bank_indexes.get(topic)
+        if index is None:
+            index = _bank_indexes[topic] = QuestionBankIndex(
+                topic, current_app.config.get('QUESTION_DEDUP_THRESHOLD', 0.8)
+            )
+        _bank_indexes.move_to_end(topic)
+        while len(_bank_indexes) > current_app.config.get('QUESTION_DEDUP_CACHED_TOPICS', 64):
+            _bank_indexes.popitem(last=False)
+    index.refresh()
+    return index
+
+
+def _reset_after_fork():
+    global _bank_index_lock
+    _bank_indexes.clear()
+    _bank_index_lock = Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def find_duplicate_clusters(threshold, batch_size=2000):
+    """Group the whole question bank into clusters of near-duplicates
+
+    Each question is only compared with its LSH candidates among the
+    questions before it, so the pass stays far from O(n^2). Like generation,
+    it compares stems with their options and needs the same correct answer;
+    unlike generation, it looks across topics.
+
+    Returns:
+        list: Clusters (lists of question ids, ascending) with two or more members
+    """
+    index = MinHashIndex(threshold)
+    parent = {}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for question_id, text, answer in _bank_fingerprints(batch_size=batch_size):
+        sig = signature(text)
+        if sig is None:
+            continue
+        parent[question_id] = question_id
+        for match_id, _ in index.query(sig=sig, answer=answer):
+            root_a, root_b = find(question_id), find(match_id)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+        index.add(question_id, sig=sig, answer=answer)
+
+    clusters = {}
+    for question_id in parent:
+        clusters.setdefault(find(question_id), []).append(question_id)
+    return sorted((sorted(ids) for ids in clusters.values() if len(ids) > 1), key=lambda ids: (-len(ids), ids[0]))
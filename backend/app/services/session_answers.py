@@ -0,0 +1,216 @@
+import json
+
+from flask import current_app
+from sqlalchemy import Text, delete, func, insert, literal, literal_column, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+
+from app.extensions import db
+from app.models.test import QuestionResponse, ResponseOption, TestSession
+
+# INSERT constructs that support ON CONFLICT, per dialect we run on
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+
+def _upsert_responses(rows):
+    """Insert or update response rows on (session_id, question_id) in one statement
+
+    Returns:
+        dict: Question id -> response id
+    """
+    # One multi-row VALUES statement; an executemany with RETURNING would
+    # fall back to a statement per row on some drivers
+    upsert = _UPSERT_INSERTS[db.session.get_bind().dialect.name](QuestionResponse).values(rows)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=['session_id', 'question_id'],
+        set_={'text_response': upsert.excluded.text_response, 'is_correct': upsert.excluded.is_correct}
+    ).returning(QuestionResponse.question_id, QuestionResponse.id)
+    return dict(db.session.execute(upsert).all())
+
+
+def _write_responses(session_id, rows):
+    """Insert or update response rows without ON CONFLICT, for any other database
+
+    Looks up the existing rows, updates those by primary key, inserts the
+    rest and reads back the ids: four statements instead of one, and a
+    concurrent insert of the same answer fails on the unique key rather
+    than being merged.
+
+    Returns:
+        dict: Question id -> response id
+    """
+    answered = QuestionResponse.question_id.in_([row['question_id'] for row in rows])
+    existing = dict(db.session.execute(
+        select(QuestionResponse.question_id, QuestionResponse.id).where(
+            QuestionResponse.session_id == session_id, answered
+        )
+    ).all())
+    updates = [
+        {'id': existing[row['question_id']], 'text_response': row['text_response'], 'is_correct': row['is_correct']}
+        for row in rows if row['question_id'] in existing
+    ]
+    if updates:
+        db.session.execute(update(QuestionResponse), updates)
+    new_rows = [row for row in rows if row['question_id'] not in existing]
+    if new_rows:
+        db.session.execute(insert(QuestionResponse), new_rows)
+        existing.update(db.session.execute(
+            select(QuestionResponse.question_id, QuestionResponse.id).where(
+                QuestionResponse.session_id == session_id, answered
+            )
+        ).all())
+    return existing
+
+
+def _stored_form(answer):
+    """Split an answer into the text and option ids it is stored as"""
+    if isinstance(answer, list):
+        return None, [int(option_id) for option_id in answer]
+    if isinstance(answer, str):
+        return answer, []
+    return None, [int(answer)]
+
+
+def save_answers(session_id, answers, grades=None):
+    """Store a session's changed answers in a fixed number of statements
+
+    At most four statements however many answers change: one DELETE of
+    their previous option selections, one DELETE of cleared answers, one
+    multi-row INSERT ... ON CONFLICT (session_id, question_id) DO UPDATE
+    for the rest and one INSERT of their selections. Databases without
+    ON CONFLICT take a slower select-then-write path instead.
+
+    Args:
+        session_id: The session the answers belong to
+        answers: Question id -> answer: a list of option ids, fill-in text,
+            a single option id, or None to clear the question
+        grades: Optional question id -> is_correct, stored with each answer
+
+    Returns:
+        dict: Question id -> response id for every answer stored
+    """
+    answers = {int(question_id): answer for question_id, answer in answers.items()}
+    if not answers:
+        return {}
+    grades = grades or {}
+
+    rows, selections, cleared = [], {}, []
+    for question_id, answer in answers.items():
+        if answer is None:
+            cleared.append(question_id)
+            continue
+        text, option_ids = _stored_form(answer)
+        rows.append({
+            'session_id': session_id,
+            'question_id': question_id,
+            'text_response': text,
+            'is_correct': grades.get(question_id)
+        })
+        selections[question_id] = option_ids
+
+    # Every changed answer loses its previous selections, whatever replaces them
+    changed = select(QuestionResponse.id).where(
+        QuestionResponse.session_id == session_id,
+        QuestionResponse.question_id.in_(list(answers))
+    )
+    db.session.execute(
+        delete(ResponseOption).where(ResponseOption.response_id.in_(changed)),
+        execution_options={'synchronize_session': False}
+    )
+    if cleared:
+        db.session.execute(
+            delete(QuestionResponse).where(
+                QuestionResponse.session_id == session_id,
+                QuestionResponse.question_id.in_(cleared)
+            ),
+            execution_options={'synchronize_session': False}
+        )
+    if not rows:
+        return {}
+
+    if db.session.get_bind().dialect.name in _UPSERT_INSERTS:
+        response_ids = _upsert_responses(rows)
+    else:
+        response_ids = _write_responses(session_id, rows)
+
+    option_rows = [
+        {'response_id': response_ids[question_id], 'option_id': option_id}
+        for question_id, option_ids in selections.items()
+        for option_id in option_ids
+    ]
+    if option_rows:
+        db.session.execute(insert(ResponseOption), option_rows)
+    return response_ids
+
+
+def document_store_enabled():
+    """Whether new sessions keep their autosaved answers in one document"""
+    return current_app.config.get('ANSWER_STORE', 'rows') == 'document'
+
+
+def _document_form(answer):
+    """An answer as its answer document value, as _saved_answers() returns it"""
+    if answer is None or isinstance(answer, str):
+        return answer
+    if isinstance(answer, list):
+        return [int(option_id) for option_id in answer]
+    return int(answer)
+
+
+def _postgresql_document_patch(column, answers):
+    patched = func.coalesce(column, literal_column("'{}'::jsonb")).op('||')(
+        literal({key: value for key, value in answers.items() if value is not None}, postgresql.JSONB)
+    )
+    cleared = [key for key, value in answers.items() if value is None]
+    if cleared:
+        patched = patched.op('-')(literal(cleared, postgresql.ARRAY(Text)))
+    return patched
+
+
+def _sqlite_document_patch(column, answers):
+    # An RFC 7396 merge patch: changed keys replaced, null ones removed
+    return func.json_patch(func.coalesce(column, literal_column("'{}'")), json.dumps(answers))
+
+
+# Expressions that merge changed answers into the stored document in place
+_DOCUMENT_PATCHES = {
+    'postgresql': _postgresql_document_patch,
+    'sqlite': _sqlite_document_patch
+}
+
+
+def check_answer_store(app):
+    """Refuse to start with ANSWER_STORE=document on a database it cannot patch
+
+    Raises:
+        RuntimeError: If the configured database has no document patch
+    """
+    if app.config.get('ANSWER_STORE', 'rows') != 'document':
+        return
+    backend = make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    if backend not in _DOCUMENT_PATCHES:
+        raise RuntimeError(
+            f"ANSWER_STORE=document needs {' or '.join(sorted(_DOCUMENT_PATCHES))}, not {backend}; use ANSWER_STORE=rows"
+        )
+
+
+def answer_document_patch(answers):
+    """An UPDATE value merging changed answers into TestSession.answer_document
+
+    The document is patched where it is stored, so a save is one single-row
+    UPDATE however many answers the session has. check_answer_store() keeps
+    the document store off databases without a patch expression.
+
+    Args:
+        answers: Question id -> answer, as save_answers() takes them;
+            None removes the question's answer
+
+    Returns:
+        A SQL expression to SET answer_document to
+    """
+    dialect = db.session.get_bind().dialect.name
+    answers = {str(int(question_id)): _document_form(answer) for question_id, answer in answers.items()}
+    return _DOCUMENT_PATCHES[dialect](TestSession.answer_document, answers)
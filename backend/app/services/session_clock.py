@@ -0,0 +1,108 @@
+import math
+from datetime import datetime, timedelta
+
+
+def start_clock(session, duration_minutes, now=None):
+    """Set a new session's deadline from the test's duration"""
+    session.deadline = (now or session.start_time) + timedelta(minutes=duration_minutes)
+    session.paused_at = None
+    session.paused_seconds = 0
+
+
+def adopt_clock(session, duration_minutes, now=None):
+    """Give a session started before the server kept the clock a deadline
+
+    The client-reported remaining_time it was last saved with becomes the
+    time left, and the rest of the time since it started counts as paused,
+    so the time it is charged for stays what the client had counted.
+    """
+    now = now or datetime.utcnow()
+    allowed = duration_minutes * 60
+    remaining = session.remaining_time if session.remaining_time is not None else allowed
+    session.deadline = now + timedelta(seconds=remaining)
+    session.paused_at = None
+    session.paused_seconds = max(0, int((now - session.start_time).total_seconds()) - (allowed - remaining))
+
+
+def _stopped_at(session, now):
+    # A paused clock stands still where it was paused
+    return session.paused_at or now or datetime.utcnow()
+
+
+def remaining_seconds(session, now=None):
+    """Seconds left before the session's deadline, never negative"""
+    if session.deadline is None:
+        return session.remaining_time
+    # Rounded up, so the clock shows 0 only once the deadline is reached
+    return max(0, math.ceil((session.deadline - _stopped_at(session, now)).total_seconds()))
+
+
+def seconds_used(session, now=None):
+    """Seconds the candidate has had the clock running, up to the deadline
+
+    Returns:
+        int: The time used, or None for a session without a deadline
+    """
+    if session.deadline is None:
+        return None
+    stopped_at = min(_stopped_at(session, now), session.deadline)
+    return max(0, int((stopped_at - session.start_time).total_seconds()) - session.paused_seconds)
+
+
+def is_expired(session, grace_seconds=0, now=None):
+    """Whether the deadline, plus grace for saves still in flight, has passed"""
+    if session.deadline is None or session.paused_at is not None:
+        return False
+    return (now or datetime.utcnow()) > session.deadline + timedelta(seconds=grace_seconds)
+
+
+def pause_clock(session, now=None):
+    """Stop a session's clock
+
+    Raises:
+        ValueError: If it is already paused
+    """
+    if session.paused_at is not None:
+        raise ValueError('Session is already paused')
+    session.paused_at = now or datetime.utcnow()
+
+
+def resume_clock(session, now=None):
+    """Restart a paused clock, moving the deadline back by the pause
+
+    Raises:
+        ValueError: If it is not paused
+    """
+    if session.paused_at is None:
+        raise ValueError('Session is not paused')
+    paused_for = int(((now or datetime.utcnow()) - session.paused_at).total_seconds())
+    session.deadline += timedelta(seconds=paused_for)
+    session.paused_seconds += paused_for
+    session.paused_at = None
+
+
+def extend_clock(session, seconds):
+    """Give a session extra time
+
+    Raises:
+        ValueError: If seconds is not a positive integer
+    """
+    if not isinstance(seconds, int) or isinstance(seconds, bool) or seconds < 1:
+        raise ValueError('seconds must be a positive integer')
+    session.deadline += timedelta(seconds=seconds)
+
+
+def clock_version(session):
+    """The stored fields clock_state() is computed from, which change only when the clock is changed"""
+    if session.deadline is None:
+        return f"remaining:{session.remaining_time}"
+    paused_at = session.paused_at.isoformat() if session.paused_at else ''
+    return f"{session.deadline.isoformat()}|{paused_at}|{session.paused_seconds}"
+
+
+def clock_state(session, now=None):
+    """The timer fields a client needs: remaining time and whether it is paused"""
+    return {
+        'remaining_time': remaining_seconds(session, now),
+        'paused': session.paused_at is not None
+    }
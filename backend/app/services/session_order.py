@@ -0,0 +1,51 @@
+import secrets
+from random import Random
+
+# Yes/no options keep their natural order; fill_blank options are never shown
+SHUFFLED_OPTION_TYPES = ('single_mcq', 'multiple_mcq')
+
+
+def new_shuffle_seed():
+    """Random seed for a session of a randomized test (fits a 32-bit signed column)"""
+    return secrets.randbits(31)
+
+
+def _shuffled(seed, scope, ids):
+    ids = list(ids)
+    # String seeds hash the same in every process, unlike hash()-based ones
+    Random(f"{seed}:{scope}").shuffle(ids)
+    return ids
+
+
+def question_order(seed, test_id, question_ids):
+    """The order a session sees a test's questions in
+
+    Args:
+        seed: The session's shuffle_seed, or None to keep the test's order
+        test_id: Id of the test the questions belong to
+        question_ids: Question ids in the test's own order
+
+    Returns:
+        The question ids in session order. current_question_index is a
+        position in this list.
+    """
+    if seed is None:
+        return list(question_ids)
+    return _shuffled(seed, f"test-{test_id}", question_ids)
+
+
+def option_order(seed, question_id, question_type, option_ids):
+    """The order a session sees one question's options in
+
+    Each question is shuffled on its own, so editing one question never
+    reorders the options of another.
+
+    Args:
+        seed: The session's shuffle_seed, or None to keep the stored order
+        question_id: Id of the question
+        question_type: The question's QuestionType value, e.g. 'single_mcq'
+        option_ids: Option ids in their stored order
+    """
+    if seed is None or question_type not in SHUFFLED_OPTION_TYPES:
+        return list(option_ids)
+    return _shuffled(seed, f"question-{question_id}", option_ids)
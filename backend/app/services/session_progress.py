@@ -0,0 +1,88 @@
+from flask import current_app
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models.test import TestSession
+from app.services.autosave_journal import flush_session, get_autosave_journal
+from app.services.session_answers import answer_document_patch, save_answers
+from app.services.session_clock import is_expired
+
+
+def _stale_reply(acknowledged_seq):
+    return {'message': 'Stale save ignored', 'acknowledged_seq': acknowledged_seq, 'stale': True}
+
+
+def save_progress(session, data):
+    """Apply one autosave to an in-progress session
+
+    Shared by the /progress endpoint and the session socket. `data` holds
+    the answers changed since the last acknowledged save as `changes`, with
+    a `seq` that grows with every save, and optionally the
+    current_question_index. A save whose seq is not above the last applied
+    one is stale and is dropped without writing anything. The full
+    `answers` map without a seq is still accepted and always applied.
+    Saves arriving after the deadline are refused.
+
+    Args:
+        session: The candidate's in-progress TestSession
+        data: The save, as decoded from the request
+
+    Returns:
+        tuple: (reply dict, HTTP status)
+
+    Raises:
+        ValueError: If seq is not a positive integer
+    """
+    seq = data.get('seq')
+    if seq is not None and (not isinstance(seq, int) or isinstance(seq, bool) or seq < 1):
+        raise ValueError('seq must be a positive integer')
+    if is_expired(session, current_app.config.get('EXAM_DEADLINE_GRACE_SECONDS', 30)):
+        return {'error': 'Time is up for this session', 'remaining_time': 0}, 409
+
+    # The index is a position in this session's question order
+    fields = {key: data[key] for key in ('current_question_index',) if key in data}
+    changes = data.get('changes', data.get('answers', {}))
+
+    journal = get_autosave_journal()
+    if seq is not None and journal is not None:
+        # Write-behind: acknowledged once journaled, applied on the next flush
+        accepted, acknowledged_seq = journal.append(session.id, seq, changes, fields, session.last_save_seq)
+        if not accepted:
+            return _stale_reply(acknowledged_seq), 200
+        return {'message': 'Progress saved successfully', 'acknowledged_seq': acknowledged_seq}, 200
+    if journal is not None and flush_session(session.id):
+        # Journaled saves are older than this one, so they go in first
+        db.session.refresh(session)
+
+    # Document sessions store their answers in the session row, in the same UPDATE
+    in_document = session.answer_document is not None
+    if in_document and changes:
+        fields['answer_document'] = answer_document_patch(changes)
+
+    if seq is not None:
+        stale = seq <= session.last_save_seq
+        if not stale:
+            # Claim the seq in the same statement that checks it, so of two
+            # racing saves only the newer one is applied
+            stale = db.session.execute(
+                update(TestSession).where(
+                    TestSession.id == session.id,
+                    TestSession.last_save_seq < seq
+                ).values(last_save_seq=seq, **fields).execution_options(synchronize_session=False)
+            ).rowcount == 0
+            if stale:
+                # Lost the race; report the seq that won
+                db.session.refresh(session)
+        if stale:
+            return _stale_reply(session.last_save_seq), 200
+        acknowledged_seq = seq
+    else:
+        for key, value in fields.items():
+            setattr(session, key, value)
+        acknowledged_seq = session.last_save_seq
+
+    if not in_document:
+        save_answers(session.id, changes)
+
+    db.session.commit()
+    return {'message': 'Progress saved successfully', 'acknowledged_seq': acknowledged_seq}, 200
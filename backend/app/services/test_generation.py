@@ -0,0 +1,610 @@
+import logging
+import os
+import queue
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models.test import GenerationJob, Question, QuestionOption, QuestionType, Test
+from app.services.ai_parser import QuestionStreamParser, extract_questions
+from app.services.ai_resilience import ProviderUnavailableError, get_breaker, get_resilient_provider
+from app.services.ai_scheduler import ScheduledProvider, get_scheduler
+from app.services.generation_cache import get_cached_questions, normalize_topic, store_questions
+from app.services.question_dedup import MinHashIndex, fingerprint, question_bank_index, signature
+from app.services.test_snapshots import bump_content_version
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever generate_questions_prompt changes so cached sets built from
+# the old prompt stop being served
+PROMPT_VERSION = 2
+
+# Each concurrent batch of one request is steered to a different part of the
+# topic, so the batches do not all return the same handful of questions
+BATCH_FOCUS = [
+    'core concepts and definitions',
+    'practical applications and worked examples',
+    'common mistakes and misconceptions',
+    'comparisons between related ideas',
+    'advanced details and edge cases',
+    'terminology, history and context',
+    'problem solving and reasoning',
+    'best practices and trade-offs'
+]
+# Stems already accepted that a top-up batch is told not to repeat
+AVOID_STEMS_LIMIT = 30
+
+_executor = None
+_executor_lock = Lock()
+
+
+def generate_questions_prompt(topic, num_questions=10, focus=None, avoid=()):
+  prompt = f"""
+  Generate {num_questions} questions about {topic} in the following JSON format:
+  {{
+      "questions": [
+          {{
+              "question_text": "Question text here",
+              "question_type": "single_mcq|multiple_mcq|fill_blank|yes_no",
+              "options": [
+                  {{"text": "Option 1", "is_correct": true}},
+                  {{"text": "Option 2", "is_correct": false}},
+                  {{"text": "Option 3", "is_correct": false}},
+                  {{"text": "Option 4", "is_correct": false}}
+              ],
+              "explanation": "Explanation for the correct answer",
+              "points": 1.0
+          }}
+      ]
+  }}
+
+  Rules:
+  1. For single_mcq, only one option should be correct
+  2. For multiple_mcq, multiple options can be correct
+  3. For fill_blank, provide one correct answer in the options
+  4. For yes_no, provide only two options: Yes and No
+  5. Ensure questions are diverse and cover different aspects of the topic
+  6. Provide clear explanations for each correct answer
+  """
+  rule = 7
+  if focus:
+      prompt += f"""{rule}. Concentrate on {focus} within {topic}
+  """
+      rule += 1
+  if avoid:
+      stems = "\n".join(f"     - {stem}" for stem in avoid)
+      prompt += f"""{rule}. Do not repeat or rephrase any of these existing questions:
+{stems}
+  """
+  return prompt
+
+
+def batch_focus(batch, total_batches):
+    """The part of the topic a batch is asked to cover, or None for a lone batch"""
+    if total_batches <= 1 and batch == 0:
+        return None
+    focus = BATCH_FOCUS[batch % len(BATCH_FOCUS)]
+    lap = batch // len(BATCH_FOCUS)
+    return f"{focus} (set {lap + 1})" if lap else focus
+
+
+def _request_questions(provider, topic, num_questions, batch=0, stream=False, focus=None, avoid=()):
+    """Make one model call for num_questions questions and yield each parsed question
+
+    With stream=True the reply is consumed as it arrives and every question
+    is yielded as soon as it is complete.
+
+    Raises:
+        ValueError: If the model returned nothing usable
+    """
+    prompt = generate_questions_prompt(topic, num_questions, focus, avoid)
+
+    if stream:
+        parser = QuestionStreamParser()
+        for chunk in provider.generate(prompt, topic, num_questions, batch=batch, stream=True):
+            yield from parser.feed(chunk)
+        if not parser.questions_seen:
+            raise ValueError("No questions generated")
+        return
+
+    response_text = provider.generate(prompt, topic, num_questions, batch=batch)
+
+    if not response_text:
+        raise ValueError("Empty response from AI")
+
+    # Salvage every complete question, even from a truncated reply
+    questions = extract_questions(response_text)
+
+    if not questions:
+        raise ValueError("No questions generated")
+
+    yield from questions
+
+
+def _generate_chunk(provider, topic, num_questions, batch, retries, stream, emit, focus=None, avoid=()):
+    """Request one batch, retrying just this batch on failure
+
+    Questions are passed to emit as they arrive. A retry only asks for the
+    questions the failed attempt did not deliver.
+    """
+    produced = 0
+    for attempt in range(retries + 1):
+        try:
+            for q_data in _request_questions(provider, topic, num_questions - produced, batch, stream, focus, avoid):
+                emit(q_data)
+                produced += 1
+            return
+        except ProviderUnavailableError:
+            # The breaker is open; retrying now would only be refused again
+            raise
+        except Exception as e:
+            logger.warning(f"Question batch of {num_questions} failed (attempt {attempt + 1}/{retries + 1}): {str(e)}")
+            if produced >= num_questions:
+                return
+            if attempt == retries:
+                if produced:
+                    return
+                raise
+
+
+def _chunk_sizes(total, batch_size):
+    sizes = [batch_size] * (total // batch_size)
+    if total % batch_size:
+        sizes.append(total % batch_size)
+    return sizes
+
+
+_BATCH_DONE = object()
+
+
+def iter_generated_questions(topic, num_questions, stream=False, priority='interactive', chosen=()):
+    """Yield up to num_questions unique questions as batches deliver them
+
+    Requests above GENERATION_BATCH_SIZE are split into batches that run
+    concurrently and are retried on their own; each batch is asked to focus
+    on a different part of the topic, and top-up batches are shown the
+    stems already accepted. Questions that nearly
+    duplicate one already yielded, or one already in the question bank
+    for the same topic, are rejected; up to GENERATION_TOPUP_ROUNDS further rounds of batches
+    are requested to make up the shortfall. If a batch fails outright, the
+    questions already yielded stand and the batch's error is raised at the
+    end. Every model call goes through the AI scheduler in the given
+    priority lane. Questions already chosen for the same test count as
+    accepted: nothing yielded may duplicate them.
+    """
+    num_questions = int(num_questions)
+    config = current_app.config
+    batch_size = max(1, config.get('GENERATION_BATCH_SIZE', 10))
+    retries = config.get('GENERATION_CHUNK_RETRIES', 2)
+    max_workers = config.get('GENERATION_CHUNK_WORKERS', 4)
+    rounds = 1 + config.get('GENERATION_TOPUP_ROUNDS', 1)
+    provider = ScheduledProvider(get_resilient_provider(), get_scheduler(), priority)
+
+    threshold = config.get('QUESTION_DEDUP_THRESHOLD', 0.8)
+    request_index = MinHashIndex(threshold)
+    bank_index = question_bank_index(topic) if config.get('QUESTION_DEDUP_ENABLED', True) else None
+
+    accepted_stems = []
+    for idx, q_data in enumerate(chosen):
+        text, answer = fingerprint(q_data)
+        request_index.add(-1 - idx, text, answer=answer)
+        accepted_stems.append(str(q_data.get('question_text', ''))[:200])
+
+    produced = 0
+    rejected = 0
+    batches_started = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='question-batch') as pool:
+        for _ in range(rounds):
+            missing = num_questions - produced
+            if missing <= 0:
+                break
+
+            arrivals = queue.Queue()
+            sizes = _chunk_sizes(missing, batch_size)
+            avoid = tuple(accepted_stems[-AVOID_STEMS_LIMIT:])
+            futures = [
+                pool.submit(_generate_chunk, provider, topic, size, batches_started + idx, retries, stream,
+                            arrivals.put, batch_focus(batches_started + idx, len(sizes)), avoid)
+                for idx, size in enumerate(sizes)
+            ]
+            batches_started += len(futures)
+            for future in futures:
+                future.add_done_callback(lambda _: arrivals.put(_BATCH_DONE))
+
+            pending = len(futures)
+            while pending:
+                q_data = arrivals.get()
+                if q_data is _BATCH_DONE:
+                    pending -= 1
+                    continue
+                if produced == num_questions:
+                    continue
+                text, answer = fingerprint(q_data)
+                sig = signature(text)
+                if sig is None or request_index.query(sig=sig, answer=answer) or (
+                    bank_index and bank_index.query(sig=sig, answer=answer)
+                ):
+                    rejected += 1
+                    continue
+                request_index.add(produced, sig=sig, answer=answer)
+                accepted_stems.append(str(q_data.get('question_text', ''))[:200])
+                produced += 1
+                yield q_data
+
+            errors.extend(future.exception() for future in futures if future.exception())
+            if errors:
+                break
+
+    if rejected:
+        logger.info(f"Rejected {rejected} duplicate or near-duplicate questions for {topic!r}")
+    if produced < num_questions:
+        logger.warning(f"Generated {produced} unique questions out of {num_questions} requested")
+    if errors:
+        # An open breaker first, so callers can fall back to cached questions
+        raise next((e for e in errors if isinstance(e, ProviderUnavailableError)), errors[0])
+
+
+def generate_questions(topic, num_questions, priority='interactive'):
+    """Generate num_questions questions, splitting large requests into parallel batches
+
+    Raises:
+        ValueError: If the model returned nothing usable
+    """
+    return list(iter_generated_questions(topic, num_questions, priority=priority))
+
+
+def unseen_in_bank(topic, questions):
+    """The questions with no near-duplicate in the topic's question bank"""
+    if not current_app.config.get('QUESTION_DEDUP_ENABLED', True):
+        return list(questions)
+    bank_index = question_bank_index(topic)
+    unseen = []
+    for q_data in questions:
+        text, answer = fingerprint(q_data)
+        sig = signature(text)
+        if sig is not None and not bank_index.query(sig=sig, answer=answer):
+            unseen.append(q_data)
+    return unseen
+
+
+def fill_from_cache(topic, num_questions, questions):
+    """Cached questions for the topic to make up a set the provider could not finish
+
+    Skips cached questions that nearly duplicate ones already chosen.
+    Stale sets are used too, since this only runs while the provider is down.
+
+    Returns:
+        list: At most num_questions - len(questions) question dicts
+    """
+    cached = get_cached_questions(topic, num_questions, PROMPT_VERSION, allow_stale=True) or []
+    chosen = MinHashIndex(current_app.config.get('QUESTION_DEDUP_THRESHOLD', 0.8))
+    for idx, q_data in enumerate(questions):
+        text, answer = fingerprint(q_data)
+        chosen.add(idx, text, answer=answer)
+
+    extra = []
+    for q_data in cached:
+        if len(questions) + len(extra) >= num_questions:
+            break
+        text, answer = fingerprint(q_data)
+        sig = signature(text)
+        if sig is None or chosen.query(sig=sig, answer=answer):
+            continue
+        chosen.add(-1 - len(extra), sig=sig, answer=answer)
+        extra.append(q_data)
+    return extra
+
+
+def _unavailable(error):
+    return f"Question generation is temporarily unavailable. Please try again in {error.retry_after:.0f}s."
+
+
+def create_test_record(params, creator_id):
+    """Add the Test row described by the create request and flush it for an id"""
+    test = Test(
+        title=params['title'],
+        description=params.get('description', ''),
+        duration_minutes=int(params['duration_minutes']),
+        passing_score=float(params['passing_score']),
+        creator_id=creator_id,
+        is_randomized=bool(params.get('is_randomized', False)),
+        topic=normalize_topic(params['topic']) if params.get('topic') else None,
+       # allow_review=params.get('allow_review', True)
+    )
+
+    db.session.add(test)
+    db.session.flush()  # Get test ID without committing
+    return test
+
+
+def _question_row(test_id, order, q_data):
+    """Validate one generated question and build its question and option rows
+
+    Raises:
+        ValueError: If the question data is malformed
+    """
+    try:
+        question = {
+            'test_id': test_id,
+            'question_text': q_data['question_text'],
+            'question_type': QuestionType[q_data['question_type'].upper()],
+            'points': float(q_data['points']),
+            'order': order,
+            'explanation': q_data.get('explanation', '')
+        }
+        options = [
+            {
+                'option_text': opt_data['text'],
+                'is_correct': bool(opt_data['is_correct']),
+                'order': opt_idx
+            }
+            for opt_idx, opt_data in enumerate(q_data['options'], 1)
+        ]
+    except KeyError as e:
+        raise ValueError(f"Invalid question data format: missing {str(e)}")
+    except Exception as e:
+        raise ValueError(f"Error processing question {order}: {str(e)}")
+
+    return question, options
+
+
+def add_questions(test_id, questions, first_order=1):
+    """Insert generated questions and their options in a fixed number of statements
+
+    All questions go in one multi-row INSERT ... RETURNING id, then all
+    options in one more, however many questions there are, and the test's
+    content version is bumped. Nothing is written unless every question
+    is valid.
+
+    Returns:
+        list: The new question ids, in the order given
+
+    Raises:
+        ValueError: If any question data is malformed
+    """
+    rows = [_question_row(test_id, order, q_data) for order, q_data in enumerate(questions, first_order)]
+    if not rows:
+        return []
+
+    # RETURNING order is not guaranteed to follow the VALUES list, so map
+    # ids back through the order column, which is unique within the batch
+    returned = db.session.execute(
+        insert(Question).returning(Question.id, Question.order),
+        [question for question, _ in rows]
+    ).all()
+    id_by_order = {order: question_id for question_id, order in returned}
+    question_ids = [id_by_order[question['order']] for question, _ in rows]
+
+    option_rows = [
+        dict(option, question_id=question_id)
+        for question_id, (_, options) in zip(question_ids, rows)
+        for option in options
+    ]
+    if option_rows:
+        db.session.execute(insert(QuestionOption), option_rows)
+    bump_content_version(test_id)
+
+    return question_ids
+
+
+def add_question(test_id, idx, q_data):
+    """Add one generated question and its options (three statements)
+
+    Returns:
+        int: The new question id
+
+    Raises:
+        ValueError: If the question data is malformed
+    """
+    return add_questions(test_id, [q_data], first_order=idx)[0]
+
+
+def persist_test(params, creator_id, questions):
+    """Create the test with its questions and options in the current session
+
+    The caller owns the transaction and is expected to commit or roll back.
+    """
+    test = create_test_record(params, creator_id)
+    add_questions(test.id, questions)
+    return test
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('GENERATION_WORKERS', 2),
+                thread_name_prefix='test-generation'
+            )
+        return _executor
+
+
+def _reset_executor_after_fork():
+    # Worker threads do not survive a fork; let the child build its own pool
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = Lock()
+
+
+os.register_at_fork(after_in_child=_reset_executor_after_fork)
+
+
+def enqueue_generation_job(app, params, creator_id):
+    """Record a queued generation job and hand it to the worker pool
+
+    Returns:
+        GenerationJob: The committed job row
+    """
+    job = GenerationJob(
+        id=str(uuid.uuid4()),
+        creator_id=creator_id,
+        status='queued',
+        params=params
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    _get_executor(app).submit(run_generation_job, app, job.id)
+    return job
+
+
+def _stream_test(job, params):
+    """Persist each question as soon as it streams in, recording progress on the job
+
+    The test stays inactive until generation finishes. Questions that
+    arrived before a failure are kept; the job only fails if none did. If
+    the circuit breaker opens partway, cached questions make up the rest
+    where they can.
+
+    Returns:
+        tuple: The question dicts that were persisted, and whether any came from the cache
+    """
+    test = create_test_record(params, job.creator_id)
+    test.is_active = False
+    job.test_id = test.id
+    db.session.commit()
+
+    persisted = []
+    filled = False
+
+    def keep(q_data):
+        try:
+            add_question(test.id, len(persisted) + 1, q_data)
+        except ValueError as e:
+            # Validated before anything is written, so there is nothing to undo
+            logger.warning(f"Skipping streamed question for job {job.id}: {str(e)}")
+            return
+        persisted.append(q_data)
+        job.questions_done = len(persisted)
+        db.session.commit()
+
+    try:
+        for q_data in iter_generated_questions(params['topic'], job.questions_requested, stream=True,
+                                               priority=params.get('priority', 'interactive')):
+            keep(q_data)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"AI Generation Error: {str(e)}")
+        message = 'Failed to generate questions. Please try again.'
+        if isinstance(e, ProviderUnavailableError):
+            for q_data in fill_from_cache(params['topic'], job.questions_requested, persisted):
+                keep(q_data)
+                filled = True
+            message = _unavailable(e)
+        if not persisted:
+            db.session.delete(test)
+            job.test_id = None
+            db.session.commit()
+            raise ValueError(message)
+        if len(persisted) < job.questions_requested:
+            job.error = f"Generation stopped early: kept {len(persisted)} of {job.questions_requested} questions"
+
+    test.is_active = True
+    return persisted, filled
+
+
+def run_generation_job(app, job_id):
+    """Generate and persist the test for a queued job (runs on the worker pool)"""
+    with app.app_context():
+        job = db.session.get(GenerationJob, job_id)
+        if job is None:
+            logger.error(f"Generation job {job_id} disappeared before it ran")
+            return
+
+        params = job.params
+        topic = params['topic']
+        num_questions = int(params.get('num_questions', 10))
+        stream = params.get('stream', app.config.get('GENERATION_STREAMING', False))
+
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        job.questions_requested = num_questions
+        job.questions_done = 0
+        db.session.commit()
+
+        try:
+            cached = None
+            provider_down = get_breaker().is_open()
+            if not params.get('force_regenerate', False) or provider_down:
+                # While the provider is failing, any cached set beats no test
+                cached = get_cached_questions(topic, num_questions, PROMPT_VERSION, allow_stale=provider_down)
+            if cached is not None and not provider_down:
+                # Tests built since the set was cached, the set's own included,
+                # may already hold its questions; the provider makes up the rest
+                cached = unseen_in_bank(topic, cached)
+
+            if cached is not None and (provider_down or len(cached) == num_questions):
+                logger.info(f"Serving cached question set for job {job_id}")
+                questions = cached
+                test = persist_test(params, job.creator_id, questions)
+                job.test_id = test.id
+            elif provider_down:
+                raise ValueError('Question generation is temporarily unavailable. Please try again shortly.')
+            elif stream and not cached:
+                questions, filled = _stream_test(job, params)
+                if len(questions) == num_questions and not filled:
+                    store_questions(topic, num_questions, PROMPT_VERSION, questions)
+            else:
+                questions = list(cached or [])
+                filled = False
+                try:
+                    for q_data in iter_generated_questions(
+                        topic, num_questions - len(questions), priority=params.get('priority', 'interactive'),
+                        chosen=list(questions)
+                    ):
+                        questions.append(q_data)
+                except ProviderUnavailableError as e:
+                    # The breaker opened partway through: finish from the cache or not at all
+                    logger.error(f"AI Generation Error: {str(e)}")
+                    questions += fill_from_cache(topic, num_questions, questions)
+                    if len(questions) < num_questions:
+                        raise ValueError(_unavailable(e))
+                    filled = True
+                except Exception as e:
+                    logger.error(f"AI Generation Error: {str(e)}")
+                    raise ValueError('Failed to generate questions. Please try again.')
+                if not questions:
+                    # Everything returned duplicated questions already in the bank
+                    raise ValueError('Failed to generate new questions for this topic. Please try again.')
+                if len(questions) == num_questions and not filled:
+                    store_questions(topic, num_questions, PROMPT_VERSION, questions)
+                test = persist_test(params, job.creator_id, questions)
+                job.test_id = test.id
+
+            job.questions_done = len(questions)
+            job.status = 'completed'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            if not isinstance(e, ValueError):
+                logger.error(f"Test Creation Error: {str(e)}")
+            job = db.session.get(GenerationJob, job_id)
+            job.status = 'failed'
+            job.error = str(e) if isinstance(e, ValueError) else 'An unexpected error occurred'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def serialize_job(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'test_id': job.test_id,
+        'error': job.error,
+        'questions_requested': job.questions_requested,
+        'questions_done': job.questions_done,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
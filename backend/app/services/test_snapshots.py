@@ -0,0 +1,370 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from threading import Lock
+
+from flask import Response, current_app
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+
+from app.extensions import db
+from app.models.test import Question, QuestionType, Test
+from app.services.session_order import option_order, question_order
+
+logger = logging.getLogger(__name__)
+
+# Question types whose options candidates get to see; the lone option of a
+# fill_blank question is its answer
+CHOICE_TYPES = (QuestionType.SINGLE_MCQ, QuestionType.MULTIPLE_MCQ, QuestionType.YES_NO)
+
+# Bump whenever the rendered snapshot changes shape, so stored snapshots and
+# ETags from before a deploy stop matching
+SNAPSHOT_FORMAT = 4
+
+
+def snapshot_etag(test_id, version):
+    """Strong ETag for the test content at one content version"""
+    return f"test-{test_id}-v{version}-f{SNAPSHOT_FORMAT}"
+
+
+class TestSnapshot:
+    """Immutable, pre-serialized rendering of one version of a test
+
+    test_json is the full get_test body and questions_json the question
+    list get_test_questions returns. meta_json (the test without its
+    questions) and candidate_json (questions stripped of answers and
+    explanations) make up the exam bootstrap. The lists are spliced into
+    per-session responses, reordered per session for randomized tests.
+    """
+
+    PARTS = ('test_json', 'questions_json', 'meta_json', 'candidate_json')
+    __slots__ = ('test_id', 'version', '_layouts') + PARTS
+
+    def __init__(self, test_id, version, test_json, questions_json, meta_json, candidate_json):
+        self.test_id = test_id
+        self.version = version
+        self.test_json = test_json
+        self.questions_json = questions_json
+        self.meta_json = meta_json
+        self.candidate_json = candidate_json
+        self._layouts = {}
+
+    @property
+    def size(self):
+        return sum(len(getattr(self, part)) for part in self.PARTS)
+
+    @property
+    def etag(self):
+        return snapshot_etag(self.test_id, self.version)
+
+    def _layout(self, part):
+        # Split a question list into per-question and per-option fragments
+        # once per snapshot, so reordering is a byte join
+        layout = self._layouts.get(part)
+        if layout is None:
+            layout = []
+            for question in current_app.json.loads(getattr(self, part)):
+                options = question.pop('options')
+                head = _dumps(question)[:-1] + b',"options":['
+                layout.append((question['id'], question['question_type'], head,
+                               [(option['id'], _dumps(option)) for option in options]))
+            self._layouts[part] = layout
+        return layout
+
+    def question_count(self, part):
+        return len(self._layout(part))
+
+    def in_session_order(self, part, seed, start=0, stop=None):
+        """A serialized question list in the order a session sees it
+
+        Args:
+            part: 'questions_json' or 'candidate_json'
+            seed: The session's shuffle_seed; None keeps the stored order
+            start, stop: Slice of the session's order to render (default all)
+        """
+        if seed is None and start == 0 and stop is None:
+            return getattr(self, part)
+        layout = {entry[0]: entry for entry in self._layout(part)}
+        rendered = []
+        for question_id in question_order(seed, self.test_id, list(layout))[start:stop]:
+            _, question_type, head, options = layout[question_id]
+            by_id = dict(options)
+            ordered = option_order(seed, question_id, question_type, [option_id for option_id, _ in options])
+            rendered.append(head + b','.join(by_id[option_id] for option_id in ordered) + b']}')
+        return b'[' + b','.join(rendered) + b']'
+
+
+def _dumps(obj):
+    # Same encoder (and so the same datetime format) as jsonify
+    return current_app.json.dumps_bytes(obj)
+
+
+def build_snapshot(test):
+    """Render a test and its questions from the database"""
+    questions = Question.query.options(selectinload(Question.options)).filter_by(
+        test_id=test.id
+    ).order_by(Question.order, Question.id).all()
+
+    full, listed, candidate = [], [], []
+    for question in questions:
+        options = [
+            {
+                'id': option.id,
+                'text': option.option_text,
+                'is_correct': option.is_correct
+            }
+            for option in sorted(question.options, key=lambda option: (option.order or 0, option.id))
+        ]
+        question_data = {
+            'id': question.id,
+            'question_text': question.question_text,
+            'question_type': question.question_type.value,
+            'points': question.points,
+            'order': question.order,
+            'explanation': question.explanation
+        }
+        shown = options if question.question_type in CHOICE_TYPES else []
+        full.append(dict(question_data, options=options))
+        listed.append(dict(question_data, options=shown))
+        candidate.append({
+            'id': question.id,
+            'question_text': question.question_text,
+            'question_type': question.question_type.value,
+            'points': question.points,
+            'order': question.order,
+            'options': [{'id': option['id'], 'text': option['text']} for option in shown]
+        })
+
+    meta = {
+        'id': test.id,
+        'title': test.title,
+        'description': test.description,
+        'duration_minutes': test.duration_minutes,
+        'passing_score': test.passing_score,
+        'is_randomized': test.is_randomized,
+        'created_at': test.created_at
+    }
+    return TestSnapshot(
+        test.id,
+        test.content_version,
+        _dumps(dict(meta, questions=full)),
+        _dumps(listed),
+        _dumps(meta),
+        _dumps(candidate)
+    )
+
+
+class _RedisStore:
+    """Snapshots shared between processes through redis (optional dependency)"""
+
+    def __init__(self, url, ttl):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(test_id, version):
+        return f"test-snapshot:{SNAPSHOT_FORMAT}:{test_id}:{version}"
+
+    def get(self, test_id, version):
+        parts = self._client.hmget(self._key(test_id, version), *TestSnapshot.PARTS)
+        if any(part is None for part in parts):
+            return None
+        return TestSnapshot(test_id, version, *parts)
+
+    def put(self, snapshot):
+        key = self._key(snapshot.test_id, snapshot.version)
+        pipe = self._client.pipeline()
+        pipe.hset(key, mapping={part: getattr(snapshot, part) for part in TestSnapshot.PARTS})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+
+class SnapshotCache:
+    """LRU of test snapshots keyed by (test id, content version)
+
+    A snapshot never changes once built: editing a test bumps its
+    content_version, so the old entry simply stops being asked for. Misses
+    are filled from the shared store when one is configured, otherwise
+    built, and only one request per key builds at a time so a cohort
+    starting together costs a single build.
+    """
+
+    def __init__(self, max_entries=256, shared=None):
+        self.max_entries = max(1, max_entries)
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._build_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return snapshot
+
+    def _store(self, snapshot):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == snapshot.test_id]:
+                del self._entries[key]
+            self._entries[(snapshot.test_id, snapshot.version)] = snapshot
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load_shared(self, test_id, version):
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get(test_id, version)
+        except Exception as e:
+            logger.warning(f"Snapshot store unavailable: {str(e)}")
+            return None
+
+    def _save_shared(self, snapshot):
+        if self.shared is None:
+            return False
+        try:
+            self.shared.put(snapshot)
+            return True
+        except Exception as e:
+            logger.warning(f"Snapshot store unavailable: {str(e)}")
+            return False
+
+    def get(self, test_id, version):
+        key = (test_id, version)
+        snapshot = self._lookup(key)
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            self.misses += 1
+            build_lock = self._build_locks.setdefault(key, Lock())
+        with build_lock:
+            snapshot = self._lookup(key)
+            if snapshot is None:
+                snapshot = self._load_shared(*key)
+                if snapshot is None:
+                    snapshot = self.warm(db.session.get(Test, test_id))
+                else:
+                    self._store(snapshot)
+        with self._lock:
+            self._build_locks.pop(key, None)
+        return snapshot
+
+    def warm(self, test):
+        """Build a test's snapshot and cache it here and in the shared store"""
+        snapshot = build_snapshot(test)
+        with self._lock:
+            self.builds += 1
+        self._store(snapshot)
+        self._save_shared(snapshot)
+        return snapshot
+
+    def invalidate(self, test_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == test_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(snapshot.size for snapshot in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'builds': self.builds,
+                'shared_store': self.shared is not None
+            }
+
+
+def _build_shared_store(config):
+    url = config.get('TEST_SNAPSHOT_REDIS_URL')
+    if not url:
+        return None
+    try:
+        return _RedisStore(url, config.get('TEST_SNAPSHOT_TTL_SECONDS', 86400))
+    except ImportError:
+        logger.warning("TEST_SNAPSHOT_REDIS_URL is set but redis is not installed; caching snapshots in-process only")
+        return None
+
+
+_cache = None
+_cache_lock = Lock()
+
+
+def get_snapshot_cache():
+    """Return this process's snapshot cache, building it from config on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = current_app.config
+                _cache = SnapshotCache(config.get('TEST_SNAPSHOT_CACHE_SIZE', 256), _build_shared_store(config))
+    return _cache
+
+
+def current_version(test_id):
+    """A test's content version from a single column read, or None if it does not exist"""
+    return db.session.execute(select(Test.content_version).where(Test.id == test_id)).scalar()
+
+
+def get_test_snapshot(test_id, version):
+    """Return the snapshot of a test at a content version, from cache or freshly built"""
+    return get_snapshot_cache().get(test_id, version)
+
+
+def bump_content_version(test_id):
+    """Mark a test's content as changed so its cached snapshots are no longer used"""
+    db.session.execute(
+        update(Test).where(Test.id == test_id).values(content_version=Test.content_version + 1)
+    )
+
+
+def forget_test(test_id):
+    if _cache is not None:
+        _cache.invalidate(test_id)
+
+
+def snapshot_response(snapshot, fragments, volatile=None, volatile_version='', **overlay):
+    """JSON response splicing pre-serialized snapshot parts with per-request fields
+
+    The response carries a strong ETag made of the snapshot's and a digest
+    of the overlay, so it can be answered with 304 while neither changes.
+
+    Args:
+        snapshot: The TestSnapshot the fragments come from
+        fragments: Top-level key -> serialized JSON value, taken from the snapshot
+        volatile: Fields that change with the passing of time alone (a
+            running clock); sent, but left out of the digest
+        volatile_version: The stored state the volatile fields derive from,
+            digested in their place
+        **overlay: Remaining top-level fields, serialized per request
+    """
+    parts = [b'"' + key.encode('utf-8') + b'":' + value for key, value in fragments.items()]
+    rest = _dumps(overlay)[1:-1] if overlay else b''
+    if rest:
+        parts.append(rest)
+    if volatile:
+        parts.append(_dumps(volatile)[1:-1])
+    response = Response(b'{' + b','.join(parts) + b'}', mimetype='application/json')
+    digest = hashlib.sha1(
+        ','.join(fragments).encode('utf-8') + b'|' + rest + b'|' + volatile_version.encode('utf-8')
+    ).hexdigest()[:16]
+    response.set_etag(f"{snapshot.etag}-{digest}")
+    return response
+
+
+def _reset_after_fork():
+    global _cache, _cache_lock
+    _cache = None
+    _cache_lock = Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,97 @@
+"""Benchmark AI reply parsing over real and pathological replies
+
+Compares the original clean-then-json.loads approach with the single-pass
+extractor, both on whole replies and fed in streamed chunks. The corpus is
+synthesised from the fake provider, plus any captures in --captures (see
+QUESTION_PROVIDER=record).
+
+Usage (from backend/):
+    python benchmarks/bench_ai_parser.py [--captures ai_captures] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_parser import QuestionStreamParser, extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+
+STREAM_CHUNK = 4096
+
+
+def legacy_parse(response_text):
+    """The pre-extractor path: strip fences, slice outer braces, json.loads"""
+    clean_text = response_text.replace("```json", "").replace("```", "").strip()
+    start_idx = clean_text.find("{")
+    end_idx = clean_text.rfind("}")
+    if start_idx == -1 or end_idx == -1:
+        raise ValueError("No JSON object found in AI response")
+    return json.loads(clean_text[start_idx:end_idx + 1])['questions']
+
+
+def streamed_parse(response_text):
+    parser = QuestionStreamParser()
+    questions = []
+    for i in range(0, len(response_text), STREAM_CHUNK):
+        questions.extend(parser.feed(response_text[i:i + STREAM_CHUNK]))
+    return questions
+
+
+def build_corpus(captures_dir):
+    fake = FakeProvider()
+    corpus = []
+    for size in (10, 100, 1000, 10000):
+        corpus.append((f"fake {size}q", fake.build_reply('corpus topic', size)))
+
+    big = fake.build_reply('corpus topic', 5000)
+    corpus.append(("prose around fences", "Sure! Here are your [5000] questions:\n" + big + "\nLet me know {if} you need more."))
+    corpus.append(("trailing commas", big.replace('"points": 1.0\n', '"points": 1.0,\n')))
+    corpus.append(("truncated tail", big[:int(len(big) * 0.97)]))
+    escaped = json.loads(big.strip('`json\n'))
+    for question in escaped['questions']:
+        question['explanation'] = 'He said "use {braces} and [brackets]" \\ ' * 20
+    corpus.append(("escape-heavy strings", json.dumps(escaped)))
+
+    if captures_dir and os.path.isdir(captures_dir):
+        for name in sorted(os.listdir(captures_dir)):
+            if name.endswith('.json'):
+                with open(os.path.join(captures_dir, name), encoding='utf-8') as f:
+                    capture = json.load(f)
+                corpus.append((f"capture {name[:12]}", ''.join(capture['chunks'])))
+    return corpus
+
+
+def timed(fn, text, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            result = fn(text)
+        except Exception as e:
+            return None, type(e).__name__
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--captures', default=None)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'reply':<22} {'size':>9} | {'legacy ms':>10} {'q':>6} | {'extract ms':>10} {'q':>6} | {'stream ms':>10} {'q':>6}")
+    for name, text in build_corpus(args.captures):
+        row = [f"{name:<22} {len(text) / 1024:>7.0f}KB"]
+        for fn in (legacy_parse, extract_questions, streamed_parse):
+            ms, count = timed(fn, text, args.repeat)
+            row.append(f"{'failed':>10} {count:>6}" if ms is None else f"{ms:>10.1f} {count:>6}")
+        print(' | '.join(row))
+
+
+if __name__ == '__main__':
+    main()
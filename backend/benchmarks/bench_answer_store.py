@@ -0,0 +1,167 @@
+"""Compare the row and document answer stores per autosave
+
+Runs the same candidate through --saves autosaves with each
+ANSWER_STORE: every save changes --changes answers of a --questions long
+test. With 'rows' a save upserts question_responses and rewrites their
+response_options. With 'document' it patches the session's answer
+document in one UPDATE, and the answers become rows once, at submit.
+Reports per save the statements sent, the rows they wrote and the WAL
+bytes they produced, then the same for the submit. On SQLite the WAL is
+measured as the growth of the -wal file (whole 4 KB pages, checkpoints
+off); on PostgreSQL (--database-url) as the change in the WAL insert
+position, so other traffic on the server shows up too.
+
+Usage (from backend/):
+    python benchmarks/bench_answer_store.py [--questions 100] [--saves 200] [--changes 2]
+        [--database-url postgresql://...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.services.ai_parser import extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+from app.services.test_generation import persist_test  # noqa: E402
+
+
+def make_app(args, store):
+    path = os.path.join(tempfile.mkdtemp(), 'store.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{path}"
+        DEBUG = False
+        ANSWER_STORE = store
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite':
+            @event.listens_for(engine, 'connect')
+            def use_wal(dbapi_connection, connection_record):
+                dbapi_connection.execute('PRAGMA journal_mode=WAL')
+                # Keep every page written in the -wal file so its size counts them
+                dbapi_connection.execute('PRAGMA wal_autocheckpoint=0')
+        db.create_all()
+    return app, path
+
+
+class WriteMeter:
+    """Statements, rows written and WAL bytes between start() and stop()"""
+
+    def __init__(self, engine, sqlite_path):
+        self.engine = engine
+        self.wal_path = f"{sqlite_path}-wal"
+        self.statements = self.rows = 0
+
+    def _wal_position(self):
+        if self.engine.dialect.name == 'postgresql':
+            with self.engine.connect() as conn:
+                return conn.execute(text('SELECT pg_current_wal_insert_lsn()')).scalar()
+        return os.path.getsize(self.wal_path) if os.path.exists(self.wal_path) else 0
+
+    def _wal_bytes(self, start):
+        if self.engine.dialect.name == 'postgresql':
+            with self.engine.connect() as conn:
+                return conn.execute(
+                    text('SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), :start)'), {'start': start}
+                ).scalar()
+        return self._wal_position() - start
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        if not statement.lstrip().upper().startswith('SELECT') and cursor.rowcount > 0:
+            self.rows += cursor.rowcount
+
+    def start(self):
+        self.statements = self.rows = 0
+        self.wal_start = self._wal_position()
+        event.listen(self.engine, 'after_cursor_execute', self._record)
+
+    def stop(self):
+        event.remove(self.engine, 'after_cursor_execute', self._record)
+        return self.statements, self.rows, self._wal_bytes(self.wal_start)
+
+
+def login(client):
+    user = {'email': 'store@example.com', 'password': 'bench', 'first_name': 'Answer', 'last_name': 'Store'}
+    client.post('/api/auth/register', json=user)
+    token = client.post('/api/auth/login', json=user).get_json()['access_token']
+    return {'Authorization': f"Bearer {token}"}
+
+
+def answer_for(question, save_no):
+    options = question['options']
+    if question['question_type'] == 'fill_blank':
+        return f"answer {save_no}"
+    if question['question_type'] == 'multiple_mcq':
+        return [option['id'] for option in options[save_no % 2:save_no % 2 + 2]]
+    return options[save_no % len(options)]['id']
+
+
+def run(args, store):
+    app, sqlite_path = make_app(args, store)
+    client = app.test_client()
+    headers = login(client)
+    questions = extract_questions(FakeProvider().build_reply('answer store bench', args.questions))
+    with app.app_context():
+        test_id = persist_test({'title': 'Answer store bench', 'duration_minutes': 600, 'passing_score': 50}, None,
+                               questions).id
+        db.session.commit()
+        meter = WriteMeter(db.engine, sqlite_path)
+    questions = client.get(f"/api/tests/{test_id}/bootstrap", headers=headers).get_json()['questions']
+
+    answers = {}
+    meter.start()
+    for save_no in range(1, args.saves + 1):
+        changes = {}
+        for offset in range(args.changes):
+            question = questions[(save_no * args.changes + offset) % len(questions)]
+            changes[str(question['id'])] = answers[str(question['id'])] = answer_for(question, save_no)
+        response = client.post(f"/api/tests/{test_id}/progress", json={'seq': save_no, 'changes': changes},
+                               headers=headers)
+        if response.status_code != 200:
+            raise SystemExit(f"Save failed with {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    save_totals = meter.stop()
+
+    saved = client.get(f"/api/tests/{test_id}/bootstrap", headers=headers).get_json()['saved_answers']
+    if {str(key): value for key, value in saved.items()} != answers:
+        raise SystemExit(f"The {store} store lost answers")
+
+    # The take page submits everything it holds
+    meter.start()
+    submitted = client.post(f"/api/tests/{test_id}/submit", json={'answers': answers}, headers=headers).get_json()
+    submit_totals = meter.stop()
+    results = client.get(f"/api/tests/{test_id}/results/{submitted['session_id']}", headers=headers).get_json()
+    if results['unanswered'] != len(questions) - len(answers):
+        raise SystemExit(f"The {store} store submitted {results['total_questions'] - results['unanswered']} "
+                         f"answers of {len(answers)}")
+    return save_totals, submit_totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--saves', type=int, default=200)
+    parser.add_argument('--changes', type=int, default=2)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    print(f"{args.saves} saves of {args.changes} changed answers, {args.questions} questions")
+    print(f"{'store':<10}{'stmts/save':>11}{'rows/save':>10}{'WAL B/save':>11}"
+          f"{'submit stmts':>13}{'submit rows':>12}{'submit WAL B':>13}")
+    for store in ('rows', 'document'):
+        (statements, rows, wal), (submit_statements, submit_rows, submit_wal) = run(args, store)
+        print(f"{store:<10}{statements / args.saves:>11.1f}{rows / args.saves:>10.1f}{wal / args.saves:>11.0f}"
+              f"{submit_statements:>13}{submit_rows:>12}{submit_wal:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Compare per-answer response writes with the set-based upsert path
+
+Saves the same answers for a session twice with each strategy, first
+inserting them and then changing every one: once with the previous loop
+(a SELECT per answer, an INSERT and flush when new, then a DELETE and
+re-INSERT of its option selections) and once with save_answers(), which
+upserts on the (session_id, question_id) key. Reports the statements
+sent to the database and the wall time of each save. Uses a throwaway
+SQLite database unless --database-url is given; the gap is much wider on
+a networked database, where every statement is a round trip.
+
+Usage (from backend/):
+    python benchmarks/bench_answer_upsert.py [--sizes 10 50 200] [--runs 5]
+        [--database-url postgresql://...]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.test import Question, QuestionResponse, QuestionType, ResponseOption, TestSession  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.ai_parser import extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+from app.services.session_answers import save_answers  # noqa: E402
+from app.services.test_generation import persist_test  # noqa: E402
+
+
+def make_app(args):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+        DEBUG = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        user = User.query.filter_by(email='bench@example.com').first()
+        if user is None:
+            user = User(email='bench@example.com', password='-', first_name='Bench', last_name='User', role='user')
+            db.session.add(user)
+            db.session.commit()
+        app.config['BENCH_USER_ID'] = user.id
+    return app
+
+
+def save_per_answer(session_id, answers):
+    """The loop update_progress used before upserts"""
+    for question_id, answer in answers.items():
+        question_id = int(question_id)
+        response = QuestionResponse.query.filter_by(session_id=session_id, question_id=question_id).first()
+        if not response:
+            response = QuestionResponse(session_id=session_id, question_id=question_id)
+            db.session.add(response)
+            db.session.flush()
+
+        ResponseOption.query.filter_by(response_id=response.id).delete()
+        if isinstance(answer, list):
+            for option_id in answer:
+                db.session.add(ResponseOption(response_id=response.id, option_id=option_id))
+        elif isinstance(answer, str):
+            response.text_response = answer
+        else:
+            db.session.add(ResponseOption(response_id=response.id, option_id=answer))
+
+
+STRATEGIES = {'per-answer': save_per_answer, 'upsert': save_answers}
+
+
+def make_answers(questions, pick):
+    """One answer per question, choosing option `pick` where there is a choice"""
+    answers = {}
+    for question in questions:
+        options = sorted(question.options, key=lambda option: option.id)
+        if question.question_type == QuestionType.FILL_BLANK:
+            answers[question.id] = f"answer {pick}"
+        elif question.question_type == QuestionType.MULTIPLE_MCQ:
+            answers[question.id] = [option.id for option in options[pick:pick + 2]]
+        else:
+            answers[question.id] = options[pick % len(options)].id
+    return answers
+
+
+def run(app, strategy, test_id):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        session = TestSession(test_id=test_id, user_id=app.config['BENCH_USER_ID'], start_time=datetime.utcnow(),
+                              status='in_progress')
+        db.session.add(session)
+        db.session.commit()
+        questions = Question.query.filter_by(test_id=test_id).all()
+
+        engine = db.engine
+        results = []
+        for pick in (0, 1):
+            answers = make_answers(questions, pick)
+            statements.clear()
+            event.listen(engine, 'before_cursor_execute', count)
+            try:
+                start = time.perf_counter()
+                STRATEGIES[strategy](session.id, answers)
+                db.session.commit()
+                elapsed = time.perf_counter() - start
+            finally:
+                event.remove(engine, 'before_cursor_execute', count)
+            results.append((elapsed, len(statements)))
+
+        stored = QuestionResponse.query.filter_by(session_id=session.id).count()
+        if stored != len(questions):
+            raise SystemExit(f"{strategy} stored {stored} responses for {len(questions)} answers")
+    # The COMMIT itself is not a cursor execution, so only data statements are counted
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    app = make_app(args)
+    provider = FakeProvider()
+    print(f"db={app.config['SQLALCHEMY_DATABASE_URI']}")
+    print(f"{'answers':>7} {'strategy':>11} {'save':>7} {'statements':>10} {'median ms':>10} {'ms/answer':>10}")
+    for size in args.sizes:
+        with app.app_context():
+            questions = extract_questions(provider.build_reply(f"answer upsert benchmark {size}", size))
+            test_id = persist_test({'title': f"Upsert bench {size}", 'duration_minutes': 30, 'passing_score': 50},
+                                   app.config['BENCH_USER_ID'], questions).id
+            db.session.commit()
+        for strategy in STRATEGIES:
+            runs = [run(app, strategy, test_id) for _ in range(args.runs)]
+            for save_no, save in enumerate(('insert', 'update')):
+                median = statistics.median(result[save_no][0] * 1000 for result in runs)
+                statements = runs[0][save_no][1]
+                print(f"{size:>7} {strategy:>11} {save:>7} {statements:>10} {median:>10.1f} {median / size:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Compare full-map autosave with the delta protocol over one simulated exam
+
+Replays the same candidate twice against /progress: the candidate answers
+one question every --answer-every seconds of a --seconds long sitting.
+The full protocol posts every answer so far once a second, as the take
+page used to on each timer tick. The delta protocol posts only the
+changed answers with a sequence number on each edit, plus the remaining
+time every 30 seconds; a deliberately stale save at the end checks it is
+dropped without writes. Reports requests, SQL statements and wall time
+for each.
+
+Usage (from backend/):
+    python benchmarks/bench_autosave.py [--questions 50] [--seconds 600] [--answer-every 10]
+        [--database-url postgresql://...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.services.ai_parser import extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+from app.services.test_generation import persist_test  # noqa: E402
+
+TIME_SAVE_INTERVAL = 30
+
+
+def make_app(args):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'autosave.db')}"
+        DEBUG = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def login(client):
+    user = {'email': 'autosave@example.com', 'password': 'bench', 'first_name': 'Auto', 'last_name': 'Save'}
+    client.post('/api/auth/register', json=user)
+    token = client.post('/api/auth/login', json=user).get_json()['access_token']
+    return {'Authorization': f"Bearer {token}"}
+
+
+def seed_test(app, size):
+    questions = extract_questions(FakeProvider().build_reply(f"autosave bench {size}", size))
+    with app.app_context():
+        test = persist_test({'title': f"Autosave bench {size}", 'duration_minutes': 60, 'passing_score': 50}, None,
+                            questions)
+        db.session.commit()
+        return test.id
+
+
+def answer_for(question):
+    if question['question_type'] == 'fill_blank':
+        return 'an answer'
+    if question['question_type'] == 'multiple_mcq':
+        return [option['id'] for option in question['options'][:2]]
+    return question['options'][0]['id']
+
+
+class StatementCounter:
+    def __init__(self, app):
+        with app.app_context():
+            self.engine = db.engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def writes(self):
+        return sum(1 for statement in self.statements if not statement.lstrip().upper().startswith('SELECT'))
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+
+def replay(app, client, headers, args, delta):
+    test_id = seed_test(app, args.questions)
+    questions = client.get(f"/api/tests/{test_id}/bootstrap", headers=headers).get_json()['questions']
+    url = f"/api/tests/{test_id}/progress"
+
+    answers = {}
+    requests = 0
+    seq = 0
+    counter = StatementCounter(app)
+    started = time.perf_counter()
+    with counter:
+        for second in range(1, args.seconds + 1):
+            changes = {}
+            position = second // args.answer_every
+            if second % args.answer_every == 0 and position <= len(questions):
+                question = questions[position - 1]
+                changes[str(question['id'])] = answers[str(question['id'])] = answer_for(question)
+            remaining = args.seconds - second
+            index = min(position, len(questions) - 1)
+
+            if not delta:
+                body = {'answers': answers, 'remaining_time': remaining, 'current_question_index': index}
+            elif changes or second % TIME_SAVE_INTERVAL == 0:
+                seq += 1
+                body = {'seq': seq, 'changes': changes, 'remaining_time': remaining, 'current_question_index': index}
+            else:
+                continue
+            response = client.post(url, json=body, headers=headers)
+            requests += 1
+            if response.status_code != 200:
+                raise SystemExit(f"Save failed with {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    elapsed = time.perf_counter() - started
+    statements = counter.count
+
+    stale_statements = None
+    if delta:
+        # A save that arrives after a newer one must be dropped without writes
+        with counter:
+            reply = client.post(url, json={'seq': seq - 1, 'changes': {str(questions[0]['id']): None}},
+                                headers=headers).get_json()
+        if not reply.get('stale') or counter.writes:
+            raise SystemExit("Stale save was applied")
+        stale_statements = counter.count
+
+    saved = client.get(f"/api/tests/{test_id}/bootstrap", headers=headers).get_json()['saved_answers']
+    if {str(key): value for key, value in saved.items()} != answers:
+        raise SystemExit(f"{'Delta' if delta else 'Full'} protocol lost answers")
+    return requests, statements, elapsed, stale_statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--seconds', type=int, default=600)
+    parser.add_argument('--answer-every', type=int, default=10)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    app = make_app(args)
+    client = app.test_client()
+    headers = login(client)
+
+    print(f"{'protocol':<10}{'requests':>10}{'statements':>12}{'seconds':>10}")
+    for name, delta in (('full', False), ('delta', True)):
+        requests, statements, elapsed, stale_statements = replay(app, client, headers, args, delta)
+        print(f"{name:<10}{requests:>10}{statements:>12}{elapsed:>10.2f}")
+    print(f"stale delta save: {stale_statements} statements, no writes")
+
+
+if __name__ == '__main__':
+    main()
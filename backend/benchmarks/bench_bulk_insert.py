@@ -0,0 +1,134 @@
+"""Compare per-question inserts with the bulk persistence path
+
+Persists the same generated tests twice: once with the previous loop (one
+flush per question, then its options) and once with add_questions(), which
+uses one INSERT ... RETURNING for the questions and one INSERT for all
+options. Reports the statements sent to the database and wall time for
+each. Uses a throwaway SQLite database unless --database-url is given; the
+gap is much wider on a networked database, where every statement is a
+round trip.
+
+Usage (from backend/):
+    python benchmarks/bench_bulk_insert.py [--sizes 10 50 100] [--runs 5]
+        [--database-url postgresql://...]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.test import Question, QuestionOption, QuestionType, Test  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import test_generation  # noqa: E402
+from app.services.ai_parser import extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+
+
+def make_app(args):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+        DEBUG = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        user = User.query.filter_by(email='bench@example.com').first()
+        if user is None:
+            user = User(email='bench@example.com', password='-', first_name='Bench', last_name='User', role='admin')
+            db.session.add(user)
+            db.session.commit()
+        app.config['BENCH_USER_ID'] = user.id
+    return app
+
+
+def persist_per_question(test_id, questions):
+    """The loop persist_test used before bulk insertion"""
+    for idx, q_data in enumerate(questions, 1):
+        question = Question(
+            test_id=test_id,
+            question_text=q_data['question_text'],
+            question_type=QuestionType[q_data['question_type'].upper()],
+            points=float(q_data['points']),
+            order=idx,
+            explanation=q_data.get('explanation', '')
+        )
+        db.session.add(question)
+        db.session.flush()
+        for opt_idx, opt_data in enumerate(q_data['options'], 1):
+            db.session.add(QuestionOption(
+                question_id=question.id,
+                option_text=opt_data['text'],
+                is_correct=bool(opt_data['is_correct']),
+                order=opt_idx
+            ))
+
+
+def persist_bulk(test_id, questions):
+    test_generation.add_questions(test_id, questions)
+
+
+STRATEGIES = {'per-question': persist_per_question, 'bulk': persist_bulk}
+
+
+def run(app, strategy, questions, run_no):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        test = Test(title=f"Bench {strategy} {run_no}", duration_minutes=30, passing_score=50,
+                    creator_id=app.config['BENCH_USER_ID'])
+        db.session.add(test)
+        db.session.commit()
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            start = time.perf_counter()
+            STRATEGIES[strategy](test.id, questions)
+            db.session.commit()
+            elapsed = time.perf_counter() - start
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+        stored = Question.query.filter_by(test_id=test.id).count()
+        if stored != len(questions):
+            raise SystemExit(f"{strategy} stored {stored} of {len(questions)} questions")
+    # The COMMIT itself is not a cursor execution, so only data statements are counted
+    return elapsed, len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    app = make_app(args)
+    provider = FakeProvider()
+    print(f"db={app.config['SQLALCHEMY_DATABASE_URI']}")
+    print(f"{'questions':>9} {'strategy':>13} {'statements':>10} {'median ms':>10} {'ms/question':>12}")
+    for size in args.sizes:
+        questions = extract_questions(provider.build_reply('bulk insert benchmark', size))
+        for strategy in STRATEGIES:
+            timings = []
+            for run_no in range(args.runs):
+                elapsed, statements = run(app, strategy, questions, run_no)
+                timings.append(elapsed * 1000)
+            median = statistics.median(timings)
+            print(f"{size:>9} {strategy:>13} {statements:>10} {median:>10.1f} {median / size:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
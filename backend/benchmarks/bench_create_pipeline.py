@@ -0,0 +1,115 @@
+"""Benchmark the create-test pipeline offline
+
+Drives generation jobs end to end (provider reply, parsing, validation and
+persistence) against the fake or replay provider, so no network access is
+needed. Uses a throwaway SQLite database unless --database-url is given.
+The AI rate limit is off unless --rate-limit sets one, so the timings are
+the pipeline's rather than time spent waiting for rate-limit tokens; jobs
+that come back short of the requested questions fail the run.
+
+Usage (from backend/):
+    python benchmarks/bench_create_pipeline.py [--sizes 10 50 100] [--runs 5]
+        [--provider fake|replay] [--replay-dir DIR] [--latency-ms 0] [--stream]
+        [--rate-limit PER_MINUTE]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.test import GenerationJob  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import test_generation  # noqa: E402
+
+
+def make_app(args):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+        DEBUG = False
+        QUESTION_PROVIDER = args.provider
+        QUESTION_PROVIDER_REPLAY_DIR = args.replay_dir
+        QUESTION_PROVIDER_LATENCY_MS = args.latency_ms
+        GENERATION_CACHE_ENABLED = False
+        AI_RATE_LIMIT_PER_MINUTE = args.rate_limit
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        user = User.query.filter_by(email='bench@example.com').first()
+        if user is None:
+            user = User(email='bench@example.com', password='-', first_name='Bench', last_name='User', role='admin')
+            db.session.add(user)
+            db.session.commit()
+        app.config['BENCH_USER_ID'] = user.id
+    return app
+
+
+def run_job(app, num_questions, run, stream):
+    with app.app_context():
+        job = GenerationJob(
+            id=f"bench-{num_questions}-{run}-{time.monotonic_ns()}",
+            creator_id=app.config['BENCH_USER_ID'],
+            params={
+                'title': f"Bench {num_questions}",
+                'topic': f"benchmark topic {run}",
+                'duration_minutes': 30,
+                'passing_score': 50,
+                'num_questions': num_questions,
+                'stream': stream
+            }
+        )
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+
+    start = time.perf_counter()
+    test_generation.run_generation_job(app, job_id)
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        job = db.session.get(GenerationJob, job_id)
+        if job.status != 'completed':
+            raise SystemExit(f"Job for {num_questions} questions failed: {job.error}")
+        if job.questions_done != num_questions:
+            raise SystemExit(f"Job for {num_questions} questions only produced {job.questions_done}")
+        return elapsed, job.questions_done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--provider', choices=['fake', 'replay'], default='fake')
+    parser.add_argument('--replay-dir', default='ai_captures')
+    parser.add_argument('--latency-ms', type=int, default=0)
+    parser.add_argument('--stream', action='store_true')
+    parser.add_argument('--rate-limit', type=float, default=0,
+                        help='AI calls per minute (default 0: no rate limit)')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    app = make_app(args)
+    rate_limit = f"{args.rate_limit:g}/min" if args.rate_limit else 'off'
+    print(f"provider={args.provider} latency={args.latency_ms}ms stream={args.stream} rate_limit={rate_limit} "
+          f"db={app.config['SQLALCHEMY_DATABASE_URI']}")
+    print(f"{'questions':>9} {'median ms':>10} {'p90 ms':>8} {'ms/question':>12}")
+    for size in args.sizes:
+        timings = []
+        for run in range(args.runs):
+            elapsed, done = run_job(app, size, run, args.stream)
+            timings.append(elapsed * 1000)
+        timings.sort()
+        median = statistics.median(timings)
+        p90 = timings[min(len(timings) - 1, int(len(timings) * 0.9))]
+        print(f"{size:>9} {median:>10.1f} {p90:>8.1f} {median / max(done, 1):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Micro-benchmark JSON response encoding over representative API payloads
+
+Builds payloads shaped like each blueprint's largest responses and times
+turning them into a response object with Flask's default provider, with
+FastJSONProvider on the standard library encoder, and with FastJSONProvider
+on orjson (when installed).
+
+Usage (from backend/):
+    python benchmarks/bench_json.py [--questions 100] [--rows 100] [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app import json_provider  # noqa: E402
+from app.json_provider import FastJSONProvider  # noqa: E402
+
+NOW = datetime(2026, 10, 18, 9, 0, 0, 123456)
+
+
+def test_results(num_questions):
+    questions = []
+    for idx in range(num_questions):
+        options = [
+            {'id': idx * 4 + opt, 'text': f"Option {opt} for question {idx} with some realistic length",
+             'is_correct': opt == 1, 'user_selected': opt == idx % 4}
+            for opt in range(4)
+        ]
+        questions.append({
+            'id': idx, 'question_text': f"Question {idx}: which of the following best describes item {idx}?",
+            'question_type': 'single_mcq', 'points': 1.0,
+            'explanation': f"Explanation for question {idx}, a sentence or two long, as the model writes them.",
+            'options': options, 'user_answer': idx * 4 + idx % 4, 'is_correct': idx % 4 == 1
+        })
+    return {
+        'test_id': 1, 'test_title': 'Benchmark test', 'session_id': 1,
+        'start_time': NOW.isoformat(), 'end_time': (NOW + timedelta(minutes=40)).isoformat(), 'time_taken': 2400,
+        'total_points': float(num_questions), 'earned_points': num_questions / 4,
+        'score_percentage': 25.0, 'passing_score': 50.0, 'passed': False, 'questions': questions,
+        'total_questions': num_questions, 'correct_answers': num_questions // 4,
+        'incorrect_answers': num_questions - num_questions // 4, 'unanswered': 0
+    }
+
+
+def test_list(rows):
+    return {
+        'tests': [
+            {'id': idx, 'title': f"Test {idx}", 'description': 'A generated test', 'duration_minutes': 30,
+             'passing_score': 70.0, 'question_count': 20, 'created_at': NOW - timedelta(days=idx),
+             'status': 'completed', 'last_score': 82.5, 'last_attempt_date': NOW - timedelta(hours=idx),
+             'session_id': idx, 'remaining_time': None}
+            for idx in range(rows)
+        ],
+        'total': rows, 'pages': 1, 'current_page': 1
+    }
+
+
+def leaderboard(rows):
+    return {
+        'leaderboard': [
+            {'rank': idx + 1, 'user_id': idx, 'name': f"User {idx}", 'email': f"user{idx}@example.com",
+             'stats': {'total_tests': 12, 'average_score': 78.25, 'tests_passed': 9, 'highest_score': 98.0}}
+            for idx in range(rows)
+        ],
+        'total_users': rows
+    }
+
+
+def users(rows):
+    return {
+        'users': [
+            {'id': idx, 'email': f"user{idx}@example.com", 'first_name': 'First', 'last_name': 'Last',
+             'role': 'user', 'is_active': True, 'created_at': NOW.isoformat()}
+            for idx in range(rows)
+        ],
+        'pagination': {'page': 1, 'per_page': rows, 'total_pages': 1, 'total_users': rows}
+    }
+
+
+def dashboard():
+    return {
+        'testsAttempted': 14, 'testsCompleted': 12, 'averageUserScore': 78.3, 'bestScore': 98.0,
+        'lastAttemptDate': NOW.isoformat(), 'upcomingTests': 3, 'timeSpentTotal': 7200.0, 'passedTests': 9,
+        'currentStreak': 4, 'totalPoints': 120, 'rank': 7, 'improvement': 4.5
+    }
+
+
+def saved_answers(num_questions):
+    # Progress payloads are keyed by question id (ints)
+    return {'session_id': 1, 'remaining_time': 1200,
+            'saved_answers': {idx: idx * 4 + 1 for idx in range(num_questions)}}
+
+
+def providers():
+    flask_app = Flask(__name__)
+    candidates = [('flask default', DefaultJSONProvider(flask_app)), ('fast (stdlib)', FastJSONProvider(flask_app))]
+    if json_provider.orjson is not None:
+        candidates.append(('fast (orjson)', FastJSONProvider(flask_app)))
+    return flask_app, candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    payloads = {
+        'tests: results': test_results(args.questions),
+        'tests: list': test_list(args.rows),
+        'tests: saved answers': saved_answers(args.questions),
+        'leaderboard: list': leaderboard(args.rows),
+        'users: list': users(args.rows),
+        'dashboard: stats': dashboard()
+    }
+    flask_app, candidates = providers()
+    orjson_module = json_provider.orjson
+    if orjson_module is None:
+        print("orjson is not installed; only the standard library encoder is measured")
+
+    print(f"{'payload':<22}{'bytes':>8}" + ''.join(f"{name + ' us':>18}" for name, _ in candidates) + f"{'speedup':>9}")
+    with flask_app.app_context():
+        for label, payload in payloads.items():
+            timings = []
+            size = 0
+            for name, provider in candidates:
+                # The stdlib variant of the fast provider is measured with orjson hidden
+                json_provider.orjson = None if name == 'fast (stdlib)' else orjson_module
+                size = len(provider.response(payload).get_data())
+                seconds = min(timeit.repeat(lambda: provider.response(payload), number=args.repeat, repeat=5))
+                timings.append(seconds / args.repeat * 1e6)
+            json_provider.orjson = orjson_module
+            row = f"{label:<22}{size:>8}" + ''.join(f"{timing:>18.1f}" for timing in timings)
+            print(row + f"{timings[0] / timings[-1]:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
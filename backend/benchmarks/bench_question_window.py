@@ -0,0 +1,103 @@
+"""Compare the full exam bootstrap with the windowed one as tests grow
+
+Seeds randomized tests of increasing size and measures the first response
+the take-test page waits for: the full bootstrap, and the windowed one
+(?window=N) that carries only the questions around the current one. Also
+times paging through the rest with cursors. Reports body size, the time
+to build it once the snapshot is warm, and the transfer time at
+--kbps, the link speed of a slow mobile connection.
+
+Usage (from backend/):
+    python benchmarks/bench_question_window.py [--sizes 50 500 2000] [--window 25] [--kbps 400]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.services.ai_parser import extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+from app.services.test_generation import persist_test  # noqa: E402
+
+
+def make_app():
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'window.db')}"
+        DEBUG = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def login(client):
+    user = {'email': 'window@example.com', 'password': 'bench', 'first_name': 'Window', 'last_name': 'Bench'}
+    client.post('/api/auth/register', json=user)
+    token = client.post('/api/auth/login', json=user).get_json()['access_token']
+    return {'Authorization': f"Bearer {token}"}
+
+
+def seed_test(app, size):
+    questions = extract_questions(FakeProvider().build_reply(f"window bench {size}", size))
+    with app.app_context():
+        params = {'title': f"Window bench {size}", 'duration_minutes': 60, 'passing_score': 50, 'is_randomized': True}
+        test = persist_test(params, None, questions)
+        db.session.commit()
+        return test.id
+
+
+def timed_get(client, url, headers, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append(time.perf_counter() - start)
+    if response.status_code != 200:
+        raise SystemExit(f"{url} failed with {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response, statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 2000])
+    parser.add_argument('--window', type=int, default=25)
+    parser.add_argument('--kbps', type=float, default=400)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    headers = login(client)
+
+    def transfer_ms(body):
+        return len(body) * 8 / (args.kbps * 1000) * 1000
+
+    print(f"{'questions':>9}  {'mode':<9}{'bytes':>10}{'build ms':>10}{'link ms':>10}{'pages':>7}{'page ms':>9}")
+    for size in args.sizes:
+        test_id = seed_test(app, size)
+        url = f"/api/tests/{test_id}/bootstrap"
+        full, full_ms = timed_get(client, url, headers, args.runs)
+        print(f"{size:>9}  {'full':<9}{len(full.data):>10}{full_ms:>10.1f}{transfer_ms(full.data):>10.0f}")
+
+        first, first_ms = timed_get(client, f"{url}?window={args.window}", headers, args.runs)
+        page_timings = []
+        cursor = first.get_json()['next_cursor']
+        while cursor:
+            page, page_ms = timed_get(client, f"{url}?cursor={cursor}", headers, 1)
+            page_timings.append(page_ms)
+            cursor = page.get_json()['next_cursor']
+        page_ms = statistics.median(page_timings) if page_timings else 0.0
+        print(f"{size:>9}  {'windowed':<9}{len(first.data):>10}{first_ms:>10.1f}{transfer_ms(first.data):>10.0f}"
+              f"{len(page_timings):>7}{page_ms:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
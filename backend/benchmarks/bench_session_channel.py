@@ -0,0 +1,139 @@
+"""Compare autosaves over HTTP with autosaves over the session socket
+
+Serves the app on a local port and sends the same --saves delta saves
+twice: as POST /progress requests (each on a fresh connection, as a
+browser does once keep-alive has lapsed, and each with its JWT decode
+and token blocklist lookup) and as messages on one session socket,
+authenticated once at connect. Reports statements and median latency
+per save. Needs flask-sock (server) and simple-websocket (client).
+
+Usage (from backend/):
+    python benchmarks/bench_session_channel.py [--saves 300] [--port 5099]
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.services.ai_parser import extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+from app.services.test_generation import persist_test  # noqa: E402
+
+
+def make_app():
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'channel.db')}"
+        DEBUG = False
+        SESSION_SOCKET_ENABLED = True
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+
+def request(port, method, path, body=None, token=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    data = json.loads(response.read() or b'null')
+    conn.close()
+    if response.status not in (200, 201):
+        raise SystemExit(f"{method} {path} failed with {response.status}: {data}")
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--saves', type=int, default=300)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+    try:
+        import flask_sock  # noqa: F401
+        from simple_websocket import Client
+    except ImportError:
+        raise SystemExit("This benchmark needs flask-sock and simple-websocket installed")
+
+    app = make_app()
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    user = {'email': 'channel@example.com', 'password': 'bench', 'first_name': 'Chan', 'last_name': 'Nel'}
+    request(args.port, 'POST', '/api/auth/register', user)
+    token = request(args.port, 'POST', '/api/auth/login', user)['access_token']
+    questions = extract_questions(FakeProvider().build_reply('channel bench', 50))
+    with app.app_context():
+        test_id = persist_test({'title': 'Channel bench', 'duration_minutes': 600, 'passing_score': 50}, None,
+                               questions).id
+        db.session.commit()
+        counter = StatementCounter(db.engine)
+    questions = request(args.port, 'GET', f"/api/tests/{test_id}/bootstrap", token=token)['questions']
+
+    def body(seq):
+        question = questions[seq % len(questions)]
+        answer = 'an answer' if question['question_type'] == 'fill_blank' else (
+            [question['options'][0]['id']] if question['question_type'] == 'multiple_mcq'
+            else question['options'][0]['id'])
+        return {'seq': seq, 'changes': {str(question['id']): answer}, 'current_question_index': seq % len(questions)}
+
+    print(f"{'transport':<10}{'saves':>7}{'stmts/save':>12}{'median ms':>11}")
+    timings = []
+    with counter:
+        for seq in range(1, args.saves + 1):
+            start = time.perf_counter()
+            request(args.port, 'POST', f"/api/tests/{test_id}/progress", body(seq), token)
+            timings.append(time.perf_counter() - start)
+    print(f"{'http':<10}{args.saves:>7}{counter.count / args.saves:>12.1f}{statistics.median(timings) * 1000:>11.2f}")
+
+    ws = Client.connect(f"ws://127.0.0.1:{args.port}/api/tests/{test_id}/session/socket")
+    ws.send(json.dumps({'type': 'auth', 'token': token}))
+    json.loads(ws.receive(5))
+    timings = []
+    with counter:
+        for seq in range(args.saves + 1, 2 * args.saves + 1):
+            start = time.perf_counter()
+            ws.send(json.dumps({'type': 'save', **body(seq)}))
+            reply = json.loads(ws.receive(5))
+            timings.append(time.perf_counter() - start)
+            if reply.get('type') != 'ack' or reply.get('stale'):
+                raise SystemExit(f"Socket save failed: {reply}")
+    ws.close()
+    print(f"{'socket':<10}{args.saves:>7}{counter.count / args.saves:>12.1f}{statistics.median(timings) * 1000:>11.2f}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
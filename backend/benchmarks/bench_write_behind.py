@@ -0,0 +1,158 @@
+"""Compare direct autosaves with the write-behind journal under many candidates
+
+Runs --sessions candidates through --rounds autosave rounds. In each
+round every candidate posts one delta save (a changed answer, the
+remaining time and the current question) to /progress. In direct mode
+each save is written and committed by the request. In journal mode the
+request only appends it to the autosave journal, and the journal is
+flushed once per round, as its flusher would every
+AUTOSAVE_FLUSH_INTERVAL_SECONDS. Reports the statements (and the writes
+among them) and commits the database received, and the median request
+time; the commit count is what bounds how many candidates one database
+can take. Both modes must
+leave the same answers behind.
+
+Usage (from backend/):
+    python benchmarks/bench_write_behind.py [--sessions 50] [--rounds 20] [--questions 20]
+        [--database-url postgresql://...]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.services import autosave_journal  # noqa: E402
+from app.services.ai_parser import extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+from app.services.test_generation import persist_test  # noqa: E402
+
+
+def make_app(args, journal_path=None):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'wb.db')}"
+        DEBUG = False
+        AUTOSAVE_JOURNAL_PATH = journal_path
+        # The benchmark flushes by hand once per round
+        AUTOSAVE_FLUSH_INTERVAL_SECONDS = 3600
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def login(client, number):
+    user = {'email': f"candidate{number}@example.com", 'password': 'bench', 'first_name': 'Cand', 'last_name': 'Idate'}
+    client.post('/api/auth/register', json=user)
+    token = client.post('/api/auth/login', json=user).get_json()['access_token']
+    return {'Authorization': f"Bearer {token}"}
+
+
+def answer_for(question, round_no):
+    if question['question_type'] == 'fill_blank':
+        return f"answer {round_no}"
+    if question['question_type'] == 'multiple_mcq':
+        return [option['id'] for option in question['options'][round_no % 2:round_no % 2 + 2]]
+    return question['options'][round_no % len(question['options'])]['id']
+
+
+class DatabaseCounter:
+    def __init__(self, app):
+        with app.app_context():
+            self.engine = db.engine
+        self.statements = 0
+        self.writes = 0
+        self.commits = 0
+
+    def _statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        if not statement.lstrip().upper().startswith('SELECT'):
+            self.writes += 1
+
+    def _commit(self, conn):
+        self.commits += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._statement)
+        event.listen(self.engine, 'commit', self._commit)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._statement)
+        event.remove(self.engine, 'commit', self._commit)
+
+
+def run(args, journal_path=None):
+    app = make_app(args, journal_path)
+    journal = autosave_journal.get_autosave_journal(app)
+    client = app.test_client()
+    questions = extract_questions(FakeProvider().build_reply('write-behind bench', args.questions))
+    with app.app_context():
+        test_id = persist_test({'title': 'Write-behind bench', 'duration_minutes': 60, 'passing_score': 50}, None,
+                               questions).id
+        db.session.commit()
+
+    candidates = []
+    for number in range(args.sessions):
+        headers = login(client, number)
+        bootstrap = client.get(f"/api/tests/{test_id}/bootstrap", headers=headers).get_json()
+        candidates.append({'headers': headers, 'questions': bootstrap['questions'], 'answers': {}})
+
+    url = f"/api/tests/{test_id}/progress"
+    timings = []
+    counter = DatabaseCounter(app)
+    with counter:
+        for round_no in range(1, args.rounds + 1):
+            for candidate in candidates:
+                question = candidate['questions'][round_no % len(candidate['questions'])]
+                answer = answer_for(question, round_no)
+                candidate['answers'][str(question['id'])] = answer
+                body = {'seq': round_no, 'changes': {str(question['id']): answer},
+                        'remaining_time': 3600 - round_no, 'current_question_index': round_no}
+                start = time.perf_counter()
+                response = client.post(url, json=body, headers=candidate['headers'])
+                timings.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise SystemExit(f"Save failed with {response.status_code}: {response.get_data(as_text=True)}")
+            if journal is not None:
+                journal.flush(block=True)
+
+    for candidate in candidates:
+        saved = client.get(f"/api/tests/{test_id}/bootstrap", headers=candidate['headers']).get_json()
+        if {str(key): value for key, value in saved['saved_answers'].items()} != candidate['answers']:
+            raise SystemExit(f"{'Journal' if journal else 'Direct'} mode lost answers")
+
+    if journal is not None:
+        journal.close()
+        autosave_journal._journal = None
+    return counter.statements, counter.writes, counter.commits, statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    saves = args.sessions * args.rounds
+    print(f"{saves} saves from {args.sessions} candidates over {args.rounds} rounds")
+    print(f"{'mode':<9}{'statements':>12}{'writes':>8}{'commits':>9}{'commits/save':>14}{'median ms':>11}")
+    for mode in ('direct', 'journal'):
+        journal_path = os.path.join(tempfile.mkdtemp(), 'autosave.journal') if mode == 'journal' else None
+        statements, writes, commits, median_ms = run(args, journal_path)
+        print(f"{mode:<9}{statements:>12}{writes:>8}{commits:>9}{commits / saves:>14.2f}{median_ms:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Check that building the app stays cheap enough for fast worker boot
+
+Runs ``create_app()`` in a fresh interpreter, the way a gunicorn worker or
+an alembic/CLI invocation would, and fails if it takes longer than the
+budget or drags in modules that should only load on first use.
+
+Usage (from backend/):
+    python benchmarks/check_import_time.py [--budget-ms 1500] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy client libraries that must stay lazy
+FORBIDDEN_MODULES = ['google.generativeai', 'grpc', 'google.protobuf']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({'ms': elapsed, 'modules': sorted(sys.modules)}))
+"""
+
+
+def measure():
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"create_app() failed in a fresh interpreter (exit {result.returncode})")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_TIME_BUDGET_MS', 1500)))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [measure() for _ in range(args.runs)]
+    timings = [sample['ms'] for sample in samples]
+    median = statistics.median(timings)
+    loaded = set(samples[-1]['modules'])
+    leaked = [name for name in FORBIDDEN_MODULES if name in loaded]
+
+    print(f"create_app() import+build: median {median:.1f} ms, "
+          f"min {min(timings):.1f} ms, max {max(timings):.1f} ms over {args.runs} runs")
+    print(f"budget: {args.budget_ms:.0f} ms, modules loaded: {len(loaded)}")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: median {median:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        failed = True
+    if leaked:
+        print(f"FAIL: eagerly imported {', '.join(leaked)}")
+        failed = True
+
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
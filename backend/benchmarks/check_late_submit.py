@@ -0,0 +1,112 @@
+"""Check that a submission after the deadline only counts autosaved answers
+
+Starts a session on a test of single-answer questions, autosaves a wrong
+answer to the first question, then submits every correct answer twice
+over: once in time, where the submitted answers count, and once after
+the deadline plus grace, where they must be ignored in favour of what
+was autosaved. Runs against both answer stores.
+
+Usage (from backend/):
+    python benchmarks/check_late_submit.py [--database-url postgresql://...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.test import TestSession  # noqa: E402
+from app.services.test_generation import persist_test  # noqa: E402
+
+QUESTIONS = [
+    {
+        'question_text': f"Which option is number {idx}?",
+        'question_type': 'single_mcq',
+        'options': [{'text': f"Option {opt}", 'is_correct': opt == idx} for opt in range(4)],
+        'explanation': '',
+        'points': 1.0
+    }
+    for idx in range(4)
+]
+
+
+def make_app(args, answer_store):
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'late.db')}"
+        DEBUG = False
+        ANSWER_STORE = answer_store
+
+    app = create_app(CheckConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def login(client, email):
+    user = {'email': email, 'password': 'check', 'first_name': 'Late', 'last_name': 'Check'}
+    client.post('/api/auth/register', json=user)
+    token = client.post('/api/auth/login', json=user).get_json()['access_token']
+    return {'Authorization': f"Bearer {token}"}
+
+
+def sit(app, client, headers, late):
+    """Autosave one wrong answer, then submit all correct ones; return the score"""
+    with app.app_context():
+        test = persist_test({'title': 'Late check', 'duration_minutes': 10, 'passing_score': 50}, None, QUESTIONS)
+        db.session.commit()
+        test_id = test.id
+        correct = {str(q.id): next(opt.id for opt in q.options if opt.is_correct) for q in test.questions}
+        first_id = str(test.questions[0].id)
+        wrong = next(opt.id for opt in test.questions[0].options if not opt.is_correct)
+
+    bootstrap = client.get(f"/api/tests/{test_id}/bootstrap", headers=headers).get_json()
+    saved = client.post(f"/api/tests/{test_id}/progress", json={'seq': 1, 'changes': {first_id: wrong}},
+                        headers=headers)
+    if saved.status_code != 200:
+        raise SystemExit(f"Autosave failed: {saved.get_json()}")
+    if late:
+        with app.app_context():
+            session = db.session.get(TestSession, bootstrap['session_id'])
+            grace = app.config['EXAM_DEADLINE_GRACE_SECONDS']
+            session.deadline = datetime.utcnow() - timedelta(seconds=grace + 1)
+            db.session.commit()
+
+    reply = client.post(f"/api/tests/{test_id}/submit", json={'answers': correct}, headers=headers)
+    if reply.status_code != 200:
+        raise SystemExit(f"Submit failed: {reply.get_json()}")
+    return reply.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    failed = False
+    for answer_store in ('rows', 'document'):
+        app = make_app(args, answer_store)
+        client = app.test_client()
+        headers = login(client, f"late-{answer_store}@example.com")
+        on_time = sit(app, client, headers, late=False)
+        late = sit(app, client, headers, late=True)
+        print(f"{answer_store:>8}: in time {on_time['score']:.0f}% (late={on_time['late']}), "
+              f"after the deadline {late['score']:.0f}% (late={late['late']})")
+        if on_time['score'] != 100 or on_time['late']:
+            print(f"FAIL: answers submitted in time were not graded ({answer_store})")
+            failed = True
+        if late['score'] != 0 or not late['late']:
+            print(f"FAIL: answers submitted after the deadline were graded ({answer_store})")
+            failed = True
+
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Check that question and result endpoints run a fixed number of queries
+
+Seeds tests of different sizes in a throwaway SQLite database (or
+--database-url), answers every question, and counts the SQL statements
+each endpoint issues. Fails if any endpoint's count grows with the number
+of questions or exceeds its budget.
+
+Usage (from backend/):
+    python benchmarks/check_query_counts.py [--sizes 5 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.services.ai_parser import extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+from app.services.test_generation import persist_test  # noqa: E402
+
+# Statements allowed per request, including the JWT blocklist lookup
+BUDGETS = {
+    'get_test (cold)': 5,
+    'get_test': 3,
+    'get_test_questions': 6,
+    'get_exam_bootstrap': 6,
+    'get_test_results': 7
+}
+
+
+def make_app(args):
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'queries.db')}"
+        DEBUG = False
+        TESTING = True
+
+    app = create_app(CheckConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def login(client):
+    user = {'email': 'queries@example.com', 'password': 'check', 'first_name': 'Query', 'last_name': 'Check',
+            'role': 'admin'}
+    client.post('/api/auth/register', json=user)
+    token = client.post('/api/auth/login', json=user).get_json()['access_token']
+    return {'Authorization': f"Bearer {token}"}
+
+
+def seed_test(app, size):
+    questions = extract_questions(FakeProvider().build_reply(f"query count check {size}", size))
+    with app.app_context():
+        # Randomized, so the per-session ordering is inside the budgets
+        params = {'title': f"Query check {size}", 'duration_minutes': 30, 'passing_score': 50, 'is_randomized': True}
+        test = persist_test(params, None, questions)
+        db.session.commit()
+        return test.id
+
+
+def answers_for(questions):
+    answers = {}
+    for question in questions:
+        if question['question_type'] == 'fill_blank':
+            answers[str(question['id'])] = 'an answer'
+        elif question['question_type'] == 'multiple_mcq':
+            answers[str(question['id'])] = [option['id'] for option in question['options'][:2]]
+        else:
+            answers[str(question['id'])] = question['options'][0]['id']
+    return answers
+
+
+def count_statements(app, call):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = call()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    if response.status_code != 200:
+        raise SystemExit(f"Request failed with {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return len(statements)
+
+
+def measure(app, client, headers, size):
+    test_id = seed_test(app, size)
+    counts = {}
+    counts['get_test (cold)'] = count_statements(app, lambda: client.get(f"/api/tests/{test_id}", headers=headers))
+    counts['get_test'] = count_statements(app, lambda: client.get(f"/api/tests/{test_id}", headers=headers))
+
+    # Start a session and save answers to half the questions so saved answers are loaded
+    questions = client.get(f"/api/tests/{test_id}/questions", headers=headers).get_json()['questions']
+    answers = answers_for(questions)
+    partial = dict(list(answers.items())[:len(answers) // 2])
+    client.post(f"/api/tests/{test_id}/progress", json={'answers': partial, 'remaining_time': 600,
+                                                        'current_question_index': 1}, headers=headers)
+    counts['get_test_questions'] = count_statements(
+        app, lambda: client.get(f"/api/tests/{test_id}/questions", headers=headers)
+    )
+    counts['get_exam_bootstrap'] = count_statements(
+        app, lambda: client.get(f"/api/tests/{test_id}/bootstrap", headers=headers)
+    )
+
+    submitted = client.post(f"/api/tests/{test_id}/submit", json={'answers': answers, 'timeSpent': 60},
+                            headers=headers).get_json()
+    session_id = submitted['session_id']
+    # The first results request may store the recalculated score; measure the steady state
+    client.get(f"/api/tests/{test_id}/results/{session_id}", headers=headers)
+    counts['get_test_results'] = count_statements(
+        app, lambda: client.get(f"/api/tests/{test_id}/results/{session_id}", headers=headers)
+    )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 50])
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    app = make_app(args)
+    client = app.test_client()
+    headers = login(client)
+    results = {size: measure(app, client, headers, size) for size in args.sizes}
+
+    print(f"{'endpoint':<20}" + ''.join(f"{f'{size} q':>8}" for size in args.sizes) + f"{'budget':>8}")
+    failed = False
+    for endpoint, budget in BUDGETS.items():
+        counts = [results[size][endpoint] for size in args.sizes]
+        print(f"{endpoint:<20}" + ''.join(f"{count:>8}" for count in counts) + f"{budget:>8}")
+        if len(set(counts)) > 1:
+            print(f"FAIL: {endpoint} query count grows with test size")
+            failed = True
+        if max(counts) > budget:
+            print(f"FAIL: {endpoint} runs {max(counts)} queries, budget is {budget}")
+            failed = True
+
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
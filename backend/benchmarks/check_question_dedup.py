@@ -0,0 +1,145 @@
+"""Check that near-duplicate rejection keeps distinct questions
+
+Runs the dedup rules against pairs that must both survive (one-word stem
+changes with a different correct answer) and pairs that must be caught
+(rewordings with the same options and answer), generates a large test
+from the fake provider and expects no rejections, and checks that the
+question bank is compared per topic and forgets questions deleted by
+any worker.
+
+Usage (from backend/):
+    python benchmarks/check_question_dedup.py [--database-url postgresql://...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.test import Question, QuestionOption, Test  # noqa: E402
+from app.services.question_dedup import MinHashIndex, fingerprint, question_bank_index, signature  # noqa: E402
+from app.services.test_generation import generate_questions, persist_test  # noqa: E402
+
+
+def mcq(text, options, correct):
+    return {
+        'question_text': text,
+        'question_type': 'single_mcq',
+        'options': [{'text': option, 'is_correct': option == correct} for option in options],
+        'explanation': '',
+        'points': 1.0
+    }
+
+
+CAPITALS = ['Paris', 'Madrid', 'Berlin', 'Rome']
+KEYWORDS = ['def', 'class', 'lambda', 'import']
+
+DISTINCT = [
+    (mcq('What is the capital of France?', CAPITALS, 'Paris'),
+     mcq('What is the capital of Spain?', CAPITALS, 'Madrid')),
+    (mcq('How do you define a function in Python?', KEYWORDS, 'def'),
+     mcq('How do you define a class in Python?', KEYWORDS, 'class')),
+    (mcq('Is Python compiled to bytecode?', ['Yes', 'No'], 'Yes'),
+     mcq('Is Python statically typed?', ['Yes', 'No'], 'No')),
+]
+
+DUPLICATES = [
+    (mcq('What is the capital of France?', CAPITALS, 'Paris'),
+     mcq('what is the capital of France', CAPITALS, 'Paris')),
+    (mcq('What is the capital of France?', CAPITALS, 'Paris'),
+     mcq('What is the capital city of France?', CAPITALS, 'Paris')),
+]
+
+
+def is_duplicate(first, second, threshold):
+    index = MinHashIndex(threshold)
+    text, answer = fingerprint(first)
+    index.add(0, text, answer=answer)
+    text, answer = fingerprint(second)
+    return bool(index.query(sig=signature(text), answer=answer))
+
+
+def make_app(args):
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'dedup.db')}"
+        DEBUG = False
+        QUESTION_PROVIDER = 'fake'
+        AI_RATE_LIMIT_PER_MINUTE = 0
+
+    app = create_app(CheckConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def check_pairs(threshold):
+    failures = []
+    for first, second in DISTINCT:
+        if is_duplicate(first, second, threshold):
+            failures.append(f"distinct questions rejected: {first['question_text']!r} / {second['question_text']!r}")
+    for first, second in DUPLICATES:
+        if not is_duplicate(first, second, threshold):
+            failures.append(f"duplicate not caught: {first['question_text']!r} / {second['question_text']!r}")
+    print(f"{len(DISTINCT)} distinct and {len(DUPLICATES)} duplicate pairs at threshold {threshold}")
+    return failures
+
+
+def check_fake_provider(size):
+    questions = generate_questions('dedup check', size)
+    print(f"fake provider: {len(questions)} of {size} questions kept")
+    if len(questions) != size:
+        return [f"fake provider questions were rejected as duplicates ({len(questions)} of {size} kept)"]
+    return []
+
+
+def check_bank():
+    failures = []
+    question = mcq('Which keyword starts a generator function body?', ['yield', 'return', 'await', 'pass'], 'yield')
+    text, answer = fingerprint(question)
+    sig = signature(text)
+
+    test_id = persist_test({'title': 'Bank', 'topic': 'Python Generators', 'duration_minutes': 10,
+                            'passing_score': 50}, None, [question]).id
+    db.session.commit()
+    if not question_bank_index('python generators').query(sig=sig, answer=answer):
+        failures.append('a question already in the bank for the same topic was not caught')
+    if question_bank_index('SQL joins').query(sig=sig, answer=answer):
+        failures.append('a question in the bank for another topic was rejected')
+
+    # Deleted the way another worker would, without touching this process's index
+    question_ids = [row.id for row in Question.query.with_entities(Question.id).filter_by(test_id=test_id)]
+    QuestionOption.query.filter(QuestionOption.question_id.in_(question_ids)).delete(synchronize_session=False)
+    Question.query.filter_by(test_id=test_id).delete()
+    Test.query.filter_by(id=test_id).delete()
+    db.session.commit()
+    if question_bank_index('python generators').query(sig=sig, answer=answer):
+        failures.append('a deleted question is still rejecting new ones')
+    print('question bank: scoped to the topic, deletions picked up')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    app = make_app(args)
+    with app.app_context():
+        failures = check_pairs(app.config['QUESTION_DEDUP_THRESHOLD'])
+        failures += check_fake_provider(args.questions)
+        failures += check_bank()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Check that keeping exam time costs no database writes
+
+Starts a session, then replays what the take page used to send for the
+clock alone over a --minutes long sitting: an update-time call and a
+progress save carrying remaining_time every 30 seconds. Counts the write
+statements they cause, which must be zero now the server derives the
+time left from the session's deadline, and checks that a time sent by
+the client is never what the server reports back.
+
+Usage (from backend/):
+    python benchmarks/check_timer_writes.py [--minutes 60] [--database-url postgresql://...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.services.ai_parser import extract_questions  # noqa: E402
+from app.services.ai_provider import FakeProvider  # noqa: E402
+from app.services.test_generation import persist_test  # noqa: E402
+
+TIME_SAVE_INTERVAL = 30
+
+
+def make_app(args):
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'timer.db')}"
+        DEBUG = False
+
+    app = create_app(CheckConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def login(client):
+    user = {'email': 'timer@example.com', 'password': 'check', 'first_name': 'Timer', 'last_name': 'Check'}
+    client.post('/api/auth/register', json=user)
+    token = client.post('/api/auth/login', json=user).get_json()['access_token']
+    return {'Authorization': f"Bearer {token}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=int, default=60)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    app = make_app(args)
+    client = app.test_client()
+    headers = login(client)
+    questions = extract_questions(FakeProvider().build_reply('timer check', 10))
+    with app.app_context():
+        test_id = persist_test({'title': 'Timer check', 'duration_minutes': args.minutes, 'passing_score': 50}, None,
+                               questions).id
+        db.session.commit()
+        engine = db.engine
+    client.get(f"/api/tests/{test_id}/bootstrap", headers=headers)
+
+    writes = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith('SELECT'):
+            writes.append(statement)
+
+    failed = False
+    requests = 0
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for remaining in range(args.minutes * 60 - TIME_SAVE_INTERVAL, 0, -TIME_SAVE_INTERVAL):
+            reply = client.post(f"/api/tests/{test_id}/session/update-time", json={'remaining_time': remaining},
+                                headers=headers).get_json()
+            # Too low to be a clock that has been running only seconds
+            spoofed = client.post(f"/api/tests/{test_id}/progress", json={'remaining_time': 1}, headers=headers)
+            requests += 2
+            if spoofed.status_code != 200 or reply['remaining_time'] < args.minutes * 60 - 5:
+                print(f"FAIL: server reported {reply['remaining_time']}s left after a client sent {remaining}s")
+                failed = True
+                break
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    timer_writes = [statement for statement in writes if 'remaining_time' in statement]
+    print(f"{requests} timer requests, {len(writes)} write statements, {len(timer_writes)} writing remaining_time")
+    if writes:
+        print("FAIL: keeping time still writes to the database")
+        failed = True
+    status = client.get(f"/api/tests/{test_id}/session/status", headers=headers).get_json()
+    print(f"server remaining_time: {status['remaining_time']}s of {args.minutes * 60}s")
+
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
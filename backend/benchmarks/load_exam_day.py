@@ -0,0 +1,316 @@
+"""Replay an exam day against a locally launched server to find its capacity
+
+Seeds a test and --candidates candidate accounts, launches the app (a
+threaded Werkzeug server, or gunicorn with --server gunicorn) on a fresh
+database, and then runs the exam day once per --concurrency level:
+
+    every candidate logs in (the login surge), loads the test's questions,
+    autosaves --saves times (a changed answer each time, and the remaining
+    time every --time-every saves, as older clients still do), submits and
+    reads the results.
+
+--concurrency candidates run at once, with no think time unless
+--think-ms is given, so each stage runs as fast as the server allows.
+For every stage it reports p50/p95/p99 latency, error rate and SQL
+statements per request for each route (from the X-Query-Count header the
+server adds with QUERY_COUNT_HEADER), plus the stage's throughput. The
+summary names the stage where throughput stopped growing: the node's
+throughput at saturation. SQLite serializes writes, so pass a
+PostgreSQL --database-url to size a real node. --url targets a server
+that is already running (with QUERY_COUNT_HEADER=true for statement
+counts); the candidates are then registered through the API.
+--server gunicorn needs gunicorn from requirements-optional.txt.
+
+Usage (from backend/):
+    python benchmarks/load_exam_day.py [--candidates 200] [--concurrency 4 16 64] [--saves 20]
+        [--server werkzeug|gunicorn] [--workers 4] [--threads 8] [--database-url postgresql://...]
+        [--url http://host:port]
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PASSWORD = 'exam-day'
+# Throughput has saturated once a stage with more concurrency adds less than this
+SATURATION_GAIN = 0.10
+
+
+def serve(args):
+    """Run the app in this process (launched by the simulator as a subprocess)"""
+    from werkzeug.serving import make_server
+
+    from app import create_app
+
+    server = make_server('127.0.0.1', args.port, create_app(), threaded=True)
+    server.serve_forever()
+
+
+def seed(args, database_url):
+    """Create the schema, one test and the candidate accounts; returns the test id"""
+    from werkzeug.security import generate_password_hash
+
+    from app import create_app
+    from app.config.config import Config
+    from app.extensions import db
+    from app.models.user import User
+    from app.services.ai_parser import extract_questions
+    from app.services.ai_provider import FakeProvider
+    from app.services.test_generation import persist_test
+
+    class SeedConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        DEBUG = False
+
+    app = create_app(SeedConfig)
+    with app.app_context():
+        db.create_all()
+        questions = extract_questions(FakeProvider().build_reply('exam day', args.questions))
+        test = persist_test({'title': 'Exam day', 'duration_minutes': 120, 'passing_score': 50}, None, questions)
+        # One hash for everyone; logging in still checks it every time
+        password = generate_password_hash(PASSWORD)
+        existing = {email for (email,) in db.session.query(User.email).filter(User.email.like('candidate%@example.com'))}
+        db.session.add_all(
+            User(email=email, password=password, first_name='Exam', last_name='Candidate', role='user')
+            for email in (candidate_email(number) for number in range(args.candidates))
+            if email not in existing
+        )
+        db.session.commit()
+        return test.id
+
+
+def candidate_email(number):
+    return f"candidate{number}@example.com"
+
+
+def launch(args, database_url):
+    """Start the server on a fresh port; returns the process and its log path"""
+    env = dict(os.environ, DATABASE_URL=database_url, QUERY_COUNT_HEADER='true', GENERATION_WORKERS='1')
+    log_path = os.path.join(tempfile.mkdtemp(), 'server.log')
+    if args.server == 'gunicorn':
+        if shutil.which('gunicorn') is None:
+            raise SystemExit("gunicorn is not installed; pip install -r requirements-optional.txt")
+        command = ['gunicorn', '-w', str(args.workers), '--threads', str(args.threads),
+                   '-b', f"127.0.0.1:{args.port}", 'run:app']
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(args.port)]
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"The server exited with {process.returncode}; see {log_path}")
+        try:
+            socket.create_connection(('127.0.0.1', args.port), timeout=1).close()
+            return process, log_path
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"The server did not start within 60 seconds; see {log_path}")
+
+
+class Client:
+    """Keep-alive HTTP client for one worker thread, recording every request"""
+
+    def __init__(self, host, port, record):
+        self.host = host
+        self.port = port
+        self.record = record
+        self.conn = None
+
+    def request(self, route, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.conn.getresponse()
+            payload = response.read()
+            status = response.status
+            query_count = response.getheader('X-Query-Count')
+        except (OSError, http.client.HTTPException):
+            self.conn = None
+            self.record(route, time.perf_counter() - start, False, None)
+            return None
+        ok = status < 400
+        self.record(route, time.perf_counter() - start, ok, int(query_count) if query_count is not None else None)
+        return json.loads(payload) if ok and payload else None
+
+
+def answer_for(question, save_no):
+    options = question['options']
+    if question['question_type'] == 'fill_blank':
+        return f"answer {save_no}"
+    if question['question_type'] == 'multiple_mcq':
+        return [option['id'] for option in options[save_no % 2:save_no % 2 + 2]]
+    return options[save_no % len(options)]['id']
+
+
+def take_exam(client, args, test_id, number):
+    """One candidate's exam: login, questions, autosaves, submit, results"""
+    tests = f"/api/tests/{test_id}"
+    login = client.request('POST /auth/login', 'POST', '/api/auth/login',
+                           {'email': candidate_email(number), 'password': PASSWORD})
+    if not login:
+        return
+    token = login['access_token']
+    loaded = client.request('GET /tests/<id>/questions', 'GET', f"{tests}/questions", token=token)
+    if not loaded:
+        return
+
+    questions = loaded['questions']
+    seq = loaded.get('last_save_seq', 0)
+    answers = {}
+    for save_no in range(1, args.saves + 1):
+        if args.think_ms:
+            time.sleep(args.think_ms / 1000)
+        question = questions[(number + save_no) % len(questions)]
+        answers[str(question['id'])] = answer_for(question, save_no)
+        seq += 1
+        client.request('POST /tests/<id>/progress', 'POST', f"{tests}/progress", {
+            'seq': seq,
+            'changes': {str(question['id']): answers[str(question['id'])]},
+            'current_question_index': save_no % len(questions)
+        }, token)
+        if args.time_every and save_no % args.time_every == 0:
+            client.request('POST /tests/<id>/session/update-time', 'POST', f"{tests}/session/update-time",
+                           {'remaining_time': 7200 - save_no * 10}, token)
+
+    submitted = client.request('POST /tests/<id>/submit', 'POST', f"{tests}/submit", {'answers': answers}, token)
+    if submitted:
+        client.request('GET /tests/<id>/results/<sid>', 'GET', f"{tests}/results/{submitted['session_id']}",
+                       token=token)
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+def run_stage(args, host, port, test_id, concurrency):
+    samples = {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def record(route, elapsed, ok, query_count):
+        with lock:
+            samples.setdefault(route, []).append((elapsed, ok, query_count))
+
+    def candidate(number):
+        if not hasattr(local, 'client'):
+            local.client = Client(host, port, record)
+        take_exam(local.client, args, test_id, number)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(candidate, range(args.candidates)))
+    return samples, time.perf_counter() - started
+
+
+def report_stage(concurrency, samples, elapsed):
+    requests = sum(len(route_samples) for route_samples in samples.values())
+    errors = sum(1 for route_samples in samples.values() for _, ok, _ in route_samples if not ok)
+    throughput = requests / elapsed
+    print(f"\nconcurrency {concurrency}: {requests} requests in {elapsed:.1f} s, {throughput:.0f} req/s, "
+          f"{errors / max(requests, 1):.1%} errors")
+    print(f"{'route':<36}{'reqs':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err%':>7}{'stmts/req':>11}")
+    all_latencies = []
+    for route, route_samples in samples.items():
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in route_samples)
+        all_latencies.extend(latencies)
+        failed = sum(1 for _, ok, _ in route_samples if not ok)
+        counts = [count for _, _, count in route_samples if count is not None]
+        statements = f"{sum(counts) / len(counts):.1f}" if counts else '-'
+        print(f"{route:<36}{len(latencies):>7}{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}"
+              f"{percentile(latencies, 99):>9.1f}{failed / len(latencies):>7.1%}{statements:>11}")
+    return throughput, percentile(sorted(all_latencies), 95), errors / max(requests, 1)
+
+
+def register_candidates(args, host, port):
+    """Create the candidate accounts through the API of a server we did not launch"""
+    client = Client(host, port, lambda *sample: None)
+    for number in range(args.candidates):
+        client.request('register', 'POST', '/api/auth/register', {
+            'email': candidate_email(number), 'password': PASSWORD, 'first_name': 'Exam', 'last_name': 'Candidate'
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--candidates', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--saves', type=int, default=20)
+    parser.add_argument('--time-every', type=int, default=3)
+    parser.add_argument('--think-ms', type=int, default=0)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--server', choices=['werkzeug', 'gunicorn'], default='werkzeug')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5097)
+    parser.add_argument('--database-url')
+    parser.add_argument('--url', help='Use a running server; its test must be given with --test-id')
+    parser.add_argument('--test-id', type=int)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    process = None
+    if args.url:
+        if args.test_id is None:
+            raise SystemExit("--url needs --test-id, the id of a test on that server")
+        host, port = urlsplit(args.url).hostname, urlsplit(args.url).port or 80
+        register_candidates(args, host, port)
+        test_id = args.test_id
+    else:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'exam_day.db')}"
+        test_id = seed(args, database_url)
+        process, log_path = launch(args, database_url)
+        host, port = '127.0.0.1', args.port
+        print(f"{args.server} server on {database_url.split('@')[-1]}, log: {log_path}")
+
+    print(f"{args.candidates} candidates, {args.questions} questions, {args.saves} saves each")
+    stages = []
+    try:
+        for concurrency in args.concurrency:
+            samples, elapsed = run_stage(args, host, port, test_id, concurrency)
+            stages.append((concurrency, *report_stage(concurrency, samples, elapsed)))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"\n{'concurrency':>11}{'req/s':>9}{'p95 ms':>9}{'err%':>7}")
+    for concurrency, throughput, p95, error_rate in stages:
+        print(f"{concurrency:>11}{throughput:>9.0f}{p95:>9.1f}{error_rate:>7.1%}")
+    saturated = next((earlier for earlier, later in zip(stages, stages[1:])
+                      if later[1] < earlier[1] * (1 + SATURATION_GAIN)), None)
+    if saturated:
+        print(f"saturated at concurrency {saturated[0]}: {saturated[1]:.0f} req/s "
+              f"(more concurrency added under {SATURATION_GAIN:.0%} throughput)")
+    else:
+        best = max(stages, key=lambda stage: stage[1])
+        print(f"not saturated; peak {best[1]:.0f} req/s at concurrency {best[0]}, try higher --concurrency")
+
+
+if __name__ == '__main__':
+    main()
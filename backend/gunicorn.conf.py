@@ -0,0 +1,47 @@
+"""Gunicorn settings, read from the environment; command-line flags override them
+
+The defaults match gunicorn's own, except that turning the session socket
+on (SESSION_SOCKET_ENABLED=true) makes gevent the default worker class, so
+every open socket is a greenlet rather than a whole worker:
+
+    SESSION_SOCKET_ENABLED=true GUNICORN_WORKER_CONNECTIONS=5000 gunicorn run:app
+
+gevent, psycogreen and flask-sock are in requirements-optional.txt.
+"""
+import os
+
+session_socket = os.getenv('SESSION_SOCKET_ENABLED', 'false').lower() == 'true'
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent' if session_socket else 'sync')
+# Concurrent connections per gevent worker (open sockets included)
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+# Workers are sized with WEB_CONCURRENCY, which gunicorn reads itself
+
+
+def on_starting(server):
+    if session_socket and worker_class == 'sync':
+        server.log.warning("SESSION_SOCKET_ENABLED with sync workers: every open session socket holds a whole worker")
+
+
+def post_worker_init(worker):
+    # Open the write-behind autosave journal, if configured, as each web worker
+    # starts, so saves an earlier worker left behind are replayed without
+    # waiting for traffic. Only web workers do this, not CLI commands.
+    flask_app = worker.wsgi
+    if not getattr(flask_app, 'config', {}).get('AUTOSAVE_JOURNAL_PATH'):
+        return
+    from app.services.autosave_journal import get_autosave_journal
+
+    with flask_app.app_context():
+        get_autosave_journal(flask_app)
+
+
+def post_fork(server, worker):
+    if worker_class != 'gevent':
+        return
+    try:
+        # Let psycopg2 wait on the database without blocking the other greenlets
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning("psycogreen is not installed; database calls block the whole gevent worker")
+        return
+    patch_psycopg()
@@ -62,6 +62,10 @@ export default function CreateTestDialog({
 		Partial<Record<keyof TestFormValues, string>>
 	>({});
 	const [isSubmitting, setIsSubmitting] = useState(false);
+	const [progress, setProgress] = useState<{ done: number; requested: number }>({
+		done: 0,
+		requested: 0,
+	});
 
 	const handleInputChange = (
 		e: React.ChangeEvent<HTMLInputElement | HTMLTextAreaElement>
@@ -128,20 +132,27 @@ export default function CreateTestDialog({
 				duration_minutes: parseInt(formData.duration_minutes),
 				passing_score: parseFloat(formData.passing_score),
 				num_questions: parseInt(formData.num_questions),
+				stream: true,
 				is_randomized: formData.is_randomized,
 				allow_review: formData.allow_review,
 				test_type: formData.test_type,
 				instructions: formData.instructions,
 			};
 
-			const response = await testService.createTest(testData);
-			onTestCreated(response);
+			const { job_id } = await testService.createTest(testData);
+			const job = await testService.waitForGenerationJob(
+				job_id,
+				(done, requested) => setProgress({ done, requested }),
+				1000
+			);
+			onTestCreated({ test_id: job.test_id });
 			setFormData(initialFormValues);
 			onOpenChange(false);
 		} catch (error: any) {
 			console.error("Error creating test:", error);
 		} finally {
 			setIsSubmitting(false);
+			setProgress({ done: 0, requested: 0 });
 		}
 	};
 
@@ -331,6 +342,8 @@ export default function CreateTestDialog({
 								<>
 									<span className="animate-spin mr-2">⚪</span>
 									Creating Test & Generating Questions...
+									{progress.requested > 0 &&
+										` (${progress.done}/${progress.requested})`}
 								</>
 							) : (
 								"Create Test"
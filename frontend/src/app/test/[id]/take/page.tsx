@@ -1,8 +1,13 @@
 "use client";
 
-import { useEffect, useState, useCallback } from "react";
+import { useEffect, useState, useCallback, useRef } from "react";
 import { useParams, useRouter } from "next/navigation";
 import { testService } from "@/services/testService";
+import {
+	openSessionChannel,
+	SessionChannel,
+	sessionChannelEnabled,
+} from "@/services/sessionChannel";
 import { Button } from "@/components/ui/button";
 import { Progress } from "@/components/ui/progress";
 import {
@@ -21,6 +26,24 @@ import { Question, Test } from "@/types";
 import { QuestionComponent } from "./QuestionComponent";
 import { debounce } from "lodash";
 
+// Questions are loaded a window at a time; the next window is fetched
+// once the candidate is this close to the end of what is loaded
+const QUESTION_WINDOW = 25;
+const PREFETCH_MARGIN = 5;
+// The server keeps the clock; re-read it this often, in seconds, to pick
+// up pauses and extensions
+const CLOCK_SYNC_INTERVAL = 60;
+// Reconnect a dropped session channel after this long, in seconds
+const CHANNEL_RETRY_INTERVAL = 15;
+
+interface QuestionWindow {
+	questions: Question[];
+	total_questions: number;
+	window: { start: number; end: number };
+	next_cursor: string | null;
+	prev_cursor: string | null;
+}
+
 export default function TakeTestPage() {
 	const params = useParams();
 	const router = useRouter();
@@ -43,10 +66,19 @@ export default function TakeTestPage() {
 
 	// State management
 	const [test, setTest] = useState<Test | null>(null);
+	// Sparse: only the windows fetched so far are filled in
 	const [questions, setQuestions] = useState<Question[]>([]);
+	const [questionCount, setQuestionCount] = useState(0);
+	const [loadedRange, setLoadedRange] = useState({ start: 0, end: 0 });
+	const [cursors, setCursors] = useState<{
+		next: string | null;
+		prev: string | null;
+	}>({ next: null, prev: null });
+	const fetchingCursor = useRef<string | null>(null);
 	const [currentIndex, setCurrentIndex] = useState(0);
 	const [answers, setAnswers] = useState<Record<number, any>>({});
 	const [timeRemaining, setTimeRemaining] = useState<number>(0);
+	const [isPaused, setIsPaused] = useState(false);
 	const [sessionId, setSessionId] = useState<number | null>(null);
 	const [showConfirmSubmit, setShowConfirmSubmit] = useState(false);
 	const [loading, setLoading] = useState(true);
@@ -54,24 +86,63 @@ export default function TakeTestPage() {
 	const [isSubmitting, setIsSubmitting] = useState(false);
 	const [isSaving, setIsSaving] = useState(false);
 
+	// Answers edited since the server last acknowledged them. Every save
+	// carries all of them, so when an older save arrives late and is dropped
+	// as stale, the newer one has already delivered its changes.
+	const unsavedChanges = useRef(new Map<number, { answer: any; edit: number }>());
+	const editCount = useRef(0);
+	const saveSeq = useRef(0);
+	// Local time (ms) the server's deadline falls at, so ticks count down
+	// without drifting and without trusting the local clock's absolute time
+	const deadlineAt = useRef(0);
+	// Live session channel while it is connected; saves go over HTTP otherwise
+	const channel = useRef<SessionChannel | null>(null);
+
+	const syncClock = useCallback(
+		(clock: { remaining_time: number; paused: boolean }) => {
+			deadlineAt.current = Date.now() + clock.remaining_time * 1000;
+			setIsPaused(clock.paused);
+			setTimeRemaining(clock.remaining_time);
+		},
+		[]
+	);
+
 	// Debounced progress update
 	const debouncedUpdateProgress = useCallback(
 		debounce(
-			async (
-				index: number,
-				currentAnswers: Record<number, any>,
-				time: number
-			) => {
+			async (index: number) => {
 				if (!sessionId) return;
 
+				const sent = new Map(unsavedChanges.current);
+				const changes: Record<number, any> = {};
+				sent.forEach(({ answer }, questionId) => {
+					changes[questionId] = answer;
+				});
+				const seq = ++saveSeq.current;
+
 				setIsSaving(true);
 				try {
-					await testService.updateProgress(testId, {
-						current_question_index: index,
-						remaining_time: time,
-						answers: currentAnswers,
+					const save = { seq, changes, current_question_index: index };
+					const live = channel.current;
+					const result =
+						live && live.isOpen()
+							? await live
+									.save(save)
+									.catch(() => testService.updateProgress(testId, save))
+							: await testService.updateProgress(testId, save);
+					if (result.stale) {
+						// Another tab saved past us; continue after its seq and resend
+						saveSeq.current = Math.max(saveSeq.current, result.acknowledged_seq);
+						return;
+					}
+					sent.forEach(({ edit }, questionId) => {
+						if (unsavedChanges.current.get(questionId)?.edit === edit) {
+							unsavedChanges.current.delete(questionId);
+						}
 					});
-					toast.success("Progress saved", { duration: 1000 });
+					if (sent.size > 0) {
+						toast.success("Progress saved", { duration: 1000 });
+					}
 				} catch (err) {
 					toast.error("Failed to save progress");
 					console.error("Error saving progress:", err);
@@ -85,6 +156,34 @@ export default function TakeTestPage() {
 		[testId, sessionId]
 	);
 
+	// Place a fetched window into the question list and remember where to page next
+	const mergeWindow = useCallback(
+		(page: QuestionWindow, direction: "next" | "prev" | "both") => {
+			const { start, end } = page.window;
+			setQuestions((prev) => {
+				const merged =
+					prev.length === page.total_questions
+						? prev.slice()
+						: new Array<Question>(page.total_questions);
+				page.questions.forEach((question, offset) => {
+					merged[start + offset] = question;
+				});
+				return merged;
+			});
+			setQuestionCount(page.total_questions);
+			setLoadedRange((prev) =>
+				direction === "both"
+					? { start, end }
+					: { start: Math.min(prev.start, start), end: Math.max(prev.end, end) }
+			);
+			setCursors((prev) => ({
+				next: direction === "prev" ? prev.next : page.next_cursor,
+				prev: direction === "next" ? prev.prev : page.prev_cursor,
+			}));
+		},
+		[]
+	);
+
 	// Initialize test and session
 	useEffect(() => {
 		const initializeTest = async () => {
@@ -92,20 +191,23 @@ export default function TakeTestPage() {
 				setLoading(true);
 				const safeTestId = typeof testId === "string" ? testId : "";
 
-				const [testResponse, questionsResponse] = await Promise.all([
-					testService.getTest(safeTestId),
-					testService.getTestQuestions(safeTestId),
-				]);
-
-				setTest(testResponse);
-				setQuestions(questionsResponse.questions);
-				setSessionId(questionsResponse.session_id);
-
-				setAnswers(questionsResponse.saved_answers || {});
-				setCurrentIndex(questionsResponse.current_question_index || 0);
-				setTimeRemaining(
-					questionsResponse.remaining_time || testResponse.duration_minutes * 60
+				const bootstrap = await testService.getExamBootstrap(
+					safeTestId,
+					QUESTION_WINDOW
 				);
+
+				setTest(bootstrap.test);
+				mergeWindow(bootstrap, "both");
+				setSessionId(bootstrap.session_id);
+
+				setAnswers(bootstrap.saved_answers || {});
+				saveSeq.current = bootstrap.last_save_seq || 0;
+				setCurrentIndex(bootstrap.current_question_index || 0);
+				syncClock({
+					remaining_time:
+						bootstrap.remaining_time ?? bootstrap.test.duration_minutes * 60,
+					paused: bootstrap.paused || false,
+				});
 			} catch (err) {
 				const errorMessage =
 					err instanceof Error ? err.message : "Failed to initialize test";
@@ -117,51 +219,142 @@ export default function TakeTestPage() {
 		};
 
 		initializeTest();
-	}, [testId]);
+	}, [testId, mergeWindow, syncClock]);
+
+	// Prefetch the neighbouring window before the candidate reaches it
+	useEffect(() => {
+		let cursor: string | null = null;
+		let direction: "next" | "prev" = "next";
+		if (cursors.next && currentIndex >= loadedRange.end - PREFETCH_MARGIN) {
+			cursor = cursors.next;
+		} else if (
+			cursors.prev &&
+			currentIndex < loadedRange.start + PREFETCH_MARGIN
+		) {
+			cursor = cursors.prev;
+			direction = "prev";
+		}
+		if (!cursor || fetchingCursor.current === cursor) return;
+
+		fetchingCursor.current = cursor;
+		testService
+			.getQuestionWindow(testId, cursor)
+			.then((page: QuestionWindow) => mergeWindow(page, direction))
+			.catch((err) => {
+				console.error("Error loading questions:", err);
+				toast.error("Failed to load more questions");
+			})
+			.finally(() => {
+				fetchingCursor.current = null;
+			});
+	}, [testId, currentIndex, cursors, loadedRange, mergeWindow]);
 
-	// Timer
+	// Timer: counts down to the server's deadline; nothing is saved
+	// Time-up submits (from the timer or a server notice) run one at a time
+	const submitRef = useRef<() => void>(() => {});
+	const autoSubmitting = useRef(false);
 	useEffect(() => {
-		if (!sessionId || timeRemaining <= 0) return;
+		if (!sessionId || isPaused) return;
 
 		const timer = setInterval(() => {
-			setTimeRemaining((prev) => {
-				const updatedTime = prev - 1;
-				if (updatedTime <= 0) {
-					clearInterval(timer);
-					handleSubmitTest();
-				}
-				return updatedTime;
-			});
+			const remaining = Math.max(
+				0,
+				Math.round((deadlineAt.current - Date.now()) / 1000)
+			);
+			setTimeRemaining(remaining);
+			if (remaining <= 0) {
+				clearInterval(timer);
+				submitRef.current();
+			}
 		}, 1000);
 
 		return () => {
 			clearInterval(timer);
 		};
-	}, [sessionId, timeRemaining]);
+	}, [sessionId, isPaused]);
 
-	// Update progress on state changes
+	// Session channel: saves, the server's clock and submit notices
 	useEffect(() => {
-		debouncedUpdateProgress(currentIndex, answers, timeRemaining);
-	}, [currentIndex, answers, timeRemaining, debouncedUpdateProgress]);
+		if (!sessionId || !sessionChannelEnabled) return;
+
+		let closed = false;
+		let retry: ReturnType<typeof setTimeout> | undefined;
+		const connect = () => {
+			let opened = false;
+			const live = openSessionChannel(testId, {
+				onClock: (clock) => {
+					opened = true;
+					syncClock(clock);
+				},
+				onSubmitRequired: () => submitRef.current(),
+				onClose: () => {
+					if (channel.current === live) channel.current = null;
+					// Never opened: the server does not offer it, so stay on HTTP
+					if (!closed && opened) {
+						retry = setTimeout(connect, CHANNEL_RETRY_INTERVAL * 1000);
+					}
+				},
+			});
+			channel.current = live;
+		};
+		connect();
+
+		return () => {
+			closed = true;
+			clearTimeout(retry);
+			channel.current?.close();
+			channel.current = null;
+		};
+	}, [testId, sessionId, syncClock]);
+
+	// Pick up pauses and extensions made on the server (the channel does
+	// this itself while it is open)
+	useEffect(() => {
+		if (!sessionId) return;
+
+		const sync = setInterval(() => {
+			if (channel.current?.isOpen()) return;
+			testService
+				.getSessionStatus(testId)
+				.then((status) => {
+					if (status.remaining_time !== undefined) syncClock(status);
+				})
+				.catch((err) => console.error("Error syncing timer:", err));
+		}, CLOCK_SYNC_INTERVAL * 1000);
+
+		return () => {
+			clearInterval(sync);
+		};
+	}, [testId, sessionId, syncClock]);
+
+	// Save answer changes and moves between questions
+	useEffect(() => {
+		debouncedUpdateProgress(currentIndex);
+	}, [currentIndex, answers, debouncedUpdateProgress]);
 
 	// Handle answer updates
 
 	const handleAnswer = (questionId: number, answer: any) => {
-		const currentQuestion = questions.find((q) => q.id === questionId);
+		const currentQuestion = questions.find((q) => q?.id === questionId);
+		const value =
+			currentQuestion?.question_type === "multiple_mcq"
+				? Array.isArray(answer)
+					? answer
+					: []
+				: answer;
+		unsavedChanges.current.set(questionId, {
+			answer: value,
+			edit: ++editCount.current,
+		});
 		setAnswers((prev) => ({
 			...prev,
-			[questionId]:
-				currentQuestion?.question_type === "multiple_mcq"
-					? Array.isArray(answer)
-						? answer
-						: []
-					: answer,
+			[questionId]: value,
 		}));
 	};
 
 	// Navigation handlers
 	const handleNext = () => {
-		if (currentIndex < questions.length - 1) {
+		if (currentIndex < questionCount - 1) {
 			setCurrentIndex((prev) => prev + 1);
 		}
 	};
@@ -185,8 +378,11 @@ export default function TakeTestPage() {
 
 			const submitData = {
 				answers: Object.entries(answers).reduce((acc, [questionId, answer]) => {
-					const question = questions.find((q) => q.id === parseInt(questionId));
-					if (question) {
+					const question = questions.find((q) => q?.id === parseInt(questionId));
+					if (!question) {
+						// Saved earlier in a window not loaded this time; already in stored form
+						acc[questionId] = answer;
+					} else {
 						if (question.question_type === "multiple_mcq") {
 							acc[questionId] = Array.isArray(answer) ? answer : [answer];
 						} else if (
@@ -200,7 +396,6 @@ export default function TakeTestPage() {
 					}
 					return acc;
 				}, {} as Record<string, any>),
-				timeSpent: test!.duration_minutes * 60 - timeRemaining,
 			};
 
 			const result = await testService.submitTest(submitTestId, submitData);
@@ -216,6 +411,13 @@ export default function TakeTestPage() {
 			setIsSubmitting(false);
 		}
 	};
+	submitRef.current = () => {
+		if (autoSubmitting.current) return;
+		autoSubmitting.current = true;
+		handleSubmitTest().finally(() => {
+			autoSubmitting.current = false;
+		});
+	};
 	// Format time
 	const formatTime = (seconds: number) => {
 		const minutes = Math.floor(seconds / 60);
@@ -243,7 +445,7 @@ export default function TakeTestPage() {
 	}
 
 	const currentQuestion = questions[currentIndex];
-	const progress = ((currentIndex + 1) / questions.length) * 100;
+	const progress = ((currentIndex + 1) / questionCount) * 100;
 
 	return (
 		<div className="max-w-4xl mx-auto p-6">
@@ -260,6 +462,9 @@ export default function TakeTestPage() {
 					<div className="flex items-center space-x-2">
 						<Clock className="h-5 w-5" />
 						<span className="font-mono">{formatTime(timeRemaining)}</span>
+						{isPaused && (
+							<span className="text-sm text-gray-500">(paused)</span>
+						)}
 					</div>
 				</div>
 			</div>
@@ -268,7 +473,7 @@ export default function TakeTestPage() {
 			<div className="mb-6">
 				<div className="flex justify-between text-sm mb-2">
 					<span>
-						Question {currentIndex + 1} of {questions.length}
+						Question {currentIndex + 1} of {questionCount}
 					</span>
 					<span>{Math.round(progress)}% Complete</span>
 				</div>
@@ -277,19 +482,27 @@ export default function TakeTestPage() {
 
 			{/* Question */}
 			<div className="bg-white rounded-lg shadow-lg p-6 mb-6">
-				<div className="flex justify-between items-center mb-4">
-					<h2 className="text-lg font-medium">
-						{currentQuestion?.question_text}
-					</h2>
-					<span className="text-sm text-gray-500">
-						Points: {currentQuestion?.points}
-					</span>
-				</div>
-				<QuestionComponent
-					question={currentQuestion}
-					answer={answers[currentQuestion?.id]}
-					onAnswer={handleAnswer}
-				/>
+				{currentQuestion ? (
+					<>
+						<div className="flex justify-between items-center mb-4">
+							<h2 className="text-lg font-medium">
+								{currentQuestion.question_text}
+							</h2>
+							<span className="text-sm text-gray-500">
+								Points: {currentQuestion.points}
+							</span>
+						</div>
+						<QuestionComponent
+							question={currentQuestion}
+							answer={answers[currentQuestion.id]}
+							onAnswer={handleAnswer}
+						/>
+					</>
+				) : (
+					<div className="flex justify-center py-8">
+						<div className="animate-spin rounded-full h-6 w-6 border-b-2 border-gray-900" />
+					</div>
+				)}
 			</div>
 
 			{/* Navigation */}
@@ -297,7 +510,7 @@ export default function TakeTestPage() {
 				<Button onClick={handlePrevious} disabled={currentIndex === 0}>
 					Previous
 				</Button>
-				{currentIndex === questions.length - 1 ? (
+				{currentIndex === questionCount - 1 ? (
 					<Button onClick={() => setShowConfirmSubmit(true)}>
 						Submit Test
 					</Button>
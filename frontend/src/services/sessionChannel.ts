@@ -0,0 +1,106 @@
+import Cookies from "js-cookie";
+
+const API_BASE_URL =
+	process.env.NEXT_PUBLIC_API_URL || "http://localhost:5000/api";
+// A save not acknowledged this soon is retried over HTTP
+const ACK_TIMEOUT_MS = 10000;
+
+// Only deployments serving the socket from async workers turn it on
+// (SESSION_SOCKET_ENABLED on the backend); everyone else stays on HTTP
+export const sessionChannelEnabled =
+	process.env.NEXT_PUBLIC_SESSION_SOCKET === "true";
+
+export interface SessionClock {
+	remaining_time: number;
+	paused: boolean;
+}
+
+export interface SaveAck {
+	acknowledged_seq: number;
+	stale?: boolean;
+}
+
+interface ChannelHandlers {
+	onClock: (clock: SessionClock) => void;
+	onSubmitRequired: (reason: string) => void;
+	onClose: () => void;
+}
+
+export interface SessionChannel {
+	isOpen: () => boolean;
+	save: (data: {
+		seq: number;
+		changes: Record<number, any>;
+		current_question_index: number;
+	}) => Promise<SaveAck>;
+	close: () => void;
+}
+
+// One WebSocket per exam session: autosaves and their acks, the server's
+// clock and submit notices. Authenticated once, by its first message, so
+// the token never appears in a URL.
+export const openSessionChannel = (
+	testId: string | number,
+	handlers: ChannelHandlers
+): SessionChannel => {
+	const socket = new WebSocket(
+		`${API_BASE_URL.replace(/^http/, "ws")}/tests/${testId}/session/socket`
+	);
+	socket.onopen = () => {
+		const token = Cookies.get("access_token") || "";
+		socket.send(JSON.stringify({ type: "auth", token }));
+	};
+	// Saves go over the socket only once the server has accepted the token
+	let ready = false;
+	const pending = new Map<
+		number,
+		{ resolve: (ack: SaveAck) => void; reject: (err: Error) => void }
+	>();
+
+	socket.onmessage = (event) => {
+		const message = JSON.parse(event.data);
+		if (message.type === "hello" || message.type === "clock") {
+			ready = true;
+			handlers.onClock(message);
+		} else if (message.type === "ack" || message.type === "error") {
+			const waiting = pending.get(message.seq);
+			if (!waiting) return;
+			pending.delete(message.seq);
+			if (message.type === "ack") {
+				waiting.resolve(message);
+			} else {
+				waiting.reject(new Error(message.error));
+			}
+		} else if (message.type === "submit_required") {
+			handlers.onSubmitRequired(message.reason);
+		}
+	};
+	socket.onclose = () => {
+		pending.forEach(({ reject }) => reject(new Error("Session channel closed")));
+		pending.clear();
+		handlers.onClose();
+	};
+
+	return {
+		isOpen: () => ready && socket.readyState === WebSocket.OPEN,
+		save: (data) =>
+			new Promise<SaveAck>((resolve, reject) => {
+				const timer = setTimeout(() => {
+					pending.delete(data.seq);
+					reject(new Error("Save was not acknowledged"));
+				}, ACK_TIMEOUT_MS);
+				pending.set(data.seq, {
+					resolve: (ack) => {
+						clearTimeout(timer);
+						resolve(ack);
+					},
+					reject: (err) => {
+						clearTimeout(timer);
+						reject(err);
+					},
+				});
+				socket.send(JSON.stringify({ type: "save", ...data }));
+			}),
+		close: () => socket.close(),
+	};
+};
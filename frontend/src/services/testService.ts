@@ -1,6 +1,6 @@
 // src/services/api.ts
 import { TestSession } from "@/types";
-import axios from "axios";
+import axios, { AxiosResponse } from "axios";
 import Cookies from "js-cookie";
 const API_BASE_URL =
 	process.env.NEXT_PUBLIC_API_URL || "http://localhost:5000/api";
@@ -21,6 +21,18 @@ api.interceptors.request.use((config) => {
 	return config;
 });
 
+// The session clock travels in headers too: a 304 refreshes them while the
+// cached body keeps the remaining time it was first sent with
+const withLiveClock = (response: AxiosResponse) => {
+	const remaining = response.headers["x-remaining-time"];
+	if (remaining === undefined) return response.data;
+	return {
+		...response.data,
+		remaining_time: Number(remaining),
+		paused: response.headers["x-clock-paused"] === "true",
+	};
+};
+
 export const testService = {
 	getDashboardStats: async (isAdmin: string) => {
 		const response = await api.get("/dashboard/stats");
@@ -30,6 +42,79 @@ export const testService = {
 		const response = await api.post("/tests/create", testData);
 		return response.data;
 	},
+	getGenerationJob: async (jobId: string) => {
+		const response = await api.get(`/tests/jobs/${jobId}`);
+		return response.data;
+	},
+	followGenerationJobEvents: async (
+		jobId: string,
+		onProgress?: (done: number, requested: number) => void
+	) => {
+		// Server-sent progress, read with fetch so the token stays in a header;
+		// resolves with the settled job, or null when the server does not
+		// stream events (sync workers) or the stream ends early
+		try {
+			const response = await fetch(
+				`${API_BASE_URL}/tests/jobs/${jobId}/events`,
+				{
+					headers: {
+						Authorization: `Bearer ${Cookies.get("access_token") || ""}`,
+					},
+				}
+			);
+			if (!response.ok || !response.body) return null;
+			const reader = response.body.getReader();
+			const decoder = new TextDecoder();
+			let buffer = "";
+			for (;;) {
+				const { done, value } = await reader.read();
+				if (done) return null;
+				buffer += decoder.decode(value, { stream: true });
+				let boundary;
+				while ((boundary = buffer.indexOf("\n\n")) >= 0) {
+					const event = buffer.slice(0, boundary);
+					buffer = buffer.slice(boundary + 2);
+					const data = event
+						.split("\n")
+						.find((line) => line.startsWith("data: "));
+					if (!data || event.startsWith("event: timeout")) continue;
+					const job = JSON.parse(data.slice(6));
+					onProgress?.(job.questions_done || 0, job.questions_requested || 0);
+					if (job.status === "completed" || job.status === "failed") {
+						reader.cancel();
+						return job;
+					}
+				}
+			}
+		} catch {
+			return null;
+		}
+	},
+	waitForGenerationJob: async (
+		jobId: string,
+		onProgress?: (done: number, requested: number) => void,
+		intervalMs = 2000
+	) => {
+		// Test generation runs in the background; follow its events where the
+		// server offers them, otherwise poll until it settles
+		const streamed = await testService.followGenerationJobEvents(
+			jobId,
+			onProgress
+		);
+		if (streamed?.status === "completed") return streamed;
+		if (streamed?.status === "failed") {
+			throw new Error(streamed.error || "Failed to generate test");
+		}
+		for (;;) {
+			const job = await testService.getGenerationJob(jobId);
+			onProgress?.(job.questions_done || 0, job.questions_requested || 0);
+			if (job.status === "completed") return job;
+			if (job.status === "failed") {
+				throw new Error(job.error || "Failed to generate test");
+			}
+			await new Promise((resolve) => setTimeout(resolve, intervalMs));
+		}
+	},
 
 	getTests: async (page = 1, perPage = 10) => {
 		const response = await api.get(
@@ -52,10 +137,25 @@ export const testService = {
 		const response = await api.put(`/tests/${id}`, testData);
 		return response.data;
 	},
+	getExamBootstrap: async (testId: string | number, window?: number) => {
+		// Test details, questions and session state for the take-test page in one request;
+		// with a window, only that many questions around the current one
+		const response = await api.get(
+			`/tests/${testId}/bootstrap${window ? `?window=${window}` : ""}`
+		);
+		return withLiveClock(response);
+	},
+	getQuestionWindow: async (testId: string | number, cursor: string) => {
+		// Another page of the session's questions, from a bootstrap cursor
+		const response = await api.get(
+			`/tests/${testId}/bootstrap?cursor=${encodeURIComponent(cursor)}`
+		);
+		return response.data;
+	},
 	getTestQuestions: async (testId: string | number) => {
 		try {
 			const response = await api.get(`/tests/${testId}/questions`);
-			return response.data;
+			return withLiveClock(response);
 		} catch (error) {
 			console.error("Error fetching test questions:", error);
 			throw error;
@@ -78,25 +178,15 @@ export const testService = {
 		return response.data;
 	},
 
-	updateSessionTime: async (
-		testId: string | number,
-		data: { remaining_time: number }
-	) => {
-		const response = await api.post(
-			`/tests/${testId}/session/update-time`,
-			data
-		);
-		return response.data;
-	},
-
 	updateProgress: async (
 		testId: string | number,
 		data: {
+			// Answers changed since the last acknowledged save; null clears one
+			seq: number;
+			changes: Record<number, any>;
 			current_question_index: number;
-			remaining_time: number;
-			answers: Record<number, any>;
 		}
-	) => {
+	): Promise<{ acknowledged_seq: number; stale?: boolean }> => {
 		const response = await api.post(`/tests/${testId}/progress`, data);
 		return response.data;
 	},
@@ -105,11 +195,19 @@ export const testService = {
 		testId: string | number,
 		data: {
 			answers: Record<number, any>;
-			timeSpent: number;
 		}
 	) => {
-		const response = await api.post(`/tests/${testId}/submit`, data);
-		return response.data;
+		// 503 means saved answers are still being applied server-side; retry
+		for (let attempt = 1; ; attempt++) {
+			try {
+				const response = await api.post(`/tests/${testId}/submit`, data);
+				return response.data;
+			} catch (error: any) {
+				if (error?.response?.status !== 503 || attempt >= 5) throw error;
+				const retryAfter = Number(error.response.headers?.["retry-after"]) || 1;
+				await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+			}
+		}
 	},
 	getLeaderboard: async () => {
 		const response = await api.get("/leaderboard/list");
@@ -11,6 +11,7 @@ export interface Test {
 	questions: [];
 	session_id?: number;
 	remaining_time?: number;
+	is_randomized?: boolean;
 	// Admin-specific fields
 	total_attempts?: number;
 	pass_rate?: number;
@@ -42,7 +43,9 @@ export interface QuestionOption {
 export interface TestSession {
 	id: number;
 	status: string;
+	// Derived by the server from the session's deadline
 	remaining_time: number;
+	paused: boolean;
 	start_time: string;
 	current_question_index?: number;
 }